@@ -0,0 +1,144 @@
+import argparse
+import logging
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+import pandas as pd
+
+from fair_drop import suspicious
+
+CHUNK_SIZE = 65536
+
+
+def _chunks(html: str) -> Iterator[str]:
+    """Split a page into chunks, like a streamed response."""
+    for i in range(0, len(html), CHUNK_SIZE):
+        yield html[i : i + CHUNK_SIZE]
+
+
+def benchmark_detectors(
+    pages: Dict[str, str], selector: str, repeat: int = 3
+) -> pd.DataFrame:
+    """Time every detector, with and without the streaming pre-filter, on saved pages.
+
+    Detectors whose optional package isn't installed are skipped.
+
+    :param pages: Page name -> HTML of the saved NFT pages
+    :param selector: CSS selector to find the suspicious flag
+    :param repeat: Number of runs per detector, the fastest one is reported
+    :return: A DataFrame with one row per detector and pre-filter setting, with the
+        columns seconds_per_page, speedup over the BeautifulSoup reference, flagged pages
+        and mismatches with the reference
+    """
+    reference = {
+        name: suspicious.has_flag_bs4(html, selector) for name, html in pages.items()
+    }
+    rows: List[Dict] = []
+    for detector_name, detector in suspicious.DETECTORS.items():
+        for prefilter in [False, True]:
+            timings = []
+            try:
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    if prefilter:
+                        results = {
+                            name: suspicious.scan_for_flag(
+                                _chunks(html), selector, detector
+                            )
+                            for name, html in pages.items()
+                        }
+                    else:
+                        results = {
+                            name: detector(html, selector)
+                            for name, html in pages.items()
+                        }
+                    timings.append(time.perf_counter() - start)
+            except ImportError as error:
+                logging.warning(f"Skipping {detector_name}: {error}")
+                break
+
+            rows.append(
+                {
+                    "detector": detector_name,
+                    "prefilter": prefilter,
+                    "seconds_per_page": min(timings) / len(pages),
+                    "flagged": sum(results.values()),
+                    "mismatches": sum(
+                        results[name] != reference[name] for name in pages
+                    ),
+                }
+            )
+
+    result = pd.DataFrame(rows)
+    result["speedup"] = result["seconds_per_page"].iloc[0] / result["seconds_per_page"]
+    return result
+
+
+def main(pages_folder: str, selector: str, repeat: int = 3) -> pd.DataFrame:
+    """Benchmark the detectors on the saved NFT pages in a folder.
+
+    :param pages_folder: Folder with NFT pages saved as .html files
+    :param selector: CSS selector to find the suspicious flag
+    :param repeat: Number of runs per detector, the fastest one is reported
+    :return: The output of benchmark_detectors
+    """
+    pages = {
+        path.name: path.read_text(encoding="utf-8")
+        for path in sorted(Path(pages_folder).glob("*.html"))
+    }
+    if not pages:
+        raise ValueError(f"No .html files found in {pages_folder}")
+    logging.info(f"Benchmarking {len(pages)} pages")
+
+    result = benchmark_detectors(pages, selector, repeat=repeat)
+    logging.info("\n" + result.to_string(index=False))
+    return result
+
+
+def _cli_parser() -> argparse.ArgumentParser:
+    """
+    Create the command line argument parser
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark the suspicious flag detectors on saved OpenSea NFT pages."
+    )
+    parser.add_argument(
+        "-p",
+        "--pages",
+        help="Folder with NFT pages saved as .html files",
+        required=True,
+        type=str,
+    )
+    parser.add_argument(
+        "--selector",
+        help="CSS selector to find the suspicious flag",
+        required=True,
+        type=str,
+    )
+    parser.add_argument(
+        "-r",
+        "--repeat",
+        help="Number of runs per detector, the fastest one is reported",
+        required=False,
+        type=int,
+        default=3,
+    )
+    parser.add_argument(
+        "--log",
+        help="Set the desired log level",
+        required=False,
+        type=str,
+        default="INFO",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
+    )
+    return parser
+
+
+if __name__ == "__main__":
+
+    args = _cli_parser().parse_args()
+
+    logging.basicConfig(level=args.log)
+
+    main(pages_folder=args.pages, selector=args.selector, repeat=args.repeat)
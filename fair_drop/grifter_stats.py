@@ -0,0 +1,158 @@
+import argparse
+import logging
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from honestnft_utils import config, datasets
+
+TOP_N = [10, 50, 150]
+
+
+def grifter_stats(
+    mints: pd.DataFrame,
+    rarity_db: pd.DataFrame,
+    top_n: Optional[List[int]] = None,
+    min_minted: int = 1,
+) -> pd.DataFrame:
+    """Compute the rare mint statistics of every minting address at once.
+
+    For every top_n threshold a token is rare if its rank is at most top_n. Per address:
+
+    - rare_<n>: number of rare tokens minted
+    - rare_share_<n>: share of all rare tokens minted by the address
+    - multiple_<n>: rare_share_<n> divided by mint_share
+    - pvalue_<n>: binomial probability of minting at least rare_<n> rare tokens,
+      if every minted token is rare with probability rares / tokens
+
+    :param mints: Minting data with the columns to_account and rank
+    :param rarity_db: Rarity data with the columns TOKEN_ID and Rank
+    :param top_n: The rarity thresholds. (default: TOP_N)
+    :param min_minted: Only include addresses that minted at least this many tokens
+    :return: A DataFrame indexed by address, sorted by the p-value of the first threshold
+    """
+    if top_n is None:
+        top_n = TOP_N
+    rarity_db = rarity_db.drop_duplicates("TOKEN_ID")
+    total_tokens = len(rarity_db)
+    ranks = mints["rank"]
+
+    minted = (
+        mints.assign(**{f"rare_{n}": ranks <= n for n in top_n})
+        .groupby("to_account", observed=True)
+        .agg(
+            minted=("rank", "size"),
+            **{f"rare_{n}": (f"rare_{n}", "sum") for n in top_n},
+        )
+    )
+    minted.index.name = "address"
+    minted = minted[minted["minted"] >= min_minted].copy()
+    minted["mint_share"] = minted["minted"] / total_tokens
+
+    for n in top_n:
+        total_rares = int((rarity_db["Rank"] <= n).sum())
+        rare_share = minted[f"rare_{n}"] / total_rares if total_rares else np.nan
+        minted[f"rare_share_{n}"] = rare_share
+        minted[f"multiple_{n}"] = rare_share / minted["mint_share"]
+        minted[f"pvalue_{n}"] = stats.binom.sf(
+            minted[f"rare_{n}"] - 1, minted["minted"], total_rares / total_tokens
+        )
+
+    columns = ["minted", "mint_share"] + [
+        f"{column}_{n}"
+        for n in top_n
+        for column in ["rare", "rare_share", "multiple", "pvalue"]
+    ]
+    return minted[columns].sort_values(
+        [f"pvalue_{top_n[0]}", "minted"], ascending=[True, False], kind="stable"
+    )
+
+
+def main(
+    collection: str,
+    top_n: Optional[List[int]] = None,
+    min_minted: int = 1,
+    method: str = "raritytools",
+) -> pd.DataFrame:
+    """Compute the grifter statistics of a collection and save them
+    to data/grifters/<collection>_grifter_stats.csv.
+
+    :param collection: The collection name, as used in data/minting_data
+    :param top_n: The rarity thresholds. (default: TOP_N)
+    :param min_minted: Only include addresses that minted at least this many tokens
+    :param method: The rarity method used to build data/rarity_data/<collection>_<method>.csv
+    :return: The statistics DataFrame
+    """
+    mints = datasets.load_minting(collection, columns=["to_account", "rank"])
+    rarity_db = datasets.load_rarity(collection, method, columns=["TOKEN_ID", "Rank"])
+
+    result = grifter_stats(mints, rarity_db, top_n=top_n, min_minted=min_minted)
+    logging.info(result.head(10).to_string())
+
+    result.to_csv(f"{config.GRIFTERS_DATA_FOLDER}/{collection}_grifter_stats.csv")
+    return result
+
+
+def _cli_parser() -> argparse.ArgumentParser:
+    """
+    Create the command line argument parser
+    """
+    parser = argparse.ArgumentParser(
+        description="Compute the rare mint statistics of every minting address."
+    )
+    parser.add_argument(
+        "-c",
+        "--collection",
+        help="Collection name, as used in data/minting_data",
+        required=True,
+        type=str,
+    )
+    parser.add_argument(
+        "-n",
+        "--top_n",
+        help="Rarity thresholds, the table is sorted by the first one",
+        required=False,
+        type=int,
+        nargs="+",
+        default=TOP_N,
+    )
+    parser.add_argument(
+        "--min_minted",
+        help="Only include addresses that minted at least this many tokens",
+        required=False,
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "-m",
+        "--method",
+        help="Rarity method of the rarity data",
+        required=False,
+        type=str,
+        default="raritytools",
+    )
+    parser.add_argument(
+        "--log",
+        help="Set the desired log level",
+        required=False,
+        type=str,
+        default="INFO",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
+    )
+    return parser
+
+
+if __name__ == "__main__":
+
+    args = _cli_parser().parse_args()
+
+    logging.basicConfig(level=args.log)
+
+    main(
+        collection=args.collection,
+        top_n=args.top_n,
+        min_minted=args.min_minted,
+        method=args.method,
+    )
@@ -0,0 +1,210 @@
+import argparse
+import logging
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from honestnft_utils import config, datasets
+
+GRIFTERS_COLUMNS = ["address", "pvalue", "num_transactions", "num_minted", "token_list"]
+
+
+def ks_test_wallets(
+    data: pd.DataFrame, num_tokens: Optional[int] = None, min_minted: int = 1
+) -> pd.DataFrame:
+    """One-sided KS test of the minted rarity ranks of every wallet against
+    the uniform rank distribution, for all wallets at once.
+
+    The minting data is sorted once by wallet and rank. Each wallet's empirical CDF
+    is then compared with the uniform CDF rank / num_tokens at its own ranks,
+    which gives the statistic D = max(i / k - rank_i / num_tokens).
+    A large D means the wallet minted lower (rarer) ranks than expected by chance.
+
+    :param data: Minting data with the columns to_account and rank
+    :param num_tokens: Number of ranks in the collection. (default: number of rows in data)
+    :param min_minted: Only test wallets that minted at least this many tokens
+    :return: A DataFrame indexed by address with the columns num_minted, statistic and pvalue
+    """
+    data = data[data["rank"].notna()]
+    if num_tokens is None:
+        num_tokens = len(data)
+
+    accounts = data["to_account"].to_numpy()
+    ranks = data["rank"].to_numpy(dtype=np.float64)
+    wallets, wallet_index = np.unique(accounts, return_inverse=True)
+
+    # One sort gives every wallet's ranks in ascending order, in consecutive blocks
+    order = np.lexsort((ranks, wallet_index))
+    sorted_wallets = wallet_index[order]
+    sorted_ranks = ranks[order]
+
+    counts = np.bincount(sorted_wallets, minlength=len(wallets))
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    position = np.arange(len(sorted_ranks)) - np.repeat(starts, counts) + 1
+    sizes = np.repeat(counts, counts)
+
+    distances = position / sizes - sorted_ranks / num_tokens
+    statistics = np.maximum.reduceat(distances, starts)
+    statistics = np.clip(statistics, 0, 1)
+
+    result = pd.DataFrame(
+        {"num_minted": counts, "statistic": statistics}, index=wallets
+    )
+    result.index.name = "address"
+    result = result[result["num_minted"] >= min_minted]
+    result["pvalue"] = stats.ksone.sf(result["statistic"], result["num_minted"])
+    # D = 0 is the smallest possible statistic
+    result.loc[result["statistic"] == 0, "pvalue"] = 1.0
+    return result
+
+
+def find_anomalies(
+    data: pd.DataFrame,
+    threshold: int = 2,
+    p_value: float = 0.001,
+    num_tokens: Optional[int] = None,
+) -> pd.DataFrame:
+    """Find the wallets that were anomalously lucky while minting.
+
+    :param data: Minting data with the columns txid, to_account, TOKEN_ID and rank
+    :param threshold: Only test wallets that minted more than this many tokens
+    :param p_value: Significance level of the KS test
+    :param num_tokens: Number of ranks in the collection. (default: number of rows in data)
+    :return: A DataFrame with the grifters, in the same format as data/grifters
+    """
+    results = ks_test_wallets(data, num_tokens=num_tokens, min_minted=threshold + 1)
+    results = results[results["pvalue"] < p_value]
+    results = results.sort_values("num_minted", ascending=False, kind="stable")
+    if len(results) == 0:
+        return pd.DataFrame(columns=GRIFTERS_COLUMNS)
+
+    # Lowest rank (and its token) of every transaction
+    ranked = data[data["rank"].notna()]
+    best = ranked.loc[
+        ranked.groupby("txid", sort=False, observed=True)["rank"].idxmin()
+    ]
+    best = best.set_index("txid")[["rank", "TOKEN_ID"]]
+
+    grifter_mints = data[data["to_account"].isin(results.index)]
+    num_transactions = grifter_mints.groupby("to_account", observed=True)[
+        "txid"
+    ].nunique()
+
+    transactions = grifter_mints.drop_duplicates(["to_account", "txid"])
+    transactions = transactions.join(best, on="txid", rsuffix="_best")
+    transactions = transactions[transactions["rank_best"].notna()]
+    token_lists = transactions.groupby("to_account", sort=False, observed=True).apply(
+        lambda group: [
+            [int(rank), int(token_id)]
+            for rank, token_id in zip(group["rank_best"], group["TOKEN_ID_best"])
+        ]
+    )
+
+    grifters = pd.DataFrame(
+        {
+            "address": results.index,
+            "pvalue": results["pvalue"].to_numpy(),
+            "num_transactions": num_transactions.reindex(results.index).to_numpy(),
+            "num_minted": results["num_minted"].to_numpy(),
+            "token_list": token_lists.reindex(results.index).to_numpy(),
+        }
+    )
+    return grifters
+
+
+def main(
+    collection: str,
+    threshold: int = 2,
+    p_value: float = 0.001,
+    num_tokens: Optional[int] = None,
+) -> pd.DataFrame:
+    """Run the KS test on the minting data of a collection and save the grifters
+    to data/grifters/<collection>_grifters.csv.
+
+    :param collection: The collection name, as used in data/minting_data
+    :param threshold: Only test wallets that minted more than this many tokens
+    :param p_value: Significance level of the KS test
+    :param num_tokens: Number of ranks in the collection. (default: number of minted tokens)
+    :return: The grifters DataFrame
+    """
+    data = datasets.load_minting(collection)
+    data["to_account"] = data["to_account"].astype(str)
+    data["txid"] = data["txid"].astype(str)
+    logging.info(f"Number of buyers: {data['to_account'].nunique()}")
+
+    grifters = find_anomalies(
+        data, threshold=threshold, p_value=p_value, num_tokens=num_tokens
+    )
+    for grifter in grifters.itertuples():
+        logging.info(
+            f"{grifter.address}: p={grifter.pvalue}, "
+            f"{grifter.num_minted} minted in {grifter.num_transactions} transactions"
+        )
+
+    grifters.to_csv(
+        f"{config.GRIFTERS_DATA_FOLDER}/{collection}_grifters.csv", index=False
+    )
+    return grifters
+
+
+def _cli_parser() -> argparse.ArgumentParser:
+    """
+    Create the command line argument parser
+    """
+    parser = argparse.ArgumentParser(
+        description="Find wallets that minted anomalously rare tokens with a one-sided KS test."
+    )
+    parser.add_argument(
+        "-c",
+        "--collection",
+        help="Collection name, as used in data/minting_data",
+        required=True,
+        type=str,
+    )
+    parser.add_argument(
+        "-p",
+        "--p_value",
+        help="Significance level of the KS test",
+        required=False,
+        type=float,
+        default=0.001,
+    )
+    parser.add_argument(
+        "-t",
+        "--threshold",
+        help="Only test wallets that minted more than this many tokens",
+        required=False,
+        type=int,
+        default=2,
+    )
+    parser.add_argument(
+        "--num_tokens",
+        help="Number of ranks in the collection. (default: number of minted tokens)",
+        required=False,
+        type=int,
+    )
+    parser.add_argument(
+        "--log",
+        help="Set the desired log level",
+        required=False,
+        type=str,
+        default="INFO",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
+    )
+    return parser
+
+
+if __name__ == "__main__":
+
+    args = _cli_parser().parse_args()
+
+    logging.basicConfig(level=args.log)
+
+    main(
+        collection=args.collection,
+        threshold=args.threshold,
+        p_value=args.p_value,
+        num_tokens=args.num_tokens,
+    )
@@ -0,0 +1,321 @@
+import argparse
+import concurrent.futures
+import logging
+import os
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from honestnft_utils import config, datasets
+
+STATISTICS = ["mean", "ks"]
+
+
+def wallet_rank_matrices(
+    data: pd.DataFrame, min_minted: int = 1
+) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+    """Group the minted ranks of every wallet by the number of tokens it minted.
+
+    :param data: Minting data with the columns to_account and rank
+    :param min_minted: Only include wallets that minted at least this many tokens
+    :return: A dict of mint count -> (addresses, matrix with one row of ranks per address)
+    """
+    data = data[data["rank"].notna()]
+    wallets, wallet_index = np.unique(
+        data["to_account"].to_numpy(), return_inverse=True
+    )
+    ranks = data["rank"].to_numpy(dtype=np.float64)
+
+    # One sort puts every wallet's ranks in consecutive blocks
+    order = np.argsort(wallet_index, kind="stable")
+    sorted_ranks = ranks[order]
+    counts = np.bincount(wallet_index, minlength=len(wallets))
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    matrices = {}
+    for size in np.unique(counts):
+        if size < min_minted:
+            continue
+        members = np.flatnonzero(counts == size)
+        rows = starts[members][:, None] + np.arange(size)
+        matrices[int(size)] = (wallets[members], sorted_ranks[rows])
+    return matrices
+
+
+def score(matrix: np.ndarray, statistic: str, population: np.ndarray) -> np.ndarray:
+    """Compute the luck score of each row of ranks. Higher scores are luckier.
+
+    :param matrix: One row of ranks per wallet (or replicate)
+    :param statistic: "mean" for the negated mean rank, "ks" for the one-sided KS
+        statistic against the rank distribution of the population
+    :param population: Sorted ranks of all minted tokens
+    :return: The score of each row
+    """
+    if statistic == "mean":
+        return np.asarray(-matrix.mean(axis=1))
+    if statistic == "ks":
+        size = matrix.shape[1]
+        cdf = np.searchsorted(population, np.sort(matrix, axis=1), side="right")
+        distances = np.arange(1, size + 1) / size - cdf / len(population)
+        return np.asarray(np.clip(distances.max(axis=1), 0, 1))
+    raise ValueError(f"Unknown statistic {statistic}, expected one of {STATISTICS}")
+
+
+def _count_exceedances(job: Dict) -> Dict[int, np.ndarray]:
+    """Draw one chunk of replicates and count how often they score at least as
+    high as each wallet. Used as process pool worker.
+
+    Every replicate is a random ordering of the largest wallet size, drawn without
+    replacement from the population. Its first k ranks are a random sample of size k,
+    so a single draw is shared by the wallets of every size.
+
+    :param job: A dict with the population, the observed scores per wallet size,
+        the statistic, the number of replicates and the seed of this chunk
+    :return: A dict of wallet size -> number of exceedances per wallet
+    """
+    population = job["population"]
+    observed = job["observed"]
+    rng = np.random.default_rng(job["seed"])
+    max_size = max(observed)
+
+    keys = rng.random((job["replicates"], len(population)), dtype=np.float32)
+    sample = np.argpartition(keys, max_size - 1, axis=1)[:, :max_size]
+    sample_keys = np.take_along_axis(keys, sample, axis=1)
+    sample = np.take_along_axis(sample, np.argsort(sample_keys, axis=1), axis=1)
+    replicates = population[sample]
+
+    exceedances = {}
+    for size, observed_scores in observed.items():
+        scores = score(replicates[:, :size], job["statistic"], population)
+        exceedances[size] = (scores[:, None] >= observed_scores[None, :]).sum(axis=0)
+    return exceedances
+
+
+def permutation_test(
+    data: pd.DataFrame,
+    statistic: str = "mean",
+    replicates: int = 10000,
+    seed: Optional[int] = None,
+    min_minted: int = 3,
+    chunk_size: int = 250,
+    processes: int = 1,
+    confidence: float = 0.95,
+) -> pd.DataFrame:
+    """Monte Carlo permutation test of the luck of every minting wallet.
+
+    Under the null hypothesis tokens are assigned at random, so a wallet that minted
+    k tokens got a random sample of k ranks out of all minted ranks. Unlike the KS test
+    against a uniform distribution, this also holds for collections with a non-uniform
+    rarity distribution (e.g. ties or missing ranks).
+
+    Replicates are drawn in chunks of chunk_size rows with their own seed, derived from seed.
+    The result only depends on seed and chunk_size, not on the number of processes.
+
+    :param data: Minting data with the columns to_account and rank
+    :param statistic: One of STATISTICS
+    :param replicates: Number of random replicates
+    :param seed: Seed of the random number generator
+    :param min_minted: Only test wallets that minted at least this many tokens
+    :param chunk_size: Number of replicates drawn at once. Uses chunk_size x minted tokens x 4 bytes of memory.
+    :param processes: Number of worker processes
+    :param confidence: Confidence level of the p-value confidence intervals
+    :return: A DataFrame indexed by address with the columns num_minted, score,
+        exceedances, pvalue, pvalue_lower and pvalue_upper, sorted by pvalue
+    """
+    matrices = wallet_rank_matrices(data, min_minted=min_minted)
+    population = np.sort(data["rank"].dropna().to_numpy(dtype=np.float64))
+    if len(matrices) == 0:
+        return pd.DataFrame(
+            columns=[
+                "num_minted",
+                "score",
+                "exceedances",
+                "pvalue",
+                "pvalue_lower",
+                "pvalue_upper",
+            ]
+        )
+
+    observed = {
+        size: score(matrix, statistic, population)
+        for size, (_, matrix) in matrices.items()
+    }
+
+    chunks = [
+        min(chunk_size, replicates - start)
+        for start in range(0, replicates, chunk_size)
+    ]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+    jobs = [
+        {
+            "population": population,
+            "observed": observed,
+            "statistic": statistic,
+            "replicates": chunk,
+            "seed": chunk_seed,
+        }
+        for chunk, chunk_seed in zip(chunks, seeds)
+    ]
+
+    exceedances = {
+        size: np.zeros(len(scores), dtype=np.int64) for size, scores in observed.items()
+    }
+    if processes > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as executor:
+            results = executor.map(_count_exceedances, jobs)
+            for result in results:
+                for size, counts in result.items():
+                    exceedances[size] += counts
+    else:
+        for job in jobs:
+            for size, counts in _count_exceedances(job).items():
+                exceedances[size] += counts
+
+    frames = []
+    for size, (addresses, _) in matrices.items():
+        frames.append(
+            pd.DataFrame(
+                {
+                    "num_minted": size,
+                    "score": observed[size],
+                    "exceedances": exceedances[size],
+                },
+                index=pd.Index(addresses, name="address"),
+            )
+        )
+    result = pd.concat(frames)
+
+    # Add one to avoid p-values of zero, the observed data is a valid permutation too
+    result["pvalue"] = (result["exceedances"] + 1) / (replicates + 1)
+
+    # Clopper-Pearson interval of the exceedance probability
+    alpha = 1 - confidence
+    successes = result["exceedances"].to_numpy()
+    result["pvalue_lower"] = np.nan_to_num(
+        stats.beta.ppf(alpha / 2, successes, replicates - successes + 1), nan=0.0
+    )
+    result["pvalue_upper"] = np.nan_to_num(
+        stats.beta.ppf(1 - alpha / 2, successes + 1, replicates - successes), nan=1.0
+    )
+    return result.sort_values(["pvalue", "num_minted"], ascending=[True, False])
+
+
+def main(
+    collection: str,
+    statistic: str = "mean",
+    replicates: int = 10000,
+    seed: Optional[int] = None,
+    min_minted: int = 3,
+    chunk_size: int = 250,
+    processes: int = 1,
+) -> pd.DataFrame:
+    """Run the permutation test on the minting data of a collection and save the results
+    to data/grifters/<collection>_permutation_test.csv.
+
+    :return: The results of permutation_test
+    """
+    data = datasets.load_minting(collection)
+    data["to_account"] = data["to_account"].astype(str)
+
+    result = permutation_test(
+        data,
+        statistic=statistic,
+        replicates=replicates,
+        seed=seed,
+        min_minted=min_minted,
+        chunk_size=chunk_size,
+        processes=processes,
+    )
+    logging.info(result.head(10).to_string())
+
+    result.to_csv(f"{config.GRIFTERS_DATA_FOLDER}/{collection}_permutation_test.csv")
+    return result
+
+
+def _cli_parser() -> argparse.ArgumentParser:
+    """
+    Create the command line argument parser
+    """
+    parser = argparse.ArgumentParser(
+        description="Find lucky minters with a Monte Carlo permutation test."
+    )
+    parser.add_argument(
+        "-c",
+        "--collection",
+        help="Collection name, as used in data/minting_data",
+        required=True,
+        type=str,
+    )
+    parser.add_argument(
+        "-s",
+        "--statistic",
+        help="Test statistic: mean rank or one-sided KS statistic",
+        required=False,
+        type=str,
+        default="mean",
+        choices=STATISTICS,
+    )
+    parser.add_argument(
+        "-r",
+        "--replicates",
+        help="Number of random replicates",
+        required=False,
+        type=int,
+        default=10000,
+    )
+    parser.add_argument(
+        "--seed",
+        help="Seed of the random number generator",
+        required=False,
+        type=int,
+    )
+    parser.add_argument(
+        "--min_minted",
+        help="Only test wallets that minted at least this many tokens",
+        required=False,
+        type=int,
+        default=3,
+    )
+    parser.add_argument(
+        "--chunk_size",
+        help="Number of replicates drawn at once",
+        required=False,
+        type=int,
+        default=250,
+    )
+    parser.add_argument(
+        "-p",
+        "--processes",
+        help=f"Number of worker processes. (default: 1, max useful: {os.cpu_count()})",
+        required=False,
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "--log",
+        help="Set the desired log level",
+        required=False,
+        type=str,
+        default="INFO",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
+    )
+    return parser
+
+
+if __name__ == "__main__":
+
+    args = _cli_parser().parse_args()
+
+    logging.basicConfig(level=args.log)
+
+    main(
+        collection=args.collection,
+        statistic=args.statistic,
+        replicates=args.replicates,
+        seed=args.seed,
+        min_minted=args.min_minted,
+        chunk_size=args.chunk_size,
+        processes=args.processes,
+    )
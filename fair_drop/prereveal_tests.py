@@ -0,0 +1,179 @@
+import argparse
+import logging
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from honestnft_utils import config
+
+TOKEN_COL = "TOKEN_ID"
+
+
+def offer_statistics(bids: pd.DataFrame, min_offers: int = 5) -> pd.DataFrame:
+    """Compute the offer statistics of every token with a single groupby.
+
+    :param bids: Pre-reveal bids with the columns TOKEN_ID and OFFER
+    :param min_offers: Only include tokens with more than this many offers
+    :return: A DataFrame indexed by TOKEN_ID with the columns NUM_OFFERS,
+        MEAN_OFFER and STD_OFFER, in order of the first offer on each token
+    """
+    grouped = bids.groupby(TOKEN_COL, sort=False)["OFFER"]
+    offers = pd.DataFrame(
+        {
+            "NUM_OFFERS": grouped.size(),
+            "MEAN_OFFER": grouped.mean(),
+            # Population standard deviation, like np.std
+            "STD_OFFER": grouped.std(ddof=0),
+        }
+    )
+    return offers[offers["NUM_OFFERS"] > min_offers]
+
+
+def sales_vs_offers(
+    bids: pd.DataFrame, sales: pd.DataFrame, min_offers: int = 5
+) -> pd.DataFrame:
+    """Join the first sale of every token to its offer statistics.
+
+    :param bids: Pre-reveal bids with the columns TOKEN_ID and OFFER
+    :param sales: Pre-reveal sales with the columns TOKEN_ID, PRICE, RANK and USER
+    :param min_offers: Only include tokens with more than this many offers
+    :return: A DataFrame indexed by TOKEN_ID with the offer statistics, the sale
+        columns and Z_SCORE, the number of standard deviations the sale is above the mean offer
+    """
+    first_sales = sales.drop_duplicates(TOKEN_COL).set_index(TOKEN_COL)
+    result = offer_statistics(bids, min_offers=min_offers).join(
+        first_sales[["PRICE", "RANK", "USER"]], how="inner"
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result["Z_SCORE"] = (result["PRICE"] - result["MEAN_OFFER"]) / result[
+            "STD_OFFER"
+        ]
+    return result
+
+
+def find_overpaid_tokens(
+    bids: pd.DataFrame,
+    sales: pd.DataFrame,
+    st_devs: float = 3,
+    min_offers: int = 5,
+) -> pd.DataFrame:
+    """Find the tokens that sold for more than st_devs standard deviations above
+    their mean pre-reveal offer.
+
+    :param bids: Pre-reveal bids with the columns TOKEN_ID and OFFER
+    :param sales: Pre-reveal sales with the columns TOKEN_ID, PRICE, RANK and USER
+    :param st_devs: Number of standard deviations above the mean offer
+    :param min_offers: Only include tokens with more than this many offers
+    :return: The rows of sales_vs_offers of the overpaid tokens
+    """
+    result = sales_vs_offers(bids, sales, min_offers=min_offers)
+    return result[
+        result["PRICE"] > result["MEAN_OFFER"] + st_devs * result["STD_OFFER"]
+    ]
+
+
+def sweep_st_devs(
+    bids: pd.DataFrame,
+    sales: pd.DataFrame,
+    st_devs: List[float],
+    min_offers: int = 5,
+) -> pd.DataFrame:
+    """Flag the overpaid tokens for several numbers of standard deviations at once.
+
+    :param bids: Pre-reveal bids with the columns TOKEN_ID and OFFER
+    :param sales: Pre-reveal sales with the columns TOKEN_ID, PRICE, RANK and USER
+    :param st_devs: The numbers of standard deviations above the mean offer
+    :param min_offers: Only include tokens with more than this many offers
+    :return: sales_vs_offers with one boolean column OVERPAID_<k> per number of
+        standard deviations
+    """
+    result = sales_vs_offers(bids, sales, min_offers=min_offers)
+    thresholds = result["MEAN_OFFER"].to_numpy()[:, None] + np.outer(
+        result["STD_OFFER"].to_numpy(), st_devs
+    )
+    flags = result["PRICE"].to_numpy()[:, None] > thresholds
+    for i, k in enumerate(st_devs):
+        result[f"OVERPAID_{k:g}"] = flags[:, i]
+    return result
+
+
+def main(collection: str, st_devs: List[float], min_offers: int = 5) -> pd.DataFrame:
+    """Flag the overpaid pre-reveal sales of a collection and save them
+    to data/grifters/<collection>_prereveal_overpaid.csv.
+
+    :param collection: The collection name, as used in data/pre-reveal_bids
+    :param st_devs: The numbers of standard deviations above the mean offer
+    :param min_offers: Only include tokens with more than this many offers
+    :return: The output of sweep_st_devs
+    """
+    bids = pd.read_csv(
+        f"{config.PRE_REVEAL_BIDS_FOLDER}/{collection}_pre-reveal_bids.csv"
+    )
+    sales = pd.read_csv(
+        f"{config.PRE_REVEAL_SALES_FOLDER}/{collection}_pre-reveal_sales.csv"
+    )
+
+    result = sweep_st_devs(bids, sales, st_devs, min_offers=min_offers)
+    for k in st_devs:
+        logging.info(
+            f"{result[f'OVERPAID_{k:g}'].sum()} of {len(result)} tokens sold "
+            f"more than {k:g} standard deviations above the mean offer"
+        )
+
+    result.to_csv(f"{config.GRIFTERS_DATA_FOLDER}/{collection}_prereveal_overpaid.csv")
+    return result
+
+
+def _cli_parser() -> argparse.ArgumentParser:
+    """
+    Create the command line argument parser
+    """
+    parser = argparse.ArgumentParser(
+        description="Flag pre-reveal sales far above the mean offer of the token."
+    )
+    parser.add_argument(
+        "-c",
+        "--collection",
+        help="Collection name, as used in data/pre-reveal_bids",
+        required=True,
+        type=str,
+    )
+    parser.add_argument(
+        "-s",
+        "--st_devs",
+        help="Numbers of standard deviations above the mean offer",
+        required=False,
+        type=float,
+        nargs="+",
+        default=[1, 2, 3],
+    )
+    parser.add_argument(
+        "--min_offers",
+        help="Only include tokens with more than this many offers",
+        required=False,
+        type=int,
+        default=5,
+    )
+    parser.add_argument(
+        "--log",
+        help="Set the desired log level",
+        required=False,
+        type=str,
+        default="INFO",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
+    )
+    return parser
+
+
+if __name__ == "__main__":
+
+    args = _cli_parser().parse_args()
+
+    logging.basicConfig(level=args.log)
+
+    main(
+        collection=args.collection,
+        st_devs=args.st_devs,
+        min_offers=args.min_offers,
+    )
@@ -1,10 +1,13 @@
 import argparse
+import concurrent.futures
+import functools
 import json
 import logging
-import multiprocessing
 import os
+import re
 import time
-from typing import Dict, List, Optional
+from html.parser import HTMLParser
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 import pandas as pd
 import requests
@@ -67,36 +70,186 @@ def get_collection_name(contract_address: str) -> str:
         raise Exception(error)
 
 
+def has_flag_bs4(html: str, selector: str) -> bool:
+    """Reference detector: parse the whole page with BeautifulSoup and look for the flag.
+
+    :param html: The HTML of the NFT page
+    :param selector: CSS selector to find the suspicious flag
+    :return: Whether the page contains an element matching the selector
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    if soup.script is not None:
+        soup.script.decompose()
+    return len(soup.select(selector)) > 0
+
+
+def has_flag_selectolax(html: str, selector: str) -> bool:
+    """Detector using the selectolax HTML parser, which is much faster than BeautifulSoup.
+    Requires the optional selectolax package.
+
+    :param html: The HTML of the NFT page
+    :param selector: CSS selector to find the suspicious flag
+    :return: Whether the page contains an element matching the selector
+    """
+    from selectolax.parser import HTMLParser
+
+    return HTMLParser(html).css_first(selector) is not None
+
+
+DETECTORS: Dict[str, Callable[[str, str], bool]] = {
+    "bs4": has_flag_bs4,
+    "selectolax": has_flag_selectolax,
+}
+
+
+def _last_compound(selector: str) -> str:
+    """Get the last compound selector, e.g. "i.flag" of "div > i.flag"."""
+    return re.split(r"\s*[\s>+~]\s*", selector.strip())[-1]
+
+
+def selector_tokens(selector: str) -> List[str]:
+    """Get the class names and ids that the start tag of a matching element must contain.
+
+    Selector lists, pseudo-classes and attribute selectors (e.g. "div.x, span.y" or
+    "i:not(.x)") can match elements without these tokens, so they have no tokens.
+
+    :param selector: CSS selector to find the suspicious flag
+    :return: The class names and ids of the last compound selector,
+        e.g. ["gZavKY", "material-icons"] for "div > i.gZavKY.material-icons",
+        or an empty list if the selector can't be reduced to required tokens
+    """
+    if any(character in selector for character in ",:["):
+        return []
+    return re.findall(r"[.#]([\w-]+)", _last_compound(selector))
+
+
+class _CandidateFinder(HTMLParser):
+    """Tokenize a page like BeautifulSoup's html.parser and look for a start tag with the
+    tag name and all the class names and ids of a selector."""
+
+    def __init__(self, tag_name: Optional[str], tokens: List[str]) -> None:
+        super().__init__(convert_charrefs=False)
+        self.tag_name = tag_name
+        self.tokens = tokens
+        self.found = False
+        self.fed = 0
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if self.found or (self.tag_name is not None and tag != self.tag_name):
+            return
+        names: Set[str] = set()
+        for name, value in attrs:
+            if name == "class" and value:
+                names.update(value.split())
+            elif name == "id" and value:
+                names.add(value)
+        self.found = all(token in names for token in self.tokens)
+
+    @property
+    def consumed(self) -> int:
+        """Number of characters fed so far that have been tokenized."""
+        return self.fed - len(self.rawdata)
+
+    def feed(self, data: str) -> None:
+        self.fed += len(data)
+        super().feed(data)
+
+
+def scan_for_flag(
+    chunks: Iterable[str],
+    selector: str,
+    detector: Callable[[str, str], bool] = has_flag_bs4,
+) -> bool:
+    """Look for the suspicious flag while the page is being read.
+
+    A start tag that has the tag name and all class names and ids of the selector is a
+    candidate. Start tags are found with the tokenizer BeautifulSoup uses, so quotes,
+    comments, scripts and stylesheets are handled the same way. The page is only
+    tokenized up to the last occurrence of the first class name or id, since a candidate
+    contains it. Pages without candidates can't contain the flag, so they are ruled out
+    without being parsed. At the first candidate, the page read so far is parsed and
+    reading stops if the flag is found. Otherwise the whole page is parsed at the end.
+    Selectors without selector_tokens are always matched against the whole page.
+
+    :param chunks: The HTML of the NFT page in chunks, e.g. from Response.iter_content
+    :param selector: CSS selector to find the suspicious flag
+    :param detector: Detector that parses the HTML, one of DETECTORS
+    :return: Whether the page contains an element matching the selector
+    """
+    tokens = selector_tokens(selector)
+    if not tokens:
+        return detector("".join(chunks), selector)
+    tag_name = re.match(r"[a-zA-Z][\w-]*", _last_compound(selector))
+    finder = _CandidateFinder(tag_name.group().lower() if tag_name else None, tokens)
+
+    html = ""
+    last_token_end = 0
+    for chunk in chunks:
+        # Occurrences can span the previous chunk
+        search_start = max(0, len(html) - len(tokens[0]) + 1)
+        html += chunk
+        if finder.found:
+            continue
+        position = html.rfind(tokens[0], search_start)
+        if position != -1:
+            last_token_end = position + len(tokens[0])
+        if finder.consumed < last_token_end:
+            finder.feed(html[finder.fed :])
+            if finder.found and detector(html, selector):
+                return True
+
+    if not finder.found and finder.consumed < last_token_end:
+        finder.feed(html[finder.fed :])
+        finder.close()
+    return finder.found and detector(html, selector)
+
+
 def is_nft_suspicious(
-    nft_url: str, session: requests.Session, selector: str
+    nft_url: str,
+    session: requests.Session,
+    selector: str,
+    detector: str = "bs4",
+    prefilter: bool = True,
 ) -> Optional[Dict]:
     """Download and parse the NFT page to check if it is flagged as suspicious
 
     :param nft_url: URL of the NFT page
     :param session: A requests.Session object
     :param selector: CSS selector to find the suspicious flag
+    :param detector: Name of the detector that parses the page, one of DETECTORS
+    :param prefilter: Scan the page while it is downloaded with scan_for_flag,
+        instead of parsing the whole page
     :return: A dict with relevant information about the NFT and whether it is suspicious or not
     """
     logging.debug(f"Scraping NFT with link: {nft_url}")
     if selector is None or selector == "":
         logging.error("No selector provided")
         raise Exception("No selector provided")
+    has_flag = DETECTORS[detector]
 
     try:
-        res = session.get(nft_url)
+        with session.get(nft_url, stream=True) as res:
+            if res.status_code == 200:
+                if prefilter:
+                    res.encoding = res.encoding or "utf-8"
+                    is_suspicious = scan_for_flag(
+                        res.iter_content(chunk_size=65536, decode_unicode=True),  # type: ignore
+                        selector,
+                        has_flag,
+                    )
+                else:
+                    is_suspicious = has_flag(res.text, selector)
+            else:
+                text = res.text
     except requests.exceptions.ChunkedEncodingError as error:
         logging.error(
             f"Error while trying to scrape {nft_url}\nWill retry the request..."
         )
         logging.debug(error)
-        return is_nft_suspicious(nft_url, session, selector)
+        return is_nft_suspicious(nft_url, session, selector, detector, prefilter)
 
     if res.status_code == 200:
 
-        soup = BeautifulSoup(res.text, "html.parser")
-        soup.script.decompose()
-        is_suspicious = len(soup.select(selector)) > 0
-
         nft_data = {
             "token_id": nft_url.split("/")[-1],
             "url": nft_url,
@@ -112,10 +265,20 @@ def is_nft_suspicious(
         return None
     else:
         logging.error(f"Error while trying to scrape NFT with link {nft_url}")
-        logging.error(res.text)
+        logging.error(text)
         return None
 
 
+def get_nft_url(contract_address: str, token_id: int) -> str:
+    """Get the OpenSea URL of an NFT
+
+    :param contract_address: Contract address of the collection
+    :param token_id: Token id of the NFT
+    :return: The OpenSea URL of the NFT
+    """
+    return f"https://opensea.io/assets/ethereum/{contract_address}/{token_id}"
+
+
 def list_collection_nfts_urls(
     contract_address: str, lower_id: int, upper_id: int
 ) -> List[str]:
@@ -126,10 +289,80 @@ def list_collection_nfts_urls(
     :param upper_id: Upper bound token id
     :return: list of the OpenSea URLs of NFTs
     """
-    nft_urls = []
+    return [get_nft_url(contract_address, i) for i in range(lower_id, upper_id + 1)]
+
+
+def get_cached_token_ids(collection_cache: pd.DataFrame) -> Set[int]:
+    """Get the token ids of the NFTs in the scrape cache, in a single pass over the cache.
+
+    :param collection_cache: The cache, as returned by load_scrape_cache
+    :return: The set of scraped token ids
+    """
+    token_ids = pd.to_numeric(collection_cache["token_id"], errors="coerce").dropna()
+    return set(token_ids.astype(int).tolist())
+
+
+def iter_pending_nfts_urls(
+    contract_address: str, lower_id: int, upper_id: int, scraped: Set[int]
+) -> Iterator[str]:
+    """Lazily generate the OpenSea URLs of the NFTs that aren't scraped yet
+
+    :param contract_address: Contract address of the collection
+    :param lower_id: Lower bound token id
+    :param upper_id: Upper bound token id
+    :param scraped: Token ids to skip, e.g. from get_cached_token_ids
+    :return: An iterator of the OpenSea URLs of NFTs
+    """
     for i in range(lower_id, upper_id + 1):
-        nft_urls.append(f"https://opensea.io/assets/ethereum/{contract_address}/{i}")
-    return nft_urls
+        if i not in scraped:
+            yield get_nft_url(contract_address, i)
+
+
+def iter_scrape_results(
+    nft_urls: Iterable[str],
+    session: requests.Session,
+    selector: str,
+    threads: int,
+    detector: str = "bs4",
+    prefilter: bool = True,
+) -> Iterator[Optional[Dict]]:
+    """Scrape NFT pages with a long-lived thread pool and yield the results as they complete.
+
+    New URLs are submitted as soon as earlier ones complete, so a slow page
+    doesn't hold up the others. At most 2 * threads URLs are in flight.
+
+    :param nft_urls: The OpenSea URLs of the NFTs
+    :param session: A requests.Session object, shared by all threads
+    :param selector: CSS selector to find the suspicious flag
+    :param threads: Number of pages scraped concurrently
+    :param detector: Name of the detector that parses the pages, one of DETECTORS
+    :param prefilter: Scan the pages while they are downloaded, see is_nft_suspicious
+    :return: An iterator of the results of is_nft_suspicious, in order of completion
+    """
+    scrape = functools.partial(
+        is_nft_suspicious,
+        session=session,
+        selector=selector,
+        detector=detector,
+        prefilter=prefilter,
+    )
+    urls = iter(nft_urls)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+        pending = set()
+        for url in urls:
+            pending.add(executor.submit(scrape, url))
+            if len(pending) >= 2 * threads:
+                break
+
+        while pending:
+            done, pending = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                yield future.result()
+                next_url = next(urls, None)
+                if next_url is not None:
+                    pending.add(executor.submit(scrape, next_url))
 
 
 def main(
@@ -142,6 +375,9 @@ def main(
     upper_id: int,
     total_supply: int,
     keep_cache: bool,
+    threads: int = 8,
+    detector: str = "bs4",
+    prefilter: bool = True,
 ) -> None:
     """Main function to scrape all NFTs in a collection and check if they are suspicious
 
@@ -149,7 +385,11 @@ def main(
     :param selector: CSS selector to find the suspicious flag
     :param total_retries: Total number of retries to allow.
     :param backoff_factor: A backoff factor to apply between attempts after the second try.
-    :param batch_size: Batch size of NFT URLs to be processed
+    :param batch_size: Number of results to collect before appending them to the cache.
+        Scraping stops after this many NFTs in a row are not found.
+    :param threads: Number of NFT pages scraped concurrently
+    :param detector: Name of the detector that parses the pages, one of DETECTORS
+    :param prefilter: Scan the pages while they are downloaded, see is_nft_suspicious
     """
     session = misc.mount_session(
         allowed_methods=["HEAD", "GET", "OPTIONS"],
@@ -157,6 +397,7 @@ def main(
         backoff_factor=backoff_factor,
         raise_on_status=False,
         user_agent="Mozilla/5.0 (X11; Linux x86_64; rv:93.0) Gecko/20100101 Firefox/93.0",
+        pool_maxsize=threads,
     )
     if lower_id is None and upper_id is None and total_supply is None:
         upper_lower_total = get_upper_lower_total(contract_address)
@@ -164,44 +405,49 @@ def main(
         upper_id = upper_lower_total["upper_id"]
         total_supply = upper_lower_total["total_supply"]
 
-    collection_nfts_urls = list_collection_nfts_urls(
-        contract_address=contract_address, lower_id=lower_id, upper_id=upper_id
-    )
-
-    logging.info(f"Collection contains {len(collection_nfts_urls)} NFTs")
+    logging.info(f"Collection contains {upper_id - lower_id + 1} NFTs")
 
     collection_cache = load_scrape_cache(contract_address)
     logging.info(f"Found {len(collection_cache)} NFTs in collection cache")
 
-    for index, nft in collection_cache.iterrows():
-        if nft["url"] in collection_nfts_urls:
-            logging.debug(f"NFT to be scraped already in cache. Skipping {nft['url']}")
-            collection_nfts_urls.remove(nft["url"])
-    logging.info(f"Scraping a list of {len(collection_nfts_urls)} NFTs")
-
-    nft_urls_batches = [
-        collection_nfts_urls[i : i + batch_size]
-        for i in range(0, len(collection_nfts_urls), batch_size)
-    ]
-    for index, url_batch in enumerate(nft_urls_batches):
-        logging.info(f"Scraped {index * batch_size} NFT URLs so far")
-
-        batch = [(url, session, selector) for url in list(url_batch)]
-
-        with multiprocessing.Pool(multiprocessing.cpu_count() - 1) as p:
-            results = p.starmap(is_nft_suspicious, batch)
-            results = list(filter(None, results))
-            if results == []:
-                logging.info("Reached a batch of NFTs not found. Exiting...")
-                return
-
-            df = pd.DataFrame(results)
-            df.to_csv(
-                f"{config.SUSPICIOUS_NFTS_FOLDER}/.cache/{contract_address}.csv",
-                mode="a",
-                header=False,
-                index=False,
-            )
+    cached_ids = get_cached_token_ids(collection_cache)
+    num_cached = sum(lower_id <= token_id <= upper_id for token_id in cached_ids)
+    logging.info(f"Scraping a list of {upper_id - lower_id + 1 - num_cached} NFTs")
+    collection_nfts_urls = iter_pending_nfts_urls(
+        contract_address, lower_id, upper_id, cached_ids
+    )
+
+    cache_file = f"{config.SUSPICIOUS_NFTS_FOLDER}/.cache/{contract_address}.csv"
+
+    def append_to_cache(results: List[Dict]) -> None:
+        pd.DataFrame(results).to_csv(cache_file, mode="a", header=False, index=False)
+
+    results = []
+    scraped = 0
+    not_found = 0
+    for result in iter_scrape_results(
+        collection_nfts_urls, session, selector, threads, detector, prefilter
+    ):
+        scraped += 1
+        if scraped % batch_size == 0:
+            logging.info(f"Scraped {scraped} NFT URLs so far")
+        if result is None:
+            not_found += 1
+            if not_found >= batch_size:
+                logging.info(f"Reached {not_found} NFTs in a row not found. Exiting...")
+                break
+            continue
+        not_found = 0
+
+        results.append(result)
+        if len(results) >= batch_size:
+            append_to_cache(results)
+            results = []
+
+    if results:
+        append_to_cache(results)
+    if not_found >= batch_size:
+        return
 
     df = pd.read_csv(f"{config.SUSPICIOUS_NFTS_FOLDER}/.cache/{contract_address}.csv")
     total_scraped_urls = df.shape[0]
@@ -300,11 +546,36 @@ def _cli_parser() -> argparse.ArgumentParser:
     parser.add_argument(
         "-b",
         "--batch-size",
-        help="Batch size of NFT URLs to be processed",
+        help="Number of results to collect before appending them to the cache. Scraping stops after this many NFTs in a row are not found",
         required=False,
         type=int,
         default=50,
     )
+    parser.add_argument(
+        "-t",
+        "--threads",
+        help="Number of NFT pages scraped concurrently",
+        required=False,
+        type=int,
+        default=8,
+    )
+    parser.add_argument(
+        "--detector",
+        help="HTML parser used to find the suspicious flag. selectolax is much faster but requires the optional selectolax package",
+        required=False,
+        type=str,
+        default="bs4",
+        choices=list(DETECTORS),
+    )
+    parser.add_argument(
+        "--prefilter",
+        help="Scan the pages while they are downloaded and only parse the pages that may contain the flag",
+        type=misc.strtobool,
+        const=True,
+        nargs="?",
+        default=True,
+        choices=[True, False],
+    )
     parser.add_argument(
         "--lower_id",
         help="Lower bound token ID of the collection",
@@ -360,4 +631,7 @@ if __name__ == "__main__":
         upper_id=args.upper_id,
         total_supply=args.total_supply,
         keep_cache=args.keep_cache,
+        threads=args.threads,
+        detector=args.detector,
+        prefilter=args.prefilter,
     )
@@ -0,0 +1,281 @@
+import argparse
+import logging
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import special, stats
+
+from honestnft_utils import config, datasets
+
+
+def _count_at_most(
+    ranks: np.ndarray, population: np.ndarray, num_tokens: Optional[int]
+) -> np.ndarray:
+    """Count the tokens with a rank of at most each of ranks.
+
+    :param ranks: The ranks to look up
+    :param population: Sorted ranks of all minted tokens
+    :param num_tokens: Number of ranks in the collection. If set, ranks are assumed
+        to be uniform over 1..num_tokens, like in the KS test.
+    :return: The number of tokens per rank
+    """
+    if num_tokens is None:
+        return np.asarray(np.searchsorted(population, ranks, side="right"))
+    return np.asarray(np.clip(np.floor(ranks), 0, num_tokens), dtype=np.int64)
+
+
+def _best_rank_pvalues(
+    total: int, at_most_best: np.ndarray, minted: np.ndarray
+) -> np.ndarray:
+    """Probability that a random sample of minted tokens contains at least one of the
+    at_most_best tokens, i.e. 1 - C(total - at_most_best, minted) / C(total, minted).
+
+    Computed with log-gamma functions, because scipy's hypergeometric sf loops in Python.
+    """
+    remaining = total - at_most_best
+    possible = remaining >= minted
+    log_none = np.where(
+        possible,
+        special.gammaln(remaining + 1)
+        - special.gammaln(np.where(possible, remaining - minted, 0) + 1)
+        - special.gammaln(total + 1)
+        + special.gammaln(total - minted + 1),
+        -np.inf,
+    )
+    return np.asarray(np.clip(-np.expm1(log_none), 0, 1))
+
+
+def _rare_hit_pvalues(
+    rare_hits: np.ndarray, total: int, num_rare: int, minted: np.ndarray
+) -> np.ndarray:
+    """Probability of at least rare_hits rare tokens in a random sample of minted tokens.
+
+    There are only a few distinct (rare_hits, minted) pairs, so the hypergeometric
+    tail is only computed once per pair.
+    """
+    pairs, inverse = np.unique(
+        np.stack([rare_hits, minted], axis=1), axis=0, return_inverse=True
+    )
+    pvalues = stats.hypergeom.sf(pairs[:, 0] - 1, total, num_rare, pairs[:, 1])
+    return np.asarray(pvalues[inverse.ravel()])
+
+
+def _collection_counts(
+    data: pd.DataFrame, top_n: int, num_tokens: Optional[int]
+) -> Tuple[np.ndarray, int, int]:
+    """Get the rank population of a collection.
+
+    :return: The sorted ranks of all minted tokens, the number of tokens
+        and the number of rare tokens
+    """
+    population = np.sort(data["rank"].dropna().to_numpy(dtype=np.float64))
+    total = len(population) if num_tokens is None else num_tokens
+    num_rare = int(_count_at_most(np.array([top_n]), population, num_tokens)[0])
+    return population, total, num_rare
+
+
+def transaction_outcomes(
+    data: pd.DataFrame, top_n: int = 150, num_tokens: Optional[int] = None
+) -> pd.DataFrame:
+    """Summarize every mint transaction with a single groupby over txid.
+
+    Under random assignment a transaction that minted m tokens got a random sample
+    of m tokens out of the collection, so both probabilities are hypergeometric:
+
+    - pvalue_best: probability that the best rank of the transaction is at least as low
+    - pvalue_rare: probability of at least as many tokens in the top_n ranks
+
+    :param data: Minting data with the columns txid, to_account, TOKEN_ID and rank
+    :param top_n: Tokens with a rank of at most top_n count as rare
+    :param num_tokens: Number of ranks in the collection. (default: number of rows in data)
+    :return: A DataFrame indexed by txid with the columns to_account, num_minted,
+        best_rank, best_token, rare_hits, pvalue_best and pvalue_rare
+    """
+    ranked = data[data["rank"].notna()]
+    population, total, num_rare = _collection_counts(data, top_n, num_tokens)
+
+    # After sorting by rank, the first row of every transaction holds its best token
+    ranked = ranked.sort_values("rank", kind="stable")
+    transactions = (
+        ranked.assign(rare=ranked["rank"] <= top_n)
+        .groupby("txid", sort=False, observed=True)
+        .agg(
+            to_account=("to_account", "first"),
+            num_minted=("rank", "size"),
+            best_rank=("rank", "first"),
+            best_token=("TOKEN_ID", "first"),
+            rare_hits=("rare", "sum"),
+        )
+    )
+
+    minted = transactions["num_minted"].to_numpy()
+    at_most_best = _count_at_most(
+        transactions["best_rank"].to_numpy(dtype=np.float64), population, num_tokens
+    )
+    # P(best rank <= observed) = 1 - P(no token with a rank <= observed)
+    transactions["pvalue_best"] = _best_rank_pvalues(total, at_most_best, minted)
+    transactions["pvalue_rare"] = _rare_hit_pvalues(
+        transactions["rare_hits"].to_numpy(), total, num_rare, minted
+    )
+    return transactions
+
+
+def wallet_sequences(
+    transactions: pd.DataFrame,
+    num_tokens: int,
+    num_rare: int,
+    min_transactions: int = 1,
+) -> pd.DataFrame:
+    """Combine the transaction outcomes of every wallet.
+
+    - log_probability: log of the joint probability of the wallet's sequence of
+      transaction outcomes, i.e. the sum of log(pvalue_best)
+    - pvalue: Fisher's combination of pvalue_best over the wallet's transactions.
+      Transactions are treated as independent, which is close for large collections.
+    - pvalue_rare: exact hypergeometric tail of the wallet's total rare hits
+
+    :param transactions: The output of transaction_outcomes
+    :param num_tokens: Number of ranks in the collection
+    :param num_rare: Number of rare tokens in the collection
+    :param min_transactions: Only include wallets with at least this many transactions
+    :return: A DataFrame indexed by address, sorted by pvalue
+    """
+    wallets = (
+        transactions.assign(log_pvalue=np.log(transactions["pvalue_best"]))
+        .groupby("to_account", observed=True)
+        .agg(
+            num_transactions=("num_minted", "size"),
+            num_minted=("num_minted", "sum"),
+            best_rank=("best_rank", "min"),
+            rare_hits=("rare_hits", "sum"),
+            log_probability=("log_pvalue", "sum"),
+        )
+    )
+    wallets.index.name = "address"
+    wallets = wallets[wallets["num_transactions"] >= min_transactions].copy()
+    wallets["pvalue"] = stats.chi2.sf(
+        -2 * wallets["log_probability"], 2 * wallets["num_transactions"]
+    )
+    wallets["pvalue_rare"] = _rare_hit_pvalues(
+        wallets["rare_hits"].to_numpy(),
+        num_tokens,
+        num_rare,
+        wallets["num_minted"].to_numpy(),
+    )
+    return wallets.sort_values(["pvalue", "pvalue_rare"], kind="stable")
+
+
+def transaction_luck(
+    data: pd.DataFrame,
+    top_n: int = 150,
+    num_tokens: Optional[int] = None,
+    min_transactions: int = 1,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Run the transaction level luck analysis.
+
+    :param data: Minting data with the columns txid, to_account, TOKEN_ID and rank
+    :param top_n: Tokens with a rank of at most top_n count as rare
+    :param num_tokens: Number of ranks in the collection. (default: number of rows in data)
+    :param min_transactions: Only include wallets with at least this many transactions
+    :return: The outcome of every transaction and the combined outcomes of every wallet
+    """
+    transactions = transaction_outcomes(data, top_n=top_n, num_tokens=num_tokens)
+    _, total, num_rare = _collection_counts(data, top_n, num_tokens)
+    wallets = wallet_sequences(
+        transactions, total, num_rare, min_transactions=min_transactions
+    )
+    return transactions, wallets
+
+
+def main(
+    collection: str,
+    top_n: int = 150,
+    num_tokens: Optional[int] = None,
+    min_transactions: int = 1,
+) -> pd.DataFrame:
+    """Run the transaction level luck analysis on the minting data of a collection and
+    save the wallets to data/grifters/<collection>_transaction_luck.csv and the
+    transactions to data/grifters/<collection>_transactions.csv.
+
+    :param collection: The collection name, as used in data/minting_data
+    :param top_n: Tokens with a rank of at most top_n count as rare
+    :param num_tokens: Number of ranks in the collection. (default: number of minted tokens)
+    :param min_transactions: Only include wallets with at least this many transactions
+    :return: The wallets DataFrame
+    """
+    data = datasets.load_minting(
+        collection, columns=["txid", "to_account", "TOKEN_ID", "rank"]
+    )
+    transactions, wallets = transaction_luck(
+        data, top_n=top_n, num_tokens=num_tokens, min_transactions=min_transactions
+    )
+    logging.info(
+        f"{len(transactions)} transactions by {len(wallets)} wallets, "
+        f"{(transactions['num_minted'] > 1).sum()} with more than one token"
+    )
+    logging.info(wallets.head(10).to_string())
+
+    transactions.to_csv(f"{config.GRIFTERS_DATA_FOLDER}/{collection}_transactions.csv")
+    wallets.to_csv(f"{config.GRIFTERS_DATA_FOLDER}/{collection}_transaction_luck.csv")
+    return wallets
+
+
+def _cli_parser() -> argparse.ArgumentParser:
+    """
+    Create the command line argument parser
+    """
+    parser = argparse.ArgumentParser(
+        description="Analyze the luck of every mint transaction and wallet, accounting for batch mints."
+    )
+    parser.add_argument(
+        "-c",
+        "--collection",
+        help="Collection name, as used in data/minting_data",
+        required=True,
+        type=str,
+    )
+    parser.add_argument(
+        "-n",
+        "--top_n",
+        help="Tokens with a rank of at most top_n count as rare",
+        required=False,
+        type=int,
+        default=150,
+    )
+    parser.add_argument(
+        "--num_tokens",
+        help="Number of ranks in the collection. (default: number of minted tokens)",
+        required=False,
+        type=int,
+    )
+    parser.add_argument(
+        "--min_transactions",
+        help="Only include wallets with at least this many transactions",
+        required=False,
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "--log",
+        help="Set the desired log level",
+        required=False,
+        type=str,
+        default="INFO",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
+    )
+    return parser
+
+
+if __name__ == "__main__":
+
+    args = _cli_parser().parse_args()
+
+    logging.basicConfig(level=args.log)
+
+    main(
+        collection=args.collection,
+        top_n=args.top_n,
+        num_tokens=args.num_tokens,
+        min_transactions=args.min_transactions,
+    )
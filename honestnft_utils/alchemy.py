@@ -1,50 +1,112 @@
-from typing import List, Optional
+from array import array
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional
 
+import numpy as np
 import requests
 
-from honestnft_utils import config
+from honestnft_utils import config, misc
 
+ALCHEMY_NFT_URL = (
+    "https://eth-mainnet.g.alchemy.com/nft/v2/{api_key}/getNFTsForCollection"
+)
+PAGE_SIZE = 100
 
-def get_all_token_ids(
-    contract_address: str, _offset_token_id: Optional[str] = None, _have: List[int] = []
-) -> List[int]:
+
+def iter_token_ids(
+    contract_address: str,
+    start_token: Optional[str] = None,
+    cursor_file: Optional[str] = None,
+    session: Optional[requests.Session] = None,
+) -> Iterator[int]:
+    """Iterate over all token IDs of an NFT contract, one page at a time.
+
+    With a cursor_file, the nextToken of the following page is saved once every token ID
+    of a page has been consumed, so an interrupted enumeration resumes where it stopped.
+    The file is removed once all pages are fetched.
+
+    :param contract_address: Contract address
+    :param start_token: Token ID to start from, as returned in nextToken
+    :param cursor_file: Path of a JSON file to save the nextToken to and resume from
+    :param session: The requests session to use. (default: misc.mount_session())
+    :raises Exception: if the Alchemy API key is invalid or a page fails
+    :return: An iterator of token IDs
+    """
+    query = {"contractAddress": contract_address}
+    cursor_path = Path(cursor_file) if cursor_file is not None else None
+    if cursor_path is not None and start_token is None:
+        start_token = misc.load_cursor(cursor_path, query)
+
+    if session is None:
+        session = misc.mount_session()
+    url = ALCHEMY_NFT_URL.format(api_key=config.ALCHEMY_API_KEY)
+    headers = {"Accept": "application/json"}
+
+    while True:
+        params = {
+            **query,
+            "withMetadata": "false",
+            "limit": str(PAGE_SIZE),
+            "startToken": start_token,
+        }
+        response = session.get(url, headers=headers, params=params)
+        if response.status_code == 401:
+            raise Exception("Invalid or missing Alchemy API key")
+        if response.status_code != 200:
+            print(response.text)
+            raise Exception(f"Failed to get token IDs for contract {contract_address}")
+
+        decoded_response = response.json()
+        for entry in decoded_response["nfts"]:
+            yield int(entry["id"]["tokenId"], 0)
+
+        start_token = decoded_response.get("nextToken")
+        if not start_token:
+            break
+        if cursor_path is not None:
+            misc.save_cursor(cursor_path, query, start_token)
+
+    if cursor_path is not None and cursor_path.exists():
+        cursor_path.unlink()
+
+
+def get_all_token_ids(contract_address: str) -> List[int]:
     """Get all token IDs for a given NFT contract.
 
+    To resume an interrupted enumeration, use iter_token_ids with a cursor_file.
+
     :param contract_address: Contract address
-    :param _start_token_id: Offset token ID used for pagination. (Used internally)
-    :param _have: List of already fetched token_ids. (Used internally)
     :return: A list of all token_ids for the given contract.
     """
-    all_data = []
+    return list(iter_token_ids(contract_address))
 
-    all_data.extend(_have)
 
-    url = f"https://eth-mainnet.g.alchemy.com/nft/v2/{config.ALCHEMY_API_KEY}/getNFTsForCollection"
+def get_token_id_array(contract_address: str) -> np.ndarray:
+    """Get all token IDs for a given NFT contract as a compact array.
 
-    query = {
-        "contractAddress": contract_address,
-        "withMetadata": "false",
-        "limit": "100",
-        "startToken": _offset_token_id,
-    }
-    headers = {"Accept": "application/json"}
+    Token IDs are collected in an array('Q') of 8 bytes per token instead of a list of ints.
 
-    response = requests.get(url, headers=headers, params=query)
-    if response.status_code == 200:
-        decoded_response = response.json()
-        for entry in decoded_response["nfts"]:
-            all_data.append(int(entry["id"]["tokenId"], 0))
-
-        if decoded_response.get("nextToken"):
-            return get_all_token_ids(
-                contract_address=contract_address,
-                _offset_token_id=decoded_response["nextToken"],
-                _have=all_data,
-            )
-        else:
-            return all_data
-    elif response.status_code == 401:
-        raise Exception("Invalid or missing Alchemy API key")
-    else:
-        print(response.text)
-        raise Exception(f"Failed to get token IDs for contract {contract_address}")
+    :param contract_address: Contract address
+    :raises OverflowError: if a token ID doesn't fit in 64 bits (e.g. hashed token IDs)
+    :return: A uint64 array of all token_ids for the given contract.
+    """
+    token_ids = array("Q", iter_token_ids(contract_address))
+    return np.frombuffer(token_ids, dtype=np.uint64)
+
+
+def existence_bitmap(
+    token_ids: Iterable[int], lower_id: int, upper_id: int
+) -> np.ndarray:
+    """Mark which token IDs of a range exist.
+
+    :param token_ids: The existing token IDs, e.g. from iter_token_ids
+    :param lower_id: Lower bound token id
+    :param upper_id: Upper bound token id (inclusive)
+    :return: A boolean array where element i is True if lower_id + i exists.
+        Token IDs outside of the range are ignored.
+    """
+    bitmap = np.zeros(upper_id - lower_id + 1, dtype=bool)
+    for token_id in token_ids:
+        if lower_id <= token_id <= upper_id:
+            bitmap[token_id - lower_id] = True
+    return bitmap
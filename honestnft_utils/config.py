@@ -55,6 +55,8 @@ PRE_REVEAL_SALES_FOLDER = f"{ROOT_DATA_FOLDER}/pre-reveal_sales"
 SALES_DATA_FOLDER = f"{ROOT_DATA_FOLDER}/sales_data"
 GRIFTERS_DATA_FOLDER = f"{ROOT_DATA_FOLDER}/grifters"
 SUSPICIOUS_NFTS_FOLDER = f"{ROOT_DATA_FOLDER}/suspicious_nfts"
+WAREHOUSE_FILE = f"{ROOT_DATA_FOLDER}/warehouse.sqlite"
+EVENTS_FOLDER = f"{ROOT_DATA_FOLDER}/events"
 
 ###
 # Misc
@@ -0,0 +1,306 @@
+import os
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from honestnft_utils import config
+
+CACHE_FOLDER_NAME = ".cache"
+MINTING_CATEGORICAL_COLUMNS = ["txid", "to_account", "current_owner"]
+OUTPUT_FORMATS = ["csv", "parquet", "arrow"]
+FILE_EXTENSIONS = {"csv": ".csv", "parquet": ".parquet", "arrow": ".arrow"}
+INTEGER_COLUMNS = ["Unnamed: 0", "TOKEN_ID", "Rank", "rank"]
+
+
+def _downcast_ints(df: pd.DataFrame, columns: Iterable[str]) -> pd.DataFrame:
+    """Store integer columns as int32 when the values fit, otherwise as int64.
+    Columns with missing values are stored as float32.
+
+    :param df: The DataFrame to update in place
+    :param columns: The columns to downcast. Columns that don't exist are ignored.
+    :return: The updated DataFrame
+    """
+    int32 = np.iinfo(np.int32)
+    for column in columns:
+        if column not in df.columns:
+            continue
+        values = pd.to_numeric(df[column])
+        if values.isna().any():
+            df[column] = values.astype(np.float32)
+        elif values.min() >= int32.min and values.max() <= int32.max:
+            df[column] = values.astype(np.int32)
+        else:
+            df[column] = values.astype(np.int64)
+    return df
+
+
+def output_path(csv_path: str, output_format: str = "csv") -> str:
+    """Get the path of a data file in the given output format.
+
+    :param csv_path: Path of the file as CSV file, e.g. data/raw_attributes/collection.csv
+    :param output_format: One of OUTPUT_FORMATS
+    :return: The path with the matching file extension
+    """
+    if output_format not in FILE_EXTENSIONS:
+        raise ValueError(
+            f"Unknown output format {output_format}, expected one of {OUTPUT_FORMATS}"
+        )
+    return str(Path(csv_path).with_suffix(FILE_EXTENSIONS[output_format]))
+
+
+def find_data_file(csv_path: str) -> str:
+    """Find the existing data file for a CSV path in any of the output formats.
+    CSV files take precedence over columnar files.
+
+    :param csv_path: Path of the file as CSV file
+    :return: The path of the existing file, or csv_path if no file exists
+    """
+    for output_format in OUTPUT_FORMATS:
+        path = output_path(csv_path, output_format)
+        if os.path.exists(path):
+            return path
+    return csv_path
+
+
+def _to_columnar(df: pd.DataFrame, index: bool) -> pd.DataFrame:
+    """Prepare a DataFrame for a columnar file without losing information.
+    The index becomes a regular column, integer id/rank columns are downcast
+    and text columns are dictionary encoded.
+    """
+    if index:
+        df = df.reset_index()
+    else:
+        df = df.reset_index(drop=True)
+    df = _downcast_ints(df.copy(), INTEGER_COLUMNS)
+    for column in df.columns:
+        if column == "TOKEN_NAME" or not pd.api.types.is_object_dtype(df[column]):
+            continue
+        # Traits can mix numbers and text, which columnar formats don't support
+        values = df[column]
+        df[column] = values.where(values.isna(), values.astype(str)).astype("category")
+    return df
+
+
+def write_dataframe(
+    df: pd.DataFrame, csv_path: str, output_format: str = "csv", index: bool = True
+) -> str:
+    """Write a DataFrame as CSV, Parquet or Arrow (Feather) file.
+
+    Columnar files are zstd compressed and store text columns dictionary encoded.
+    They require the optional pyarrow package.
+
+    :param df: The DataFrame to write
+    :param csv_path: Path of the file as CSV file. The extension is replaced for other formats.
+    :param output_format: One of OUTPUT_FORMATS
+    :param index: Whether to write the index
+    :return: The path of the written file
+    """
+    path = output_path(csv_path, output_format)
+    if output_format == "csv":
+        df.to_csv(path, index=index)
+    elif output_format == "parquet":
+        _to_columnar(df, index).to_parquet(path, index=False, compression="zstd")
+    else:
+        _to_columnar(df, index).to_feather(path, compression="zstd")
+    return path
+
+
+def read_dataframe(path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Read a CSV, Parquet or Arrow (Feather) file based on its file extension.
+
+    :param path: Path of the file
+    :param columns: Only read these columns
+    :return: The DataFrame
+    """
+    suffix = Path(path).suffix
+    if suffix == FILE_EXTENSIONS["parquet"]:
+        return pd.read_parquet(path, columns=columns)
+    if suffix == FILE_EXTENSIONS["arrow"]:
+        return pd.read_feather(path, columns=columns)
+    return pd.read_csv(path, usecols=columns)
+
+
+def convert_data_file(
+    csv_path: str, output_format: str, remove_source: bool = False
+) -> str:
+    """Convert an existing CSV data file to another output format.
+
+    :param csv_path: Path of the CSV file
+    :param output_format: One of OUTPUT_FORMATS
+    :param remove_source: Remove the CSV file after conversion
+    :return: The path of the converted file
+    """
+    df = pd.read_csv(csv_path)
+    path = write_dataframe(df, csv_path, output_format, index=False)
+    if remove_source and path != csv_path:
+        os.remove(csv_path)
+    return path
+
+
+def read_csv_cached(
+    csv_path: str, reader: Callable[[str], pd.DataFrame], use_cache: bool = True
+) -> pd.DataFrame:
+    """Parse a CSV file with the given reader and cache the result as a Feather sidecar.
+
+    The sidecar is stored in a .cache folder next to the CSV file and is only used
+    as long as the CSV file keeps the same modification time.
+    Caching requires the optional pyarrow package and is skipped without it.
+
+    :param csv_path: Path of the CSV file
+    :param reader: Function that parses the CSV file into a DataFrame
+    :param use_cache: Whether to read and write the sidecar
+    :return: The parsed DataFrame
+    """
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        use_cache = False
+
+    if not use_cache:
+        return reader(csv_path)
+
+    source = Path(csv_path)
+    sidecar = source.parent.joinpath(CACHE_FOLDER_NAME, f"{source.stem}.feather")
+    source_mtime = source.stat().st_mtime_ns
+
+    if sidecar.exists() and sidecar.stat().st_mtime_ns == source_mtime:
+        return pd.read_feather(sidecar)
+
+    df = reader(csv_path)
+    sidecar.parent.mkdir(parents=True, exist_ok=True)
+    df.reset_index(drop=True).to_feather(sidecar)
+    # Tie the sidecar to this version of the CSV file
+    os.utime(sidecar, ns=(source_mtime, source_mtime))
+    return df
+
+
+def read_attributes_csv(csv_path: str) -> pd.DataFrame:
+    """Read a raw attributes CSV file with compact dtypes.
+    Token IDs are stored as int32 and all trait columns as categoricals.
+
+    :param csv_path: Path of the CSV file
+    :return: The attributes DataFrame
+    """
+    columns = pd.read_csv(csv_path, nrows=0).columns
+    dtypes = {
+        column: "category"
+        for column in columns
+        if column not in ("TOKEN_ID", "TOKEN_NAME")
+    }
+    df = pd.read_csv(csv_path, dtype=dtypes)
+    return _downcast_ints(df, ["TOKEN_ID"])
+
+
+def read_rarity_csv(csv_path: str) -> pd.DataFrame:
+    """Read a rarity CSV file with compact dtypes.
+    Token IDs and ranks are stored as int32 and the (trait) scores as float32.
+
+    :param csv_path: Path of the CSV file
+    :return: The rarity DataFrame
+    """
+    df = pd.read_csv(csv_path)
+    df = _downcast_ints(df, ["TOKEN_ID", "Rank"])
+    for column in df.columns:
+        if column in ("TOKEN_ID", "TOKEN_NAME", "Rank"):
+            continue
+        if pd.api.types.is_numeric_dtype(df[column]):
+            df[column] = df[column].astype(np.float32)
+        else:
+            df[column] = df[column].astype("category")
+    return df
+
+
+def read_minting_csv(csv_path: str) -> pd.DataFrame:
+    """Read a minting CSV file with compact dtypes.
+    Token IDs and ranks are stored as int32, transaction hashes and addresses as categoricals.
+
+    :param csv_path: Path of the CSV file
+    :return: The minting DataFrame
+    """
+    columns = pd.read_csv(csv_path, nrows=0).columns
+    dtypes = {
+        column: "category"
+        for column in columns
+        if column in MINTING_CATEGORICAL_COLUMNS
+    }
+    df = pd.read_csv(csv_path, dtype=dtypes)
+    return _downcast_ints(df, ["Unnamed: 0", "TOKEN_ID", "rank"])
+
+
+def _load_data_file(
+    csv_path: str,
+    reader: Callable[[str], pd.DataFrame],
+    use_cache: bool,
+    columns: Optional[List[str]],
+) -> pd.DataFrame:
+    """Load a data file that's stored as CSV or in one of the columnar formats."""
+    path = find_data_file(csv_path)
+    if path != csv_path:
+        return read_dataframe(path, columns=columns)
+    df = read_csv_cached(csv_path, reader, use_cache=use_cache)
+    if columns is not None:
+        df = df[columns]
+    return df
+
+
+def load_attributes(
+    collection: str, use_cache: bool = True, columns: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """Load the raw attributes of a collection from data/raw_attributes.
+
+    :param collection: The collection name
+    :param use_cache: Whether to use the binary sidecar cache
+    :param columns: Only load these columns
+    :return: The attributes DataFrame
+    """
+    return _load_data_file(
+        f"{config.ATTRIBUTES_FOLDER}/{collection}.csv",
+        read_attributes_csv,
+        use_cache,
+        columns,
+    )
+
+
+def load_rarity(
+    collection: str,
+    method: str = "raritytools",
+    use_cache: bool = True,
+    columns: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """Load the rarity data of a collection from data/rarity_data.
+
+    :param collection: The collection name
+    :param method: The rarity method used to build the file
+    :param use_cache: Whether to use the binary sidecar cache
+    :param columns: Only load these columns
+    :return: The rarity DataFrame
+    """
+    return _load_data_file(
+        f"{config.RARITY_FOLDER}/{collection}_{method}.csv",
+        read_rarity_csv,
+        use_cache,
+        columns,
+    )
+
+
+def load_minting(
+    collection: str, use_cache: bool = True, columns: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """Load the minting data of a collection from data/minting_data.
+
+    Addresses are categoricals, so group on them with observed=True
+    to avoid getting empty groups for addresses that were filtered out.
+
+    :param collection: The collection name
+    :param use_cache: Whether to use the binary sidecar cache
+    :param columns: Only load these columns
+    :return: The minting DataFrame
+    """
+    return _load_data_file(
+        f"{config.MINTING_FOLDER}/{collection}_minting.csv",
+        read_minting_csv,
+        use_cache,
+        columns,
+    )
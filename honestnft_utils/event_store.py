@@ -0,0 +1,209 @@
+import contextlib
+import datetime
+import json
+import logging
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from honestnft_utils import config, opensea
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    event_type TEXT NOT NULL,
+    event_id TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    token_id TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (event_type, event_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS events_timestamp ON events (event_type, timestamp);
+CREATE INDEX IF NOT EXISTS events_token_id ON events (event_type, token_id);
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    event_type TEXT PRIMARY KEY,
+    high_water_mark REAL,
+    synced_at REAL NOT NULL
+);
+"""
+
+
+def store_path(contract_address: str) -> Path:
+    """Get the path of the event store of a contract.
+
+    :param contract_address: The NFT contract address
+    :return: The path of the SQLite database in config.EVENTS_FOLDER
+    """
+    return Path(config.EVENTS_FOLDER).joinpath(f"{contract_address.lower()}.sqlite")
+
+
+def connect(contract_address: str) -> sqlite3.Connection:
+    """Open the event store of a contract and create the tables if needed.
+
+    Events are clustered by event_type (the primary key of a table without rowid),
+    with indexes on timestamp and token_id within each event_type.
+
+    :param contract_address: The NFT contract address
+    :return: The database connection
+    """
+    path = store_path(contract_address)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _to_timestamp(value: Union[int, float, str, None]) -> Optional[float]:
+    """Convert an ISO 8601 date in UTC or seconds since the Unix epoch to seconds since the Unix epoch."""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    timestamp = datetime.datetime.fromisoformat(value)
+    return timestamp.replace(tzinfo=datetime.timezone.utc).timestamp()
+
+
+def get_high_water_mark(conn: sqlite3.Connection, event_type: str) -> Optional[float]:
+    """Get the time of the newest event of the last completed sync.
+
+    :param conn: The event store connection
+    :param event_type: The event type
+    :return: Seconds since the Unix epoch, or None if the event type was never synced
+    """
+    row = conn.execute(
+        "SELECT high_water_mark FROM sync_state WHERE event_type = ?", (event_type,)
+    ).fetchone()
+    return None if row is None else row[0]
+
+
+def _insert_events(
+    conn: sqlite3.Connection, event_type: str, events: List[Dict[str, Any]]
+) -> int:
+    """Insert a page of events, skipping the events that are already stored.
+
+    :return: The number of new events
+    """
+    rows = []
+    for event in events:
+        # Bundle events don't have an asset
+        token_id = (event.get("asset") or {}).get("token_id")
+        rows.append(
+            (
+                event_type,
+                str(event["id"]),
+                opensea.get_event_time(event),
+                None if token_id is None else str(token_id),
+                json.dumps(event),
+            )
+        )
+    before = conn.total_changes
+    with conn:
+        conn.executemany("INSERT OR IGNORE INTO events VALUES (?, ?, ?, ?, ?)", rows)
+    return conn.total_changes - before
+
+
+def sync(
+    contract_address: str,
+    event_type: str,
+    conn: Optional[sqlite3.Connection] = None,
+    max_retries: int = 8,
+) -> int:
+    """Download the events that are newer than the high-water mark of the store.
+
+    The first sync downloads the full history. Its cursor is saved next to the store,
+    so an interrupted sync resumes where it stopped. The high-water mark only moves
+    once a sync is complete, so no events are skipped after an interruption.
+
+    :param contract_address: The NFT contract address
+    :param event_type: The event type, see opensea.get_opensea_events
+    :param conn: The event store connection. (default: a connection to the store of
+        contract_address, closed when done)
+    :param max_retries: Maximum number of retries per page
+    :return: The number of new events
+    """
+    if conn is None:
+        with contextlib.closing(connect(contract_address)) as conn:
+            return sync(contract_address, event_type, conn, max_retries)
+
+    high_water_mark = get_high_water_mark(conn, event_type)
+    cursor_file = store_path(contract_address).with_name(
+        f"{contract_address.lower()}_{event_type}.cursor.json"
+    )
+
+    pages = opensea.iter_opensea_events(
+        contract_address=contract_address,
+        event_type=event_type,
+        # Overlap the mark by a second in case the API treats the bound as exclusive,
+        # events that are already stored are skipped by their id
+        occurred_after=(
+            None if high_water_mark is None else str(int(high_water_mark) - 1)
+        ),
+        cursor_file=str(cursor_file),
+        max_retries=max_retries,
+    )
+    new_events = 0
+    for page in pages:
+        new_events += _insert_events(conn, event_type, page)
+
+    # A resumed sync only fetches the older pages, the newest event is in the store
+    (newest,) = conn.execute(
+        "SELECT MAX(timestamp) FROM events WHERE event_type = ?", (event_type,)
+    ).fetchone()
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?)",
+            (event_type, newest, time.time()),
+        )
+    logging.info(f"Synced {new_events} new {event_type} events of {contract_address}")
+    return new_events
+
+
+def get_events(
+    contract_address: str,
+    event_type: str,
+    token_id: Optional[int] = None,
+    occurred_after: Union[int, float, str, None] = None,
+    occurred_before: Union[int, float, str, None] = None,
+    limit: Optional[int] = None,
+    conn: Optional[sqlite3.Connection] = None,
+) -> List[Dict[str, Any]]:
+    """Query the stored events of a contract, in the format of opensea.get_opensea_events.
+
+    :param contract_address: The NFT contract address
+    :param event_type: The event type
+    :param token_id: Only return the events of this token
+    :param occurred_after: Only return events at or after this time. ISO 8601 date in UTC or seconds since the Unix epoch.
+    :param occurred_before: Only return events before this time. ISO 8601 date in UTC or seconds since the Unix epoch.
+    :param limit: Only return the newest limit events
+    :param conn: The event store connection. (default: a connection to the store of
+        contract_address, closed when done)
+    :return: A list of events, newest first
+    """
+    if conn is None:
+        with contextlib.closing(connect(contract_address)) as conn:
+            return get_events(
+                contract_address,
+                event_type,
+                token_id,
+                occurred_after,
+                occurred_before,
+                limit,
+                conn,
+            )
+
+    sql = "SELECT data FROM events WHERE event_type = ?"
+    params: List[Any] = [event_type]
+    if token_id is not None:
+        sql += " AND token_id = ?"
+        params.append(str(token_id))
+    if occurred_after is not None:
+        sql += " AND timestamp >= ?"
+        params.append(_to_timestamp(occurred_after))
+    if occurred_before is not None:
+        sql += " AND timestamp < ?"
+        params.append(_to_timestamp(occurred_before))
+    sql += " ORDER BY timestamp DESC"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+
+    return [json.loads(row[0]) for row in conn.execute(sql, params)]
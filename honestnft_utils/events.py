@@ -0,0 +1,133 @@
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from honestnft_utils import constants
+
+# Largest token id for which the ranks are looked up in a dense array,
+# collections with larger (e.g. hashed) token ids are joined instead
+DENSE_LOOKUP_LIMIT = 2**24
+
+# Column name -> path of the value in an OpenSea event
+BID_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "TOKEN_ID": ("asset", "token_id"),
+    "USER": ("from_account", "address"),
+    "OFFER": ("bid_amount",),
+    "DATE": ("created_date",),
+}
+SALE_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "TOKEN_ID": ("asset", "token_id"),
+    "USER": ("transaction", "from_account", "address"),
+    "SELLER": ("seller", "address"),
+    "DATE": ("created_date",),
+    "PRICE": ("total_price",),
+}
+# Columns with amounts in wei, converted to ether
+WEI_COLUMNS = ["OFFER", "PRICE"]
+
+
+def _get_path(event: Dict[str, Any], path: Tuple[str, ...]) -> Any:
+    """Get a nested value of an event, or None if any part of the path is missing."""
+    value: Any = event
+    for key in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def normalize_events(
+    events: List[Dict[str, Any]], fields: Dict[str, Tuple[str, ...]]
+) -> pd.DataFrame:
+    """Convert a list of OpenSea events into a DataFrame, one column at a time.
+
+    Missing values (e.g. the asset of bundle sales) become NaN instead of dropping the event.
+    Token ids are converted to numbers, amounts in WEI_COLUMNS from wei to ether.
+
+    :param events: The events, as returned by opensea.get_opensea_events
+    :param fields: Column name -> path of the value in an event, e.g. BID_FIELDS or SALE_FIELDS
+    :return: A DataFrame with one row per event and one column per field
+    """
+    df = pd.DataFrame(
+        {
+            column: [_get_path(event, path) for event in events]
+            for column, path in fields.items()
+        }
+    )
+    if "TOKEN_ID" in df.columns:
+        df["TOKEN_ID"] = pd.to_numeric(df["TOKEN_ID"], errors="coerce")
+    for column in WEI_COLUMNS:
+        if column in df.columns:
+            df[column] = (
+                pd.to_numeric(df[column], errors="coerce") / constants.ETHER_UNITS
+            )
+    return df
+
+
+def rank_lookup(ranks: pd.Series) -> Optional[np.ndarray]:
+    """Build a dense token id -> rank array.
+
+    :param ranks: Ranks indexed by token id, e.g. from warehouse.get_ranks
+    :return: A float array with the rank at each token id and NaN for unknown tokens,
+        or None if the token ids are too large or not integers
+    """
+    ranks = ranks[ranks.index.notna()]
+    token_ids = pd.to_numeric(pd.Series(ranks.index), errors="coerce")
+    if len(ranks) == 0 or not pd.api.types.is_integer_dtype(token_ids):
+        return None
+    if token_ids.min() < 0 or token_ids.max() >= DENSE_LOOKUP_LIMIT:
+        return None
+
+    lookup = np.full(token_ids.max() + 1, np.nan)
+    lookup[token_ids.to_numpy()] = ranks.to_numpy(dtype=np.float64)
+    return lookup
+
+
+def attach_ranks(
+    df: pd.DataFrame,
+    ranks: pd.Series,
+    token_col: str = "TOKEN_ID",
+    rank_col: str = "RANK",
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Add the rarity rank of each token to a DataFrame of events.
+
+    Ranks are looked up in a dense token id -> rank array, or with a join if the token ids
+    don't fit in one. Events without a known rank are returned separately and logged.
+
+    :param df: The events, e.g. from normalize_events
+    :param ranks: Ranks indexed by token id, e.g. from warehouse.get_ranks
+    :param token_col: The column of df with the token ids
+    :param rank_col: The name of the new rank column
+    :return: The events with a rank, and the events of unknown tokens
+    """
+    token_ids = pd.to_numeric(df[token_col], errors="coerce")
+    lookup = rank_lookup(ranks)
+    if lookup is not None:
+        values = token_ids.to_numpy(dtype=np.float64, na_value=np.nan)
+        in_range = (values >= 0) & (values < len(lookup))
+        event_ranks = np.full(len(df), np.nan)
+        event_ranks[in_range] = lookup[values[in_range].astype(np.int64)]
+    else:
+        event_ranks = (
+            df[token_col].map(ranks).to_numpy(dtype=np.float64, na_value=np.nan)
+        )
+
+    df = df.assign(**{rank_col: event_ranks})
+    known = df[rank_col].notna()
+    unknown = df[~known]
+    if len(unknown) > 0:
+        unknown_ids = unknown[token_col].dropna().unique()
+        logging.warning(
+            f"{len(unknown)} of {len(df)} events have no rank: "
+            f"{unknown[token_col].isna().sum()} without token id, "
+            f"{len(unknown_ids)} unknown tokens {[int(i) for i in unknown_ids[:10]]}"
+        )
+
+    enriched = df[known].copy()
+    enriched[rank_col] = enriched[rank_col].astype(np.int64)
+    if lookup is not None:
+        # Missing token ids turned the column into floats
+        enriched[token_col] = enriched[token_col].astype(np.int64)
+    return enriched, unknown
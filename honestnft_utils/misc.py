@@ -1,5 +1,9 @@
+import json
+import os
+import threading
+import time
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
 import requests
 from requests.adapters import HTTPAdapter
@@ -34,6 +38,7 @@ def mount_session(
     backoff_factor: float = 0.5,
     raise_on_status: bool = True,
     user_agent: Optional[str] = None,
+    pool_maxsize: int = 10,
 ) -> requests.Session:
     """Create a requests.session() with optimised strategy for retrying and respecting errors
 
@@ -42,6 +47,7 @@ def mount_session(
     :param backoff_factor: A backoff factor to apply between attempts after the second try.
     :param raise_on_status: Whether we should raise an exception, or return a response, if status falls in status_forcelist range and retries have been exhausted.
     :param user_agent: The user agent to use for the session
+    :param pool_maxsize: Number of connections to keep open per host, at least the number of threads sharing the session
     :return: A requests session with retry and error handling
     """
     retry_strategy = Retry(
@@ -53,7 +59,7 @@ def mount_session(
         raise_on_status=raise_on_status,
     )
     retry_strategy.DEFAULT_BACKOFF_MAX = 5  # type: ignore
-    adapter = HTTPAdapter(max_retries=retry_strategy)
+    adapter = HTTPAdapter(max_retries=retry_strategy, pool_maxsize=pool_maxsize)
     session = requests.Session()
 
     if user_agent is not None:
@@ -65,6 +71,61 @@ def mount_session(
     return session
 
 
+class RateLimiter:
+    """Spread requests evenly over time. Shared between threads to stay within the
+    rate limit of an API key."""
+
+    def __init__(self, requests_per_second: float):
+        """
+        :param requests_per_second: The maximum number of requests per second
+        """
+        self.interval = 1 / requests_per_second
+        self.next_time = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self) -> None:
+        """Block until the next request is allowed."""
+        with self.lock:
+            now = time.monotonic()
+            wait = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+def load_cursor(cursor_file: Path, query: Dict[str, Any]) -> Optional[str]:
+    """Load the cursor of an interrupted pagination.
+
+    :param cursor_file: The file the cursor was saved to
+    :param query: The query of the current pagination
+    :raises ValueError: if the cursor was saved for a different query
+    :return: The saved cursor or None if there is no cursor file
+    """
+    if not cursor_file.exists():
+        return None
+    with open(cursor_file) as f:
+        saved = json.load(f)
+    if saved["query"] != query:
+        raise ValueError(
+            f"{cursor_file} was saved for a different query: {saved['query']}"
+        )
+    cursor: Optional[str] = saved["cursor"]
+    return cursor
+
+
+def save_cursor(cursor_file: Path, query: Dict[str, Any], cursor: str) -> None:
+    """Save the cursor of the next page, replacing the file atomically.
+
+    :param cursor_file: The file to save the cursor to
+    :param query: The query of the current pagination
+    :param cursor: The cursor of the next page
+    """
+    temp_file = cursor_file.with_suffix(cursor_file.suffix + ".tmp")
+    with open(temp_file, "w") as f:
+        json.dump({"query": query, "cursor": cursor}, f)
+    os.replace(temp_file, cursor_file)
+
+
 def get_first_filename_in_dir(dir_path: Path) -> str:
     """Get the first filename in a directory
 
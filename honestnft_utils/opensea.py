@@ -1,11 +1,144 @@
+import concurrent.futures
+import datetime
+import logging
 import time
-from typing import Any, Dict, List, Optional
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 import requests
 
-from honestnft_utils import config
+from honestnft_utils import config, misc
 
+OPENSEA_EVENTS_URL = "https://api.opensea.io/api/v1/events"
 SLEEP = 5
+MAX_BACKOFF = 300
+REQUESTS_PER_SECOND = 4
+
+
+def _backoff(attempt: int, response: Optional[requests.Response] = None) -> float:
+    """Get the number of seconds to wait before retrying a failed request.
+
+    :param attempt: The number of failed attempts so far
+    :param response: The failed response, to respect its Retry-After header
+    :return: The number of seconds to sleep
+    """
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after is not None and retry_after.isdigit():
+            return min(float(retry_after), MAX_BACKOFF)
+    return float(min(SLEEP * 2**attempt, MAX_BACKOFF))
+
+
+def _get_events_page(
+    session: requests.Session,
+    params: Dict[str, Any],
+    max_retries: int,
+    rate_limiter: Optional[misc.RateLimiter] = None,
+) -> Dict[str, Any]:
+    """Request a single page of the OpenSea events API, retrying with exponential backoff.
+
+    :param session: The requests session to use
+    :param params: The query parameters, including the cursor
+    :param max_retries: Maximum number of retries
+    :param rate_limiter: A rate limiter shared between threads
+    :raises Exception: if the page still fails after max_retries retries
+    :return: The decoded response
+    """
+    headers = {"Accept": "application/json", "X-API-KEY": config.OPENSEA_API_KEY}
+    attempt = 0
+    while True:
+        if rate_limiter is not None:
+            rate_limiter.wait()
+        response: Optional[requests.Response] = None
+        try:
+            response = session.get(
+                OPENSEA_EVENTS_URL,
+                headers=headers,  # type: ignore
+                params=params,
+            )
+            if response.status_code == 200:
+                decode_response: Dict[str, Any] = response.json()
+                return decode_response
+            logging.warning(f"Error {response.status_code}: {response.text}")
+        except requests.exceptions.RequestException as error:
+            logging.warning(f"Request failed: {error}")
+
+        if attempt >= max_retries:
+            raise Exception(
+                f"Error: giving up after {max_retries} retries with {params}"
+            )
+        time.sleep(_backoff(attempt, response))
+        attempt += 1
+
+
+def iter_opensea_events(
+    contract_address: str,
+    account_address: Optional[str] = None,
+    cursor: Optional[str] = None,
+    event_type: Optional[str] = None,
+    limit: int = 300,
+    occurred_after: Optional[str] = None,
+    occurred_before: Optional[str] = None,
+    only_opensea: bool = False,
+    token_id: Optional[int] = None,
+    cursor_file: Optional[str] = None,
+    max_retries: int = 8,
+    session: Optional[requests.Session] = None,
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Iterate over the pages of the OpenSea events API.
+    https://docs.opensea.io/reference/retrieving-asset-events
+
+    Only the current page is held in memory. Failed requests are retried with exponential backoff.
+    With a cursor_file, the cursor of the next page is saved after each page has been processed,
+    so an interrupted pull resumes where it stopped. The file is removed once all pages are fetched.
+
+    :param contract_address: The NFT contract address for the assets for which to show events.
+    :param account_address: A user account's wallet address to filter for events on an account.
+    :param cursor: A cursor pointing to the page to retrieve.
+    :param event_type: The event type to filter. Can be "created" for new auctions, "successful" for sales, "cancelled", "bid_entered", "bid_withdrawn", "transfer", or "approve".
+    :param limit: Maximum number of events to fetch per request.
+    :param occurred_after: Only show events listed after this timestamp. Seconds since the Unix epoch.
+    :param occurred_before: Only show events listed before this timestamp. Seconds since the Unix epoch.
+    :param only_opensea: Restrict to events on OpenSea auctions.
+    :param token_id: The token's id to optionally filter by.
+    :param cursor_file: Path of a JSON file to save the cursor to and resume from.
+    :param max_retries: Maximum number of retries per page.
+    :param session: The requests session to use. (default: a new session)
+    :raises Exception: if a page still fails after max_retries retries
+    :return: An iterator of pages, each a list of events.
+    """
+    query = {
+        "account_address": account_address,
+        "asset_contract_address": contract_address,
+        "event_type": event_type,
+        "limit": limit,
+        "occurred_after": occurred_after,
+        "occurred_before": occurred_before,
+        "only_opensea": only_opensea,
+        "token_id": token_id,
+    }
+    cursor_path = Path(cursor_file) if cursor_file is not None else None
+    if cursor_path is not None and cursor is None:
+        cursor = misc.load_cursor(cursor_path, query)
+
+    if session is None:
+        session = requests.Session()
+
+    while True:
+        decode_response = _get_events_page(
+            session, {**query, "cursor": cursor}, max_retries
+        )
+        yield decode_response["asset_events"]
+
+        cursor = decode_response["next"]
+        if cursor is None:
+            break
+        if cursor_path is not None:
+            misc.save_cursor(cursor_path, query, cursor)
+
+    if cursor_path is not None and cursor_path.exists():
+        cursor_path.unlink()
 
 
 def get_opensea_events(
@@ -14,7 +147,7 @@ def get_opensea_events(
     continuous: bool = True,
     cursor: Optional[str] = None,
     event_type: Optional[str] = None,
-    have: list = [],
+    have: Optional[List[Dict[str, Any]]] = None,
     limit: int = 300,
     occurred_before: Optional[str] = None,
     only_opensea: bool = False,
@@ -24,12 +157,15 @@ def get_opensea_events(
     API wrapper for the OpenSea events API.
     https://docs.opensea.io/reference/retrieving-asset-events
 
+    Collects the pages of iter_opensea_events into a single list. To resume an interrupted
+    pull, use iter_opensea_events with a cursor_file and process the pages as they arrive.
+
     :param contract_address: The NFT contract address for the assets for which to show events.
     :param account_address: A user account's wallet address to filter for events on an account.
     :param continuous: Return only first page of events or try to fetch all pages.
     :param cursor: A cursor pointing to the page to retrieve.
     :param event_type: The event type to filter. Can be "created" for new auctions, "successful" for sales, "cancelled", "bid_entered", "bid_withdrawn", "transfer", or "approve".
-    :param have: List of already fetched events. Used internally to paginate trough events.
+    :param have: List of already fetched events, the new events are appended to a copy of it.
     :param limit: Maximum number of events to fetch per request.
     :param occurred_before: Only show events listed before this timestamp. Seconds since the Unix epoch.
     :param only_opensea: Restrict to events on OpenSea auctions.
@@ -37,63 +173,134 @@ def get_opensea_events(
 
     :return: A list of events.
     """
-    all_data = []
+    all_data = list(have) if have is not None else []
 
-    all_data.extend(have)
-    url = "https://api.opensea.io/api/v1/events"
+    pages = iter_opensea_events(
+        contract_address=contract_address,
+        account_address=account_address,
+        cursor=cursor,
+        event_type=event_type,
+        limit=limit,
+        occurred_before=occurred_before,
+        only_opensea=only_opensea,
+        token_id=token_id,
+    )
+    for page in pages:
+        all_data.extend(page)
+        if not continuous:
+            break
 
-    querystring = {
-        "account_address": account_address,
-        "asset_contract_address": contract_address,
-        "cursor": cursor,
-        "event_type": event_type,
-        "limit": limit,
-        "occurred_before": occurred_before,
-        "only_opensea": only_opensea,
-        "token_id": token_id,
-    }
+    return all_data
 
-    headers = {"Accept": "application/json", "X-API-KEY": config.OPENSEA_API_KEY}
 
-    response = requests.request("GET", url, headers=headers, params=querystring)  # type: ignore
+def get_event_time(event: Dict[str, Any]) -> float:
+    """Get the time of an event in seconds since the Unix epoch."""
+    timestamp = datetime.datetime.fromisoformat(event["event_timestamp"])
+    return timestamp.replace(tzinfo=datetime.timezone.utc).timestamp()
 
-    if response.status_code == 200:
-        decode_response = response.json()
-        events = decode_response["asset_events"]
-        all_data.extend(events)
-
-        if decode_response["next"] is not None and continuous is True:
-            return get_opensea_events(
-                contract_address=contract_address,
-                account_address=account_address,
-                continuous=continuous,
-                cursor=decode_response["next"],
-                event_type=event_type,
-                have=all_data,
-                limit=limit,
-                occurred_before=occurred_before,
-                only_opensea=only_opensea,
-                token_id=token_id,
+
+def get_opensea_events_parallel(
+    contract_address: str,
+    occurred_after: int,
+    occurred_before: Optional[int] = None,
+    event_type: Optional[str] = None,
+    limit: int = 300,
+    max_workers: int = 4,
+    requests_per_second: float = REQUESTS_PER_SECOND,
+    windows_per_worker: int = 4,
+    min_window: int = 3600,
+    max_retries: int = 8,
+) -> List[Dict[str, Any]]:
+    """
+    Fetch all events of a contract by splitting the time range into windows that are
+    downloaded concurrently.
+
+    The time range starts as max_workers * windows_per_worker equal windows. A window with
+    more than one page of events is split: the first page is kept and the rest of the window
+    is split in two new windows, so windows adapt to the event density. Windows shorter than
+    min_window are paginated with their cursor instead. All requests share one session and
+    one rate limiter. Adjacent windows overlap by one second, so events on a boundary are
+    fetched whether the API treats the bounds as inclusive or exclusive, and are then
+    deduplicated by event id.
+
+    :param contract_address: The NFT contract address for the assets for which to show events.
+    :param occurred_after: Start of the time range. Seconds since the Unix epoch.
+    :param occurred_before: End of the time range. Seconds since the Unix epoch. (default: now)
+    :param event_type: The event type to filter, see get_opensea_events.
+    :param limit: Maximum number of events to fetch per request.
+    :param max_workers: Number of concurrent requests.
+    :param requests_per_second: Rate limit of all workers together.
+    :param windows_per_worker: Number of initial windows per worker.
+    :param min_window: Windows shorter than this many seconds are not split any further.
+    :param max_retries: Maximum number of retries per page.
+    :return: A list of unique events, newest first.
+    """
+    if occurred_before is None:
+        occurred_before = int(time.time())
+    rate_limiter = misc.RateLimiter(requests_per_second)
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=max_workers)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    def fetch_window(
+        window: Tuple[int, int]
+    ) -> Tuple[List[Dict[str, Any]], List[Tuple[int, int]]]:
+        after, before = window
+        params = {
+            "asset_contract_address": contract_address,
+            "event_type": event_type,
+            "limit": limit,
+            "occurred_after": after,
+            "occurred_before": before,
+        }
+        page = _get_events_page(session, params, max_retries, rate_limiter)
+        events = page["asset_events"]
+        if page["next"] is None:
+            return events, []
+
+        # Events are returned newest first, the rest of the window ends at the oldest one
+        rest_before = int(min(get_event_time(event) for event in events)) + 1
+        if rest_before - after >= 2 * min_window:
+            middle = (after + rest_before) // 2
+            return events, [(after, middle + 1), (middle, rest_before)]
+
+        while page["next"] is not None:
+            page = _get_events_page(
+                session, {**params, "cursor": page["next"]}, max_retries, rate_limiter
             )
-        else:
-            return all_data
+            events.extend(page["asset_events"])
+        return events, []
 
-    else:
-        print(response.text)
-        print("error, sleeping then calling again")
-        time.sleep(SLEEP * 5)
-        return get_opensea_events(
-            contract_address=contract_address,
-            account_address=account_address,
-            continuous=continuous,
-            cursor=cursor,
-            event_type=event_type,
-            have=all_data,
-            limit=limit,
-            occurred_before=occurred_before,
-            only_opensea=only_opensea,
-            token_id=token_id,
-        )
+    num_windows = max_workers * windows_per_worker
+    span = occurred_before - occurred_after
+    edges = [occurred_after + span * i // num_windows for i in range(num_windows + 1)]
+    windows = [
+        (start, min(end + 1, occurred_before))
+        for start, end in zip(edges[:-1], edges[1:])
+        if end > start
+    ]
+
+    all_events: Dict[Any, Dict[str, Any]] = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {executor.submit(fetch_window, window) for window in windows}
+        while pending:
+            done, pending = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                events, new_windows = future.result()
+                for event in events:
+                    all_events[event["id"]] = event
+                for window in new_windows:
+                    logging.debug(f"Splitting dense window into {window}")
+                    pending.add(executor.submit(fetch_window, window))
+
+    return sorted(
+        all_events.values(),
+        key=lambda event: (get_event_time(event), event["id"]),
+        reverse=True,
+    )
 
 
 def is_collection_delisted(contract_address: str) -> bool:
@@ -0,0 +1,225 @@
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def iter_json_object(
+    stream: BinaryIO, stream_keys: Tuple[str, ...] = ()
+) -> Iterator[Tuple[str, Any]]:
+    """Incrementally parse a JSON object and yield its top-level entries.
+
+    Values of keys listed in stream_keys are expected to be arrays and are yielded
+    element by element, as soon as each element has been parsed.
+    All other values are yielded once they are fully parsed.
+    Requires the optional ijson package.
+
+    :param stream: A file-like object returning bytes, e.g. requests.Response.raw
+    :param stream_keys: Top-level keys whose array elements should be yielded one by one
+    :return: An iterator of (key, value) tuples
+    """
+    import ijson
+
+    key = None
+    builder = None
+    depth = 0
+
+    for prefix, event, value in ijson.parse(stream, use_float=True):
+        if builder is not None:
+            builder.event(event, value)
+            if event in ("start_map", "start_array"):
+                depth += 1
+            elif event in ("end_map", "end_array"):
+                depth -= 1
+            if depth == 0:
+                yield key, builder.value  # type: ignore
+                builder = None
+            continue
+
+        if prefix == "":
+            if event == "map_key":
+                key = value
+            continue
+
+        if (
+            key in stream_keys
+            and prefix == key
+            and event in ("start_array", "end_array")
+        ):
+            continue
+
+        builder = ijson.ObjectBuilder()
+        builder.event(event, value)
+        if event in ("start_map", "start_array"):
+            depth = 1
+        else:
+            yield key, builder.value  # type: ignore
+            builder = None
+
+
+class ChunkedCsvWriter:
+    """Write rows (dicts) to a CSV file without keeping them all in memory.
+
+    Rows are buffered and spilled to disk every chunk_size rows.
+    Because the set of columns isn't always known upfront, the spilled chunks are
+    merged into the final file when the writer is closed. At that point all chunks
+    share the union of the columns seen, in order of first appearance.
+
+    usage:
+    with ChunkedCsvWriter(file_path, index_col="TOKEN_ID") as writer:
+        writer.write(row)
+    """
+
+    def __init__(
+        self,
+        file_path: str,
+        index_col: Optional[str] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> None:
+        """
+        :param file_path: Path of the CSV file to write
+        :param index_col: Column to use as index of the CSV file
+        :param chunk_size: Number of rows to buffer before spilling them to disk
+        """
+        self.file_path = file_path
+        self.index_col = index_col
+        self.chunk_size = chunk_size
+        self.columns: List[str] = []
+        self.rows_written = 0
+        self._buffer: List[Dict[str, Any]] = []
+        self._parts: List[Path] = []
+        self._closed = False
+        self._spill_dir = Path(tempfile.mkdtemp(prefix="honestnft_"))
+
+    def write(self, row: Dict[str, Any]) -> None:
+        """Add a single row to the output.
+
+        :param row: The row as a dict of column names and values
+        """
+        for column in row:
+            if column not in self.columns:
+                self.columns.append(column)
+        self._buffer.append(row)
+        if len(self._buffer) >= self.chunk_size:
+            self._spill()
+
+    def close(
+        self, transform: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None
+    ) -> int:
+        """Merge all chunks into the final CSV file.
+
+        :param transform: Optional function applied to each chunk before it's written
+        :return: The number of rows written
+        """
+        if self._closed:
+            return self.rows_written
+        self._closed = True
+        self._spill()
+        try:
+            for i, part in enumerate(self._parts):
+                chunk = pd.read_csv(part, dtype=object, keep_default_na=False)
+                chunk = chunk.reindex(columns=self.columns)
+                if transform is not None:
+                    chunk = transform(chunk)
+                if self.index_col is not None:
+                    chunk = chunk.set_index(self.index_col)
+                chunk.to_csv(
+                    self.file_path,
+                    mode="w" if i == 0 else "a",
+                    header=i == 0,
+                    index=self.index_col is not None,
+                )
+        finally:
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+        return self.rows_written
+
+    def _spill(self) -> None:
+        if len(self._buffer) == 0:
+            return
+        part = self._spill_dir.joinpath(f"{len(self._parts)}.csv")
+        pd.DataFrame.from_records(self._buffer).to_csv(part, index=False)
+        self._parts.append(part)
+        self.rows_written += len(self._buffer)
+        self._buffer = []
+
+    def __enter__(self) -> "ChunkedCsvWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._closed = True
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+
+
+class ZipRecordWriter:
+    """Write JSON records straight into a zip archive, one member per record.
+
+    The archive is written to a temporary file that replaces file_path when the
+    writer is closed, so an interrupted run never leaves a truncated archive.
+    Members can be read back one at a time with read_zip_record.
+
+    usage:
+    with ZipRecordWriter(file_path) as writer:
+        writer.write(f"{token_id}.json", token)
+    """
+
+    def __init__(self, file_path: str, compression: int = zipfile.ZIP_DEFLATED) -> None:
+        """
+        :param file_path: Path of the zip archive to write
+        :param compression: Compression method of the members, see zipfile
+        """
+        self.file_path = file_path
+        self.records_written = 0
+        self._temp_path = f"{file_path}.tmp"
+        self._zip = zipfile.ZipFile(self._temp_path, "w", compression=compression)
+
+    def write(self, name: str, record: Any) -> None:
+        """Add a single record to the archive.
+
+        :param name: The member name, e.g. "<token_id>.json"
+        :param record: The JSON serializable record
+        """
+        self._zip.writestr(name, json.dumps(record))
+        self.records_written += 1
+
+    def close(self) -> int:
+        """Finish the archive and move it to file_path.
+
+        :return: The number of records written
+        """
+        if self._zip.fp is not None:
+            self._zip.close()
+            os.replace(self._temp_path, self.file_path)
+        return self.records_written
+
+    def __enter__(self) -> "ZipRecordWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._zip.close()
+            os.remove(self._temp_path)
+
+
+def read_zip_record(file_path: str, name: str) -> Any:
+    """Read a single JSON record from a zip archive without extracting the others.
+
+    :param file_path: Path of the zip archive
+    :param name: The member name, e.g. "<token_id>.json"
+    :raises KeyError: if the archive has no such member
+    :return: The decoded record
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        with archive.open(name) as member:
+            return json.load(member)
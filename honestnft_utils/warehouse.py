@@ -0,0 +1,380 @@
+import json
+import os
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from honestnft_utils import config, datasets
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rarity (
+    collection TEXT NOT NULL,
+    token_id INTEGER NOT NULL,
+    token_name TEXT,
+    rarity_score REAL,
+    rank INTEGER,
+    PRIMARY KEY (collection, token_id)
+);
+CREATE INDEX IF NOT EXISTS rarity_rank ON rarity (collection, rank);
+
+CREATE TABLE IF NOT EXISTS minting (
+    collection TEXT NOT NULL,
+    txid TEXT,
+    to_account TEXT,
+    token_id INTEGER NOT NULL,
+    current_owner TEXT,
+    rank INTEGER,
+    time TEXT
+);
+CREATE INDEX IF NOT EXISTS minting_token ON minting (collection, token_id);
+CREATE INDEX IF NOT EXISTS minting_to_account ON minting (to_account);
+CREATE INDEX IF NOT EXISTS minting_current_owner ON minting (current_owner);
+CREATE INDEX IF NOT EXISTS minting_txid ON minting (collection, txid);
+
+CREATE TABLE IF NOT EXISTS sales (
+    collection TEXT NOT NULL,
+    transaction_hash TEXT,
+    seller_address TEXT,
+    buyer_address TEXT,
+    token_id INTEGER NOT NULL,
+    price REAL,
+    sale_date TEXT
+);
+CREATE INDEX IF NOT EXISTS sales_token ON sales (collection, token_id);
+CREATE INDEX IF NOT EXISTS sales_seller ON sales (seller_address);
+CREATE INDEX IF NOT EXISTS sales_buyer ON sales (buyer_address);
+
+CREATE TABLE IF NOT EXISTS prereveal_bids (
+    collection TEXT NOT NULL,
+    token_id INTEGER NOT NULL,
+    user TEXT,
+    offer REAL,
+    date TEXT,
+    rank INTEGER
+);
+CREATE INDEX IF NOT EXISTS prereveal_bids_token ON prereveal_bids (collection, token_id);
+CREATE INDEX IF NOT EXISTS prereveal_bids_user ON prereveal_bids (user);
+
+CREATE TABLE IF NOT EXISTS prereveal_sales (
+    collection TEXT NOT NULL,
+    token_id INTEGER NOT NULL,
+    user TEXT,
+    date TEXT,
+    rank INTEGER,
+    price REAL
+);
+CREATE INDEX IF NOT EXISTS prereveal_sales_token ON prereveal_sales (collection, token_id);
+CREATE INDEX IF NOT EXISTS prereveal_sales_user ON prereveal_sales (user);
+
+CREATE TABLE IF NOT EXISTS grifters (
+    collection TEXT NOT NULL,
+    address TEXT NOT NULL,
+    pvalue REAL,
+    num_transactions INTEGER,
+    num_minted INTEGER,
+    token_list TEXT,
+    PRIMARY KEY (collection, address)
+);
+CREATE INDEX IF NOT EXISTS grifters_address ON grifters (address);
+
+CREATE TABLE IF NOT EXISTS suspicious (
+    collection TEXT NOT NULL,
+    contract TEXT,
+    token_id INTEGER NOT NULL,
+    url TEXT,
+    is_suspicious INTEGER,
+    scraped_on INTEGER,
+    PRIMARY KEY (collection, token_id)
+);
+CREATE INDEX IF NOT EXISTS suspicious_contract ON suspicious (contract, token_id);
+
+CREATE TABLE IF NOT EXISTS sources (
+    table_name TEXT NOT NULL,
+    collection TEXT NOT NULL,
+    path TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    PRIMARY KEY (table_name, collection)
+);
+"""
+
+# Table name -> (config folder, file name suffix, {file column: table column})
+CSV_SOURCES: Dict[str, Tuple[str, str, Dict[str, str]]] = {
+    "rarity": (
+        "RARITY_FOLDER",
+        "_raritytools",
+        {
+            "TOKEN_ID": "token_id",
+            "TOKEN_NAME": "token_name",
+            "RARITY_SCORE": "rarity_score",
+            "Rank": "rank",
+        },
+    ),
+    "minting": (
+        "MINTING_FOLDER",
+        "_minting",
+        {
+            "txid": "txid",
+            "to_account": "to_account",
+            "TOKEN_ID": "token_id",
+            "current_owner": "current_owner",
+            "rank": "rank",
+            "time": "time",
+        },
+    ),
+    "sales": (
+        "SALES_DATA_FOLDER",
+        "",
+        {
+            "transaction_hash": "transaction_hash",
+            "seller_address": "seller_address",
+            "buyer_address": "buyer_address",
+            "TOKEN_ID": "token_id",
+            "price": "price",
+            "saleDate": "sale_date",
+        },
+    ),
+    "prereveal_bids": (
+        "PRE_REVEAL_BIDS_FOLDER",
+        "_pre-reveal_bids",
+        {
+            "TOKEN_ID": "token_id",
+            "USER": "user",
+            "OFFER": "offer",
+            "DATE": "date",
+            "RANK": "rank",
+        },
+    ),
+    "prereveal_sales": (
+        "PRE_REVEAL_SALES_FOLDER",
+        "_pre-reveal_sales",
+        {
+            "TOKEN_ID": "token_id",
+            "USER": "user",
+            "DATE": "date",
+            "RANK": "rank",
+            "PRICE": "price",
+        },
+    ),
+    "grifters": (
+        "GRIFTERS_DATA_FOLDER",
+        "_grifters",
+        {
+            "address": "address",
+            "pvalue": "pvalue",
+            "num_transactions": "num_transactions",
+            "num_minted": "num_minted",
+            "token_list": "token_list",
+        },
+    ),
+}
+TABLES = list(CSV_SOURCES) + ["suspicious"]
+# Prices in wei don't fit in a SQLite INTEGER, so they're stored as REAL
+REAL_COLUMNS = ["rarity_score", "price", "offer", "pvalue"]
+
+
+def connect(database: Optional[str] = None) -> sqlite3.Connection:
+    """Open the warehouse database and create the tables if needed.
+
+    :param database: Path of the SQLite database. (default: config.WAREHOUSE_FILE)
+    :return: The database connection
+    """
+    if database is None:
+        database = config.WAREHOUSE_FILE
+    conn = sqlite3.connect(database)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _is_ingested(
+    conn: sqlite3.Connection, table: str, collection: str, path: str
+) -> bool:
+    row = conn.execute(
+        "SELECT path, mtime_ns FROM sources WHERE table_name = ? AND collection = ?",
+        (table, collection),
+    ).fetchone()
+    return row is not None and tuple(row) == (path, os.stat(path).st_mtime_ns)
+
+
+def _replace_collection(
+    conn: sqlite3.Connection, table: str, collection: str, path: str, df: pd.DataFrame
+) -> None:
+    """Replace all rows of a collection in a table within a single transaction."""
+    df.insert(0, "collection", collection)
+    with conn:
+        conn.execute(f"DELETE FROM {table} WHERE collection = ?", (collection,))
+        df.to_sql(table, conn, if_exists="append", index=False)
+        conn.execute(
+            "INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?)",
+            (table, collection, path, os.stat(path).st_mtime_ns),
+        )
+
+
+def ingest_file(
+    conn: sqlite3.Connection,
+    table: str,
+    collection: str,
+    path: Optional[str] = None,
+    force: bool = False,
+) -> bool:
+    """Load the data file of a collection into a warehouse table.
+
+    Existing rows of the collection are replaced. Files that didn't change
+    since they were last ingested are skipped.
+
+    :param conn: The warehouse connection
+    :param table: One of TABLES
+    :param collection: The collection name as it appears in the file name
+    :param path: Path of the data file. (default: derived from the config folders)
+    :param force: Ingest the file, even if it didn't change
+    :return: True if the file was ingested, False if it was skipped
+    """
+    if table == "suspicious":
+        if path is None:
+            path = f"{config.SUSPICIOUS_NFTS_FOLDER}/{collection}.json"
+        return _ingest_suspicious(conn, collection, path, force)
+
+    folder, suffix, columns = CSV_SOURCES[table]
+    if path is None:
+        path = datasets.find_data_file(
+            f"{getattr(config, folder)}/{collection}{suffix}.csv"
+        )
+    if not force and _is_ingested(conn, table, collection, path):
+        return False
+
+    df = datasets.read_dataframe(path)
+    df = df[[column for column in columns if column in df.columns]]
+    df = df.rename(columns=columns)
+    for column in REAL_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column]).astype(float)
+    _replace_collection(conn, table, collection, path, df)
+    return True
+
+
+def _ingest_suspicious(
+    conn: sqlite3.Connection, collection: str, path: str, force: bool
+) -> bool:
+    if not force and _is_ingested(conn, "suspicious", collection, path):
+        return False
+    with open(path, "r") as f:
+        scrape = json.load(f)
+    df = pd.DataFrame.from_records(
+        scrape["data"], columns=["token_id", "url", "is_suspicious"]
+    )
+    df.insert(0, "contract", scrape.get("contract"))
+    df["scraped_on"] = scrape.get("scraped_on")
+    _replace_collection(conn, "suspicious", collection, path, df)
+    return True
+
+
+def _collections_in_folder(
+    folder: str, suffix: str, extensions: Iterable[str]
+) -> List[str]:
+    collections = set()
+    for extension in extensions:
+        for path in Path(folder).glob(f"*{suffix}{extension}"):
+            collections.add(path.name[: -len(suffix + extension)])
+    return sorted(collections)
+
+
+def ingest_all(
+    conn: sqlite3.Connection, tables: Optional[List[str]] = None, force: bool = False
+) -> pd.DataFrame:
+    """Load every collection in the data folders into the warehouse.
+
+    :param conn: The warehouse connection
+    :param tables: Only ingest these tables. (default: all TABLES)
+    :param force: Ingest all files, even if they didn't change
+    :return: A DataFrame with the table, collection and status of each file
+    """
+    if tables is None:
+        tables = TABLES
+
+    summary = []
+    for table in tables:
+        if table == "suspicious":
+            collections = _collections_in_folder(
+                config.SUSPICIOUS_NFTS_FOLDER, "", [".json"]
+            )
+        else:
+            folder, suffix, _ = CSV_SOURCES[table]
+            collections = _collections_in_folder(
+                getattr(config, folder), suffix, datasets.FILE_EXTENSIONS.values()
+            )
+        for collection in collections:
+            ingested = ingest_file(conn, table, collection, force=force)
+            summary.append(
+                {
+                    "table": table,
+                    "collection": collection,
+                    "status": "ingested" if ingested else "skipped",
+                }
+            )
+    return pd.DataFrame.from_records(summary, columns=["table", "collection", "status"])
+
+
+def query(
+    conn: sqlite3.Connection, sql: str, params: Optional[Iterable] = None
+) -> pd.DataFrame:
+    """Run a SQL query on the warehouse.
+
+    :param conn: The warehouse connection
+    :param sql: The SQL query, with ? placeholders for parameters
+    :param params: The query parameters
+    :return: The query result
+    """
+    return pd.read_sql_query(sql, conn, params=params)
+
+
+def get_collection(
+    conn: sqlite3.Connection, table: str, collection: str
+) -> pd.DataFrame:
+    """Get all rows of a collection from a warehouse table.
+
+    :param conn: The warehouse connection
+    :param table: One of TABLES
+    :param collection: The collection name
+    :return: The rows of the collection
+    """
+    if table not in TABLES:
+        raise ValueError(f"Unknown table {table}, expected one of {TABLES}")
+    return query(conn, f"SELECT * FROM {table} WHERE collection = ?", [collection])
+
+
+def get_ranks(conn: sqlite3.Connection, collection: str) -> pd.Series:
+    """Get the rarity rank of every token in a collection.
+
+    :param conn: The warehouse connection
+    :param collection: The collection name
+    :return: A Series of ranks indexed by token id
+    """
+    df = query(
+        conn,
+        "SELECT token_id, rank FROM rarity WHERE collection = ?",
+        [collection],
+    )
+    return df.set_index("token_id")["rank"]
+
+
+def get_wallet_activity(
+    conn: sqlite3.Connection, address: str
+) -> Dict[str, pd.DataFrame]:
+    """Get everything the warehouse knows about a wallet, over all collections.
+
+    :param conn: The warehouse connection
+    :param address: The wallet address
+    :return: A dict with the mints, purchases, sales, pre-reveal bids and
+        pre-reveal sales of the wallet and the collections where it's a grifter
+    """
+    address = address.lower()
+    lookups = {
+        "mints": "SELECT * FROM minting WHERE to_account = ?",
+        "purchases": "SELECT * FROM sales WHERE buyer_address = ?",
+        "sales": "SELECT * FROM sales WHERE seller_address = ?",
+        "prereveal_bids": "SELECT * FROM prereveal_bids WHERE user = ?",
+        "prereveal_sales": "SELECT * FROM prereveal_sales WHERE user = ?",
+        "grifters": "SELECT * FROM grifters WHERE address = ?",
+    }
+    return {name: query(conn, sql, [address]) for name, sql in lookups.items()}
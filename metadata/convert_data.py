@@ -0,0 +1,83 @@
+import argparse
+from pathlib import Path
+from typing import List, Optional
+
+from honestnft_utils import config, datasets
+
+
+def convert_folder(
+    folder: str,
+    output_format: str,
+    collection: Optional[str] = None,
+    remove_source: bool = False,
+) -> List[str]:
+    """Convert the CSV files in a data folder to another output format.
+
+    :param folder: Folder with the CSV files, e.g. config.ATTRIBUTES_FOLDER
+    :param output_format: One of datasets.OUTPUT_FORMATS
+    :param collection: Only convert the files of this collection
+    :param remove_source: Remove the CSV files after conversion
+    :return: The paths of the converted files
+    """
+    if collection is None:
+        csv_files = sorted(Path(folder).glob("*.csv"))
+    else:
+        # Attribute files are named <collection>.csv, rarity files <collection>_<method>.csv
+        csv_files = sorted(Path(folder).glob(f"{collection}.csv"))
+        csv_files += sorted(Path(folder).glob(f"{collection}_*.csv"))
+
+    converted = []
+    for csv_file in csv_files:
+        path = datasets.convert_data_file(
+            str(csv_file), output_format, remove_source=remove_source
+        )
+        print(f"{csv_file.name} -> {Path(path).name}")
+        converted.append(path)
+    return converted
+
+
+def _cli_parser() -> argparse.ArgumentParser:
+    """
+    Create the command line argument parser
+    """
+    parser = argparse.ArgumentParser(
+        description="CLI for converting existing attribute and rarity data to a columnar file format."
+    )
+    parser.add_argument(
+        "--output-format",
+        type=str,
+        choices=[f for f in datasets.OUTPUT_FORMATS if f != "csv"],
+        default="parquet",
+        help="File format to convert to. Requires pyarrow. (default: parquet)",
+    )
+    parser.add_argument(
+        "--collection",
+        type=str,
+        default=None,
+        help="Only convert the files of this collection. (default: all collections)",
+    )
+    parser.add_argument(
+        "--folders",
+        type=str,
+        nargs="+",
+        default=[config.ATTRIBUTES_FOLDER, config.RARITY_FOLDER],
+        help=f"Data folders to convert. (default: {config.ATTRIBUTES_FOLDER} {config.RARITY_FOLDER})",
+    )
+    parser.add_argument(
+        "--remove_csv",
+        action="store_true",
+        help="Remove the CSV files after conversion.",
+    )
+    return parser
+
+
+if __name__ == "__main__":
+    args = _cli_parser().parse_args()
+
+    for folder in args.folders:
+        convert_folder(
+            folder,
+            args.output_format,
+            collection=args.collection,
+            remove_source=args.remove_csv,
+        )
@@ -1,79 +1,202 @@
 import argparse
-from typing import Optional
+import concurrent.futures
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 import pandas as pd
 import requests
 
-from honestnft_utils import config
+from honestnft_utils import config, datasets
 
 API_URL = "https://data.objkt.com/v2/graphql"
 MAX_RECORDS_PAGE = 500
 
+COLLECTION_NAME_QUERY = """
+query CollectionName($contract: String!) {
+  fa(where: {contract: {_eq: $contract}}) {
+    name
+  }
+}
+"""
 
-def get_collection_name(contract_address: str) -> Optional[str]:
-    """
-    Given a contract address, return the collection name from objkt.com
+# token_id is a string on objkt.com, so token ids are compared and ordered as strings
+TOKENS_QUERY = """
+query Tokens($contract: String!, $from: String!, $after: String!, $limit: Int!) {
+  token(
+    where: {
+      fa: {contract: {_eq: $contract}}
+      name: {_is_null: false}
+      token_id: {_gte: $from, _gt: $after}
+    }
+    order_by: {token_id: asc}
+    limit: $limit
+  ) {
+    token_id
+    name
+    attributes {
+      attribute {
+        value
+        name
+      }
+    }
+  }
+}
+"""
+
+# TOKENS_QUERY for a range of token ids with an upper bound
+TOKENS_BEFORE_QUERY = """
+query TokensBefore(
+  $contract: String!
+  $from: String!
+  $after: String!
+  $before: String!
+  $limit: Int!
+) {
+  token(
+    where: {
+      fa: {contract: {_eq: $contract}}
+      name: {_is_null: false}
+      token_id: {_gte: $from, _gt: $after, _lt: $before}
+    }
+    order_by: {token_id: asc}
+    limit: $limit
+  ) {
+    token_id
+    name
+    attributes {
+      attribute {
+        value
+        name
+      }
+    }
+  }
+}
+"""
+
+# Bounds of the token_id ranges that are pulled in parallel, by leading character
+RANGE_BOUNDS = list("123456789")
+
+
+def _post_query(
+    session: requests.Session, query: str, variables: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Run a GraphQL query on objkt.com.
+
+    :param session: The requests session to use
+    :param query: The GraphQL query
+    :param variables: The values of the query variables
+    :raises Exception: if the request fails
+    :return: The data of the response
     """
-    contract_metadata_query = f'query MyQuery {{ fa(where: {{contract: {{_eq: "{contract_address}"}}}}) {{name}}}}'
-    response = requests.post(API_URL, json={"query": contract_metadata_query})
+    response = session.post(API_URL, json={"query": query, "variables": variables})
     if response.status_code == 200:
         json_data = response.json()
     else:
         raise Exception(f"Error: {response.status_code},\n{response.text}")
+    if json_data.get("errors"):
+        raise Exception(f"Error: {json_data['errors']}")
+    data: Dict[str, Any] = json_data["data"]
+    return data
+
 
-    if (json_data["data"] is None) or (json_data["data"]["fa"] is None):
+def get_collection_name(contract_address: str) -> Optional[str]:
+    """
+    Given a contract address, return the collection name from objkt.com
+    """
+    data = _post_query(
+        requests.Session(), COLLECTION_NAME_QUERY, {"contract": contract_address}
+    )
+    if (data is None) or (not data["fa"]):
         return None
-    return str(json_data["data"]["fa"][0]["name"])
+    return str(data["fa"][0]["name"])
 
 
-def pull_from_objkt(contract_address: str) -> list:
+def _flatten_token(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a token of the GraphQL response into a metadata row."""
+    token = {"TOKEN_ID": row["token_id"], "TOKEN_NAME": row["name"]}
+    for value in row["attributes"]:
+        token[value["attribute"]["name"]] = value["attribute"]["value"]
+    return token
+
+
+def iter_token_pages(
+    contract_address: str,
+    lower: str = "",
+    upper: Optional[str] = None,
+    session: Optional[requests.Session] = None,
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Iterate over the metadata of the tokens of a contract with lower <= token_id < upper,
+    one page at a time.
+
+    Pages are requested by keyset pagination, i.e. each page starts after the last
+    token_id of the previous page, which stays fast however deep the page is.
+
+    :param contract_address: Collection contract address
+    :param lower: Lowest token_id to include
+    :param upper: Token_ids from this one on are excluded. (default: no upper bound)
+    :param session: The requests session to use. (default: a new session)
+    :return: An iterator of pages, each a list of flattened metadata rows
+    """
+    if session is None:
+        session = requests.Session()
+    query = TOKENS_QUERY if upper is None else TOKENS_BEFORE_QUERY
+
+    variables: Dict[str, Any] = {
+        "contract": contract_address,
+        "from": lower,
+        "after": "",
+        "limit": MAX_RECORDS_PAGE,
+    }
+    if upper is not None:
+        variables["before"] = upper
+
+    while True:
+        tokens = _post_query(session, query, variables)["token"]
+        yield [_flatten_token(row) for row in tokens]
+        if len(tokens) < MAX_RECORDS_PAGE:
+            break
+        variables["after"] = tokens[-1]["token_id"]
+
+
+def _token_ranges() -> List[Tuple[str, Optional[str]]]:
+    """Split the token_id key space into the ranges of RANGE_BOUNDS."""
+    lowers = [""] + RANGE_BOUNDS
+    uppers: List[Optional[str]] = [*RANGE_BOUNDS, None]
+    return list(zip(lowers, uppers))
+
+
+def pull_from_objkt(contract_address: str, threads: int = 1) -> list:
     """
     Given a contract address, return the metadata from objkt.com
+
+    :param contract_address: Collection contract address
+    :param threads: Number of token_id ranges pulled in parallel. With 1 the tokens
+        are pulled sequentially.
+    :return: A list of metadata rows, ordered by token_id as a string
     """
-    offset_variable = 0
-    pages = []
-    new_results = True
-
-    while new_results:
-        query_part_1 = f'query MyQuery($offset: Int = {offset_variable}, $_eq: String = "{contract_address}") {{'
-        query_part_2 = """
-            token(where: {fa: {contract: {_eq: $_eq}}, name: {_is_null: false}}, order_by: {token_id: asc}, offset: $offset) {
-            token_id
-            name
-            attributes {
-                attribute {
-                value
-                name
-                }
-            }
-            }
-        }
-        """
-        response = requests.post(
-            API_URL,
-            json={"query": query_part_1 + query_part_2},
-        )
-        offset_variable += MAX_RECORDS_PAGE
-        if response.status_code == 200:
-            json_data = response.json()
-        else:
-            raise Exception(f"Error: {response.status_code},\n{response.text}")
-
-        pages.append(json_data)
-        if len(json_data["data"]["token"]) < MAX_RECORDS_PAGE:
-            new_results = False
+    if threads <= 1:
+        return [token for page in iter_token_pages(contract_address) for token in page]
+
+    session = requests.Session()
+
+    def pull_range(token_range: Tuple[str, Optional[str]]) -> list:
+        lower, upper = token_range
+        return [
+            token
+            for page in iter_token_pages(contract_address, lower, upper, session)
+            for token in page
+        ]
 
     metadata_list = []
-    for page in pages:
-        for row in page["data"]["token"]:
-            token = {"TOKEN_ID": row["token_id"], "TOKEN_NAME": row["name"]}
-            for value in row["attributes"]:
-                token[value["attribute"]["name"]] = value["attribute"]["value"]
-            metadata_list.append(token)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+        for tokens in executor.map(pull_range, _token_ranges()):
+            metadata_list.extend(tokens)
     return metadata_list
 
 
-def pull_metadata(contract_address: str) -> None:
+def pull_metadata(
+    contract_address: str, output_format: str = "csv", threads: int = 1
+) -> None:
     collection_name = get_collection_name(contract_address)
     if collection_name is None:
         raise Exception("Contract not found")
@@ -81,9 +204,9 @@ def pull_metadata(contract_address: str) -> None:
     collection_name.replace(" ", "_")
 
     # Fetch all attribute records from the remote server
-    records = pull_from_objkt(contract_address)
+    records = pull_from_objkt(contract_address, threads=threads)
 
-    # Generate traits DataFrame and save to disk as csv
+    # Generate traits DataFrame and save to disk
     trait_db = pd.DataFrame(records)
 
     if trait_db.duplicated().any():
@@ -95,7 +218,9 @@ def pull_metadata(contract_address: str) -> None:
     trait_db.sort_values(by=["TOKEN_ID"], inplace=True, ascending=True)
     trait_db.set_index("TOKEN_ID", inplace=True)
     print(trait_db.head())
-    trait_db.to_csv(f"{config.ATTRIBUTES_FOLDER}/{collection_name}.csv")
+    datasets.write_dataframe(
+        trait_db, f"{config.ATTRIBUTES_FOLDER}/{collection_name}.csv", output_format
+    )
 
 
 def _cli_parser() -> argparse.ArgumentParser:
@@ -113,6 +238,20 @@ def _cli_parser() -> argparse.ArgumentParser:
         default=None,
         help="Collection contract address",
     )
+    parser.add_argument(
+        "-t",
+        "--threads",
+        type=int,
+        default=1,
+        help="Number of token id ranges to download in parallel. (default: 1)",
+    )
+    parser.add_argument(
+        "--output-format",
+        type=str,
+        choices=datasets.OUTPUT_FORMATS,
+        default="csv",
+        help="File format of the attribute data. Parquet and arrow require pyarrow. (default: csv)",
+    )
     return parser
 
 
@@ -121,4 +260,4 @@ if __name__ == "__main__":
 
     ARGS = _cli_parser().parse_args()
 
-    pull_metadata(ARGS.contract)
+    pull_metadata(ARGS.contract, ARGS.output_format, ARGS.threads)
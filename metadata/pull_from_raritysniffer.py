@@ -1,13 +1,119 @@
 import argparse
+import contextlib
 import json
 import os
-import shutil
-from typing import Optional
+from typing import Any, Optional, Tuple
 
 import pandas as pd
 import requests
 
-from honestnft_utils import config, misc
+from honestnft_utils import config, datasets, misc, streaming
+
+
+def parse_token(token: dict) -> Tuple[dict, dict]:
+    """Split a raritysniffer token into its attribute row and its rarity row.
+
+    :param token: A single token as returned by the raritysniffer API
+    :return: A tuple of the attribute row and the rarity row
+    """
+    # Add token name and token URI traits to the trait dictionary
+    traits = dict()
+    traits["TOKEN_ID"] = token["id"]
+    traits["TOKEN_NAME"] = token["name"]
+
+    # token['attributes'] = token.pop('traits')
+    for atr in token["traits"]:
+        if not atr["c"] == "Trait Count":
+            traits[atr["c"]] = atr["n"]
+
+    rarity_traits = traits.copy()
+    # Now we will form the rarity data
+    rarity_traits["RARITY_SCORE"] = token["score"]
+    rarity_traits["Rank"] = token["positionId"]
+    for atr in token["traits"]:
+        rarity_traits[atr["c"]] = atr["r"]
+
+    return traits, rarity_traits
+
+
+def open_raw_data(
+    collection: str, compress_raw_data: bool
+) -> Optional[streaming.ZipRecordWriter]:
+    """Prepare the destination of the raw metadata of a collection.
+
+    :param collection: The collection name
+    :param compress_raw_data: Write the raw metadata into a zip archive instead of a folder
+    :return: A writer for data/attributes/<collection>.zip, or None if the tokens
+        are saved as individual files in data/attributes/<collection>/
+    """
+    if compress_raw_data:
+        file_path = f"{config.ATTRIBUTES_FOLDER}/{collection}.zip"
+        print(f"Saving metadata to {file_path}")
+        return streaming.ZipRecordWriter(file_path)
+
+    folder = f"{config.ATTRIBUTES_FOLDER}/{collection}/"
+    print(f"Saving metadata to {folder}")
+    if not os.path.exists(folder):
+        os.mkdir(folder)
+    return None
+
+
+def save_raw_token(
+    token: dict, collection: str, archive: Optional[streaming.ZipRecordWriter]
+) -> None:
+    """Save the raw metadata of a single token.
+
+    :param token: A single token as returned by the raritysniffer API
+    :param collection: The collection name
+    :param archive: The writer returned by open_raw_data
+    """
+    if archive is not None:
+        archive.write(f"{token['id']}.json", token)
+    else:
+        PATH = f"{config.ATTRIBUTES_FOLDER}/{collection}/{token['id']}.json"
+        with open(PATH, "w") as destination_file:
+            json.dump(token, destination_file)
+
+
+def read_raw_token(collection: str, token_id: int) -> Any:
+    """Read the saved raw metadata of a single token, from the zip archive of the
+    collection if there is one and from the raw metadata folder otherwise.
+
+    :param collection: The collection name
+    :param token_id: The token id
+    :raises FileNotFoundError: if no raw metadata was saved for the collection
+    :raises KeyError: if the zip archive has no raw metadata for the token
+    :return: The token as returned by the raritysniffer API
+    """
+    archive_path = f"{config.ATTRIBUTES_FOLDER}/{collection}.zip"
+    if os.path.exists(archive_path):
+        return streaming.read_zip_record(archive_path, f"{token_id}.json")
+    with open(f"{config.ATTRIBUTES_FOLDER}/{collection}/{token_id}.json") as f:
+        return json.load(f)
+
+
+def print_completeness(token_count: int, lower_id: int, upper_id: int) -> None:
+    """Print a summary of the token ids received and warn about missing tokens.
+
+    :param token_count: Number of tokens received
+    :param lower_id: Lowest token id received
+    :param upper_id: Highest token id received
+    """
+    print(f"tokens in the list {token_count}")
+    print(f"lower_id: {lower_id}")
+    print(f"upper_id: {upper_id}")
+
+    if lower_id == 0:
+        max_supply = upper_id + 1
+        print(f"max supply: {upper_id + 1}")
+    else:
+        max_supply = upper_id
+        print(f"max supply: {upper_id}")
+
+    # warn if raritysniffer doesn't have the full collection
+    # TODO: print a list of missing token ids
+    if token_count != max_supply:
+        print(f"{max_supply - token_count} tokens with missing metadata")
 
 
 def download(
@@ -17,7 +123,22 @@ def download(
     save_raw_data: bool = False,
     compress_raw_data: bool = False,
     collection: Optional[str] = None,
+    stream: bool = False,
+    chunk_size: int = streaming.DEFAULT_CHUNK_SIZE,
+    output_format: str = "csv",
 ):
+    if stream:
+        return download_stream(
+            contract_address=contract_address,
+            normalize_traits=normalize_traits,
+            trait_count=trait_count,
+            save_raw_data=save_raw_data,
+            compress_raw_data=compress_raw_data,
+            collection=collection,
+            chunk_size=chunk_size,
+            output_format=output_format,
+        )
+
     url = "https://raritysniffer.com/api/index.php"
 
     params = {
@@ -50,73 +171,42 @@ def download(
         print(f"Received data for {COLLECTION_NAME}")
         print(f"{len(response_data['data'])} tokens in the collection")
 
-        # Create folder to store metadata
-        if save_raw_data:
-            folder = f"{config.ATTRIBUTES_FOLDER}/{COLLECTION_NAME}/"
-            print(f"Saving metadata to {folder}")
-            if not os.path.exists(folder):
-                os.mkdir(folder)
-
-        for i, token in enumerate(response_data["data"]):
-
-            token_ids.append(token["id"])
-            # Add token name and token URI traits to the trait dictionary
-            traits = dict()
-            traits["TOKEN_ID"] = token["id"]
-            traits["TOKEN_NAME"] = token["name"]
-
-            # token['attributes'] = token.pop('traits')
-            for atr in token["traits"]:
-                if not atr["c"] == "Trait Count":
-                    traits[atr["c"]] = atr["n"]
+        # Raw metadata is written while the tokens are parsed, the archive is
+        # removed again if parsing fails
+        with contextlib.ExitStack() as stack:
+            archive = None
+            if save_raw_data:
+                archive = open_raw_data(COLLECTION_NAME, compress_raw_data)
+                if archive is not None:
+                    stack.enter_context(archive)
 
-            # add this token to dictionary list
-            raw_metadata.append(traits)
+            for i, token in enumerate(response_data["data"]):
 
-            rarity_traits = traits.copy()
-            # Now we will form the rarity data
-            rarity_traits["RARITY_SCORE"] = token["score"]
-            rarity_traits["Rank"] = token["positionId"]
-            for atr in token["traits"]:
-                rarity_traits[atr["c"]] = atr["r"]
+                token_ids.append(token["id"])
+                traits, rarity_traits = parse_token(token)
 
-            rarity_data.append(rarity_traits)
+                # add this token to dictionary list
+                raw_metadata.append(traits)
+                rarity_data.append(rarity_traits)
 
-            if save_raw_data:
-                # print(f"Saving raw attributes to disk...")
-                PATH = (
-                    f"{config.ATTRIBUTES_FOLDER}/{COLLECTION_NAME}/{token['id']}.json"
-                )
-                with open(PATH, "w") as destination_file:
-                    json.dump(token, destination_file)
+                if save_raw_data:
+                    save_raw_token(token, COLLECTION_NAME, archive)
     else:
         print(response.text)
         raise Exception(f"Error: {response.status_code}")
 
-    print(f"tokens in the list {len(token_ids)}")
-    print(f"lower_id: {min(token_ids)}")
-    print(f"upper_id: {max(token_ids)}")
-
-    if min(token_ids) == 0:
-        max_supply = max(token_ids) + 1
-        print(f"max supply: {max(token_ids) + 1}")
-    else:
-        max_supply = max(token_ids)
-        print(f"max supply: {max(token_ids)}")
+    print_completeness(len(token_ids), min(token_ids), max(token_ids))
 
-    # warn if raritysniffer doesn't have the full collection
-    # TODO: print a list of missing token ids
-    if len(token_ids) != max_supply:
-        print(f"{max_supply - len(token_ids)} tokens with missing metadata")
-
-    # Generate traits DataFrame and save to disk as csv
+    # Generate traits DataFrame and save to disk
     trait_db = pd.DataFrame.from_records(raw_metadata)
     trait_db = trait_db.set_index("TOKEN_ID")
     trait_db = trait_db.sort_index()
 
-    trait_db.to_csv(f"{config.ATTRIBUTES_FOLDER}/{COLLECTION_NAME}.csv")
+    datasets.write_dataframe(
+        trait_db, f"{config.ATTRIBUTES_FOLDER}/{COLLECTION_NAME}.csv", output_format
+    )
 
-    # Generate rarity DataFrame and save to disk as csv
+    # Generate rarity DataFrame and save to disk
     rarity_db = pd.DataFrame.from_records(rarity_data)
     rarity_db = rarity_db.sort_values(["Rank"], ascending=True)
 
@@ -132,14 +222,139 @@ def download(
 
     rarity_db = rarity_db.set_index("TOKEN_ID")
 
-    rarity_db.to_csv(f"{config.RARITY_FOLDER}/{COLLECTION_NAME}_raritytools.csv")
+    datasets.write_dataframe(
+        rarity_db,
+        f"{config.RARITY_FOLDER}/{COLLECTION_NAME}_raritytools.csv",
+        output_format,
+    )
 
-    # Compress raw data and delete folder
-    if compress_raw_data:
-        # print("Compressing raw metadata")
-        dir_name = f"{config.ATTRIBUTES_FOLDER}/{COLLECTION_NAME}"
-        shutil.make_archive(dir_name, "zip", dir_name)
-        shutil.rmtree(dir_name)
+    print("finished.")
+
+
+def download_stream(
+    contract_address: str,
+    normalize_traits: bool = True,
+    trait_count: bool = True,
+    save_raw_data: bool = False,
+    compress_raw_data: bool = False,
+    collection: Optional[str] = None,
+    chunk_size: int = streaming.DEFAULT_CHUNK_SIZE,
+    output_format: str = "csv",
+) -> None:
+    """Streaming version of download() for very large collections.
+
+    The raritysniffer response is parsed incrementally and every token is written
+    straight to the attribute and rarity CSV files in chunks of chunk_size rows.
+    Rows are written in the order raritysniffer returns them instead of being sorted.
+    If no collection name is given and the API sends the name after the tokens,
+    the contract address is used as collection name.
+
+    :param contract_address: Collection contract address
+    :param normalize_traits: Trait Normalization
+    :param trait_count: Trait Count Weight
+    :param save_raw_data: Keep raw metadata for each individual token_id
+    :param compress_raw_data: Write the raw metadata into a zip archive instead of a folder
+    :param collection: Collection name. If not provided, will be derived from API response.
+    :param chunk_size: Number of rows to keep in memory before writing them to disk
+    :param output_format: File format of the output, one of datasets.OUTPUT_FORMATS
+    """
+    url = "https://raritysniffer.com/api/index.php"
+
+    params = {
+        "query": "fetch",
+        "collection": contract_address,
+        "taskId": "any",
+        "norm": str(normalize_traits).lower(),
+        "partial": str(False).lower(),
+        "traitCount": str(trait_count).lower(),
+    }
+
+    headers = {
+        "Content-Type": "application/json",
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/75.0.3770.100 Safari/537.36",
+    }
+
+    response = requests.request("GET", url, headers=headers, params=params, stream=True)
+    if response.status_code != 200:
+        print(response.text)
+        raise Exception(f"Error: {response.status_code}")
+    response.raw.decode_content = True
+
+    COLLECTION_NAME = collection
+    trait_writer = None
+    rarity_writer = None
+    archive = None
+
+    # running stats to make completeness checks
+    token_count = 0
+    lower_id = None
+    upper_id = None
+
+    # The spill files of the CSV writers and the archive are removed again if parsing
+    # or the stream fails
+    with contextlib.ExitStack() as stack:
+        for key, value in streaming.iter_json_object(
+            response.raw, stream_keys=("data",)
+        ):
+            if key == "name" and COLLECTION_NAME is None:
+                COLLECTION_NAME = value.replace(" ", "")
+                continue
+            elif key != "data":
+                continue
+
+            token = value
+            if trait_writer is None or rarity_writer is None:
+                if COLLECTION_NAME is None:
+                    COLLECTION_NAME = contract_address
+                print(f"Receiving data for {COLLECTION_NAME}")
+                trait_writer = stack.enter_context(
+                    streaming.ChunkedCsvWriter(
+                        f"{config.ATTRIBUTES_FOLDER}/{COLLECTION_NAME}.csv",
+                        index_col="TOKEN_ID",
+                        chunk_size=chunk_size,
+                    )
+                )
+                rarity_writer = stack.enter_context(
+                    streaming.ChunkedCsvWriter(
+                        f"{config.RARITY_FOLDER}/{COLLECTION_NAME}_raritytools.csv",
+                        index_col="TOKEN_ID",
+                        chunk_size=chunk_size,
+                    )
+                )
+                # Raw metadata is written while the tokens are parsed
+                if save_raw_data:
+                    archive = open_raw_data(COLLECTION_NAME, compress_raw_data)
+                    if archive is not None:
+                        stack.enter_context(archive)
+
+            token_count += 1
+            lower_id = token["id"] if lower_id is None else min(lower_id, token["id"])
+            upper_id = token["id"] if upper_id is None else max(upper_id, token["id"])
+
+            traits, rarity_traits = parse_token(token)
+            trait_writer.write(traits)
+            rarity_writer.write(rarity_traits)
+
+            if save_raw_data:
+                save_raw_token(token, COLLECTION_NAME, archive)  # type: ignore
+
+        if trait_writer is None or rarity_writer is None:
+            raise Exception(f"No tokens found for {contract_address}")
+
+        print_completeness(token_count, lower_id, upper_id)  # type: ignore
+
+        def move_score_and_rank(chunk: pd.DataFrame) -> pd.DataFrame:
+            columns = [c for c in chunk.columns if c not in ("RARITY_SCORE", "Rank")]
+            return chunk[columns + ["RARITY_SCORE", "Rank"]]
+
+        trait_writer.close()
+        rarity_writer.close(transform=move_score_and_rank)
+
+    if output_format != "csv":
+        for writer in (trait_writer, rarity_writer):
+            datasets.convert_data_file(
+                writer.file_path, output_format, remove_source=True
+            )
 
     print("finished.")
 
@@ -190,7 +405,7 @@ def _cli_parser() -> argparse.ArgumentParser:
 
     parser.add_argument(
         "--compress_raw_data",
-        help="Set to 'True' to zip raw metadata to save disk space. (Default: False)",
+        help="Set to 'True' to write the raw metadata into a zip archive instead of a folder. (Default: False)",
         type=misc.strtobool,
         nargs="?",
         const=True,
@@ -203,6 +418,28 @@ def _cli_parser() -> argparse.ArgumentParser:
         default=None,
         help="Collection name. If not provided, will be derived from API response.",
     )
+    parser.add_argument(
+        "--stream",
+        help="Set to 'True' to parse the response incrementally and write it to disk in chunks. Use for very large collections. (Default: False)",
+        type=misc.strtobool,
+        nargs="?",
+        const=True,
+        default=False,
+        choices=[True, False],
+    )
+    parser.add_argument(
+        "--chunk_size",
+        type=int,
+        default=streaming.DEFAULT_CHUNK_SIZE,
+        help=f"Number of rows to keep in memory when streaming. (Default: {streaming.DEFAULT_CHUNK_SIZE})",
+    )
+    parser.add_argument(
+        "--output-format",
+        type=str,
+        choices=datasets.OUTPUT_FORMATS,
+        default="csv",
+        help="File format of the attribute and rarity data. Parquet and arrow require pyarrow. (Default: csv)",
+    )
     return parser
 
 
@@ -216,4 +453,7 @@ if __name__ == "__main__":
         save_raw_data=args.save_raw_data,
         compress_raw_data=args.compress_raw_data,
         collection=args.collection,
+        stream=args.stream,
+        chunk_size=args.chunk_size,
+        output_format=args.output_format,
     )
@@ -20,18 +20,180 @@
 import argparse
 import csv
 import time
+from array import array
 from pprint import pprint
-from typing import Dict
+from typing import Dict, Tuple
 
 import requests
 from honestnft_utils import config
+from honestnft_utils import datasets
 from honestnft_utils import misc
 
 
+def score_token(
+    token_metadata: list,
+    all_traits: list,
+    starting_count_y: int,
+    nft_metadata_len: int,
+    total_tokens_len: int,
+    normalize_trait: bool,
+) -> Tuple[list, dict, float, bool]:
+    """Decode the metadata of a single rarity.tools item and calculate its rarity scores.
+
+    :param token_metadata: The encoded token as found in the "items" of the rarity.tools data
+    :param all_traits: The "basePropDefs" of the rarity.tools data
+    :param starting_count_y: Index of the first trait in token_metadata
+    :param nft_metadata_len: Number of entries in token_metadata to decode
+    :param total_tokens_len: Number of tokens in the collection
+    :param normalize_trait: Whether to use rarity.tools trait normalization
+    :return: A tuple of the decoded traits, the score of each trait, the token rarity score
+        and a flag indicating Thematic Matches were skipped
+    """
+    number_of_traits_types = len(all_traits) - 1
+    constant_number = (
+        1000000 / total_tokens_len
+    )  # This constant number is used to normalize the scoring, I found it by reverse engineering a few samples
+    warning_flag = False
+    token_rarity_score = 0
+    this_token_trait = []
+    each_trait_score = {}
+
+    # Looping through each Metadata of the token, and calculating rarity scores
+    for y in range(starting_count_y, nft_metadata_len):
+        # There is a chance that Thematic Match info is stored as "derivedPropDefs" from the data query. Skipping this condition.
+        # This happens while extracting "Wicked Craniums" project
+        if y >= len(all_traits):
+            warning_flag = True
+            break
+
+        this_trait_rarity_score = 0
+        temp_scoring = 0
+        # Some traits data is stored as List, so we have to loop it through
+        if isinstance(token_metadata[y], list):
+
+            temp_scoring = 0
+            if len(token_metadata[y]) == 0:
+                if normalize_trait:
+                    try:
+                        number_of_category = len(all_traits[y]["pvs"])
+                    except:
+                        print(y)
+                        pprint(all_traits[y])
+                        input(
+                            "Error Found on the count above. Press Any key to continue."
+                        )
+
+                    token_rarity_score = token_rarity_score + (
+                        constant_number / (number_of_traits_types * number_of_category)
+                    ) / (all_traits[y]["pvs"][0][1] / total_tokens_len)
+                    this_trait_rarity_score = (
+                        constant_number / (number_of_traits_types * number_of_category)
+                    ) / (all_traits[y]["pvs"][0][1] / total_tokens_len)
+                    temp_scoring += this_trait_rarity_score
+                else:
+                    token_rarity_score = token_rarity_score + 1 / (
+                        all_traits[y]["pvs"][0][1] / total_tokens_len
+                    )
+                    temp_scoring += this_trait_rarity_score
+            else:
+                for each_theme in token_metadata[y]:
+                    if normalize_trait:
+
+                        try:
+                            number_of_category = len(all_traits[y]["pvs"])
+                        except:
+                            print(y)
+                            pprint(all_traits[y])
+                            input(
+                                "Error Found on the count above. Press Any key to continue."
+                            )
+
+                        token_rarity_score = token_rarity_score + (
+                            constant_number
+                            / (number_of_traits_types * number_of_category)
+                        ) / (all_traits[y]["pvs"][each_theme][1] / total_tokens_len)
+                        this_trait_rarity_score = (
+                            constant_number
+                            / (number_of_traits_types * number_of_category)
+                        ) / (all_traits[y]["pvs"][each_theme][1] / total_tokens_len)
+                        temp_scoring += this_trait_rarity_score
+                    else:
+                        token_rarity_score = token_rarity_score + 1 / (
+                            all_traits[y]["pvs"][each_theme][1] / total_tokens_len
+                        )
+                        this_trait_rarity_score = 1 / (
+                            all_traits[y]["pvs"][each_theme][1] / total_tokens_len
+                        )
+                        temp_scoring += this_trait_rarity_score
+        else:
+            if normalize_trait:
+                # Skip the traits that doesn't contain keys: pvs -> very unusual
+                # Was spotted once with byopills project
+                if all_traits[y].get("pvs", "empty") == "empty":
+                    break
+                else:
+                    number_of_category = len(all_traits[y]["pvs"])
+
+                    token_rarity_score = token_rarity_score + (
+                        constant_number / (number_of_traits_types * number_of_category)
+                    ) / (all_traits[y]["pvs"][token_metadata[y]][1] / total_tokens_len)
+                    this_trait_rarity_score = (
+                        constant_number / (number_of_traits_types * number_of_category)
+                    ) / (all_traits[y]["pvs"][token_metadata[y]][1] / total_tokens_len)
+
+            else:
+                token_rarity_score = token_rarity_score + 1 / (
+                    all_traits[y]["pvs"][token_metadata[y]][1] / total_tokens_len
+                )
+                this_trait_rarity_score = 1 / (
+                    all_traits[y]["pvs"][token_metadata[y]][1] / total_tokens_len
+                )
+
+        if isinstance(token_metadata[y], list):
+
+            for each_theme in token_metadata[y]:
+                this_token_trait.append(
+                    {
+                        "node": {
+                            "traitType": all_traits[y]["name"],
+                            "value": all_traits[y]["pvs"][each_theme][0],
+                        }
+                    }
+                )
+
+            each_trait_score.update({all_traits[y]["name"]: temp_scoring})
+        else:
+            this_token_trait.append(
+                {
+                    "node": {
+                        "traitType": all_traits[y]["name"],
+                        "value": all_traits[y]["pvs"][token_metadata[y]][0],
+                    }
+                }
+            )
+            each_trait_score.update({all_traits[y]["name"]: this_trait_rarity_score})
+
+    return this_token_trait, each_trait_score, float(token_rarity_score), warning_flag
+
+
 def download(
-    project_name: str = "vogu", starting_count_y: int = 1, normalize_trait: bool = True
+    project_name: str = "vogu",
+    starting_count_y: int = 1,
+    normalize_trait: bool = True,
+    stream: bool = False,
+    chunk_size: int = 1000,
+    output_format: str = "csv",
 ) -> None:
     # The variable "starting_count_y" is usually 1, but in Rare case, the count has to start at 2, due to irregular data structure used by Rarity tools
+    if stream:
+        return download_stream(
+            project_name=project_name,
+            starting_count_y=starting_count_y,
+            normalize_trait=normalize_trait,
+            chunk_size=chunk_size,
+            output_format=output_format,
+        )
+
     start_time = time.time()
 
     print("Project : " + str(project_name))
@@ -56,14 +218,10 @@ def download(
     response = requests.request("GET", url, headers=headers)
     response_data = response.json()
     all_traits = response_data["basePropDefs"]
-    number_of_traits_types = len(all_traits) - 1
     nft_metadata = response_data["items"]
     metadata_scoring = {}
     metadata_to_save: Dict = {}
     total_tokens_len = len(nft_metadata)
-    constant_number = (
-        1000000 / total_tokens_len
-    )  # This constant number is used to normalize the scoring, I found it by reverse engineering a few samples
     rarity_table = {}
 
     # cut off the last element, if it is an empty array (cause problems with the script)
@@ -92,136 +250,20 @@ def download(
                 }
             }
         )
-        token_rarity_score = 0
-        this_token_trait = []
-        each_trait_score = {}
-
-        # Looping through each Metadata of the token, and calculating rarity scores
-        for y in range(starting_count_y, nft_metadata_len):
-            # There is a chance that Thematic Match info is stored as "derivedPropDefs" from the data query. Skipping this condition.
-            # This happens while extracting "Wicked Craniums" project
-            if y >= len(all_traits):
-                warning_flag = True
-                break
-
-            this_trait_rarity_score = 0
-            temp_scoring = 0
-            # Some traits data is stored as List, so we have to loop it through
-            if isinstance(nft_metadata[x][y], list):
-
-                temp_scoring = 0
-                if len(nft_metadata[x][y]) == 0:
-                    if normalize_trait:
-                        try:
-                            number_of_category = len(all_traits[y]["pvs"])
-                        except:
-                            print(y)
-                            pprint(all_traits[y])
-                            input(
-                                "Error Found on the count above. Press Any key to continue."
-                            )
-
-                        token_rarity_score = token_rarity_score + (
-                            constant_number
-                            / (number_of_traits_types * number_of_category)
-                        ) / (all_traits[y]["pvs"][0][1] / total_tokens_len)
-                        this_trait_rarity_score = (
-                            constant_number
-                            / (number_of_traits_types * number_of_category)
-                        ) / (all_traits[y]["pvs"][0][1] / total_tokens_len)
-                        temp_scoring += this_trait_rarity_score
-                    else:
-                        token_rarity_score = token_rarity_score + 1 / (
-                            all_traits[y]["pvs"][0][1] / total_tokens_len
-                        )
-                        temp_scoring += this_trait_rarity_score
-                else:
-                    for each_theme in nft_metadata[x][y]:
-                        if normalize_trait:
-
-                            try:
-                                number_of_category = len(all_traits[y]["pvs"])
-                            except:
-                                print(y)
-                                pprint(all_traits[y])
-                                input(
-                                    "Error Found on the count above. Press Any key to continue."
-                                )
-
-                            token_rarity_score = token_rarity_score + (
-                                constant_number
-                                / (number_of_traits_types * number_of_category)
-                            ) / (all_traits[y]["pvs"][each_theme][1] / total_tokens_len)
-                            this_trait_rarity_score = (
-                                constant_number
-                                / (number_of_traits_types * number_of_category)
-                            ) / (all_traits[y]["pvs"][each_theme][1] / total_tokens_len)
-                            temp_scoring += this_trait_rarity_score
-                        else:
-                            token_rarity_score = token_rarity_score + 1 / (
-                                all_traits[y]["pvs"][each_theme][1] / total_tokens_len
-                            )
-                            this_trait_rarity_score = 1 / (
-                                all_traits[y]["pvs"][each_theme][1] / total_tokens_len
-                            )
-                            temp_scoring += this_trait_rarity_score
-            else:
-                if normalize_trait:
-                    # Skip the traits that doesn't contain keys: pvs -> very unusual
-                    # Was spotted once with byopills project
-                    if all_traits[y].get("pvs", "empty") == "empty":
-                        break
-                    else:
-                        number_of_category = len(all_traits[y]["pvs"])
-
-                        token_rarity_score = token_rarity_score + (
-                            constant_number
-                            / (number_of_traits_types * number_of_category)
-                        ) / (
-                            all_traits[y]["pvs"][nft_metadata[x][y]][1]
-                            / total_tokens_len
-                        )
-                        this_trait_rarity_score = (
-                            constant_number
-                            / (number_of_traits_types * number_of_category)
-                        ) / (
-                            all_traits[y]["pvs"][nft_metadata[x][y]][1]
-                            / total_tokens_len
-                        )
-
-                else:
-                    token_rarity_score = token_rarity_score + 1 / (
-                        all_traits[y]["pvs"][nft_metadata[x][y]][1] / total_tokens_len
-                    )
-                    this_trait_rarity_score = 1 / (
-                        all_traits[y]["pvs"][nft_metadata[x][y]][1] / total_tokens_len
-                    )
-
-            if isinstance(nft_metadata[x][y], list):
-
-                for each_theme in nft_metadata[x][y]:
-                    this_token_trait.append(
-                        {
-                            "node": {
-                                "traitType": all_traits[y]["name"],
-                                "value": all_traits[y]["pvs"][each_theme][0],
-                            }
-                        }
-                    )
-
-                each_trait_score.update({all_traits[y]["name"]: temp_scoring})
-            else:
-                this_token_trait.append(
-                    {
-                        "node": {
-                            "traitType": all_traits[y]["name"],
-                            "value": all_traits[y]["pvs"][nft_metadata[x][y]][0],
-                        }
-                    }
-                )
-                each_trait_score.update(
-                    {all_traits[y]["name"]: this_trait_rarity_score}
-                )
+        (
+            this_token_trait,
+            each_trait_score,
+            token_rarity_score,
+            token_warning_flag,
+        ) = score_token(
+            token_metadata=nft_metadata[x],
+            all_traits=all_traits,
+            starting_count_y=starting_count_y,
+            nft_metadata_len=nft_metadata_len,
+            total_tokens_len=total_tokens_len,
+            normalize_trait=normalize_trait,
+        )
+        warning_flag = warning_flag or token_warning_flag
 
         rarity_table.update({str(token_id): float(token_rarity_score)})
         metadata_to_save[token_id].update({"nft_traits": this_token_trait})
@@ -290,6 +332,173 @@ def download(
             "============\nWARNING\n==============\nThe rarity data you are trying to extract might contain Thematic Match / Matching Sets that this script ignored. \nSo while you compare with Rarity Tools data, make sure Thematic Sets is turned off.\n\n"
         )
 
+    if output_format != "csv":
+        for file_name in (
+            metadata_attributes_csv_file_name,
+            metadata_scoring_csv_file_name,
+        ):
+            datasets.convert_data_file(file_name, output_format, remove_source=True)
+
+    print("--- %s seconds Taken to Download ---" % (time.time() - start_time))
+
+
+def download_stream(
+    project_name: str,
+    starting_count_y: int = 1,
+    normalize_trait: bool = True,
+    chunk_size: int = 1000,
+    output_format: str = "csv",
+) -> None:
+    """Streaming version of download() for very large collections.
+
+    The rarity.tools payload is parsed incrementally and every decoded token is
+    written straight to the attribute and rarity CSV files in chunks of chunk_size rows.
+    Only the token ids and rarity scores are kept in memory to assign the ranks.
+    Rows are written in the order rarity.tools returns them instead of being sorted.
+
+    :param project_name: Collection name as it appears in the rarity.tools URL
+    :param starting_count_y: Index of the first trait in each token (usually 1)
+    :param normalize_trait: Whether to use rarity.tools trait normalization
+    :param chunk_size: Number of rows to keep in memory before writing them to disk
+    :param output_format: File format of the output, one of datasets.OUTPUT_FORMATS
+    """
+    import numpy as np
+    import pandas as pd
+
+    from honestnft_utils import streaming
+
+    start_time = time.time()
+
+    print("Project : " + str(project_name))
+
+    metadata_attributes_csv_file_name = f"{config.ATTRIBUTES_FOLDER}/{project_name}.csv"
+    metadata_scoring_csv_file_name = (
+        f"{config.RARITY_FOLDER}/{project_name}_raritytools.csv"
+    )
+
+    warning_flag = False
+
+    url = "https://projects.rarity.tools/static/staticdata/" + project_name + ".json"
+
+    headers = {
+        "Content-Type": "application/json",
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/75.0.3770.100 Safari/537.36",
+    }
+
+    response = requests.request("GET", url, headers=headers, stream=True)
+    response.raise_for_status()
+    response.raw.decode_content = True
+
+    # The spill files of the writers are removed again if parsing or the stream fails
+    with streaming.ChunkedCsvWriter(
+        metadata_attributes_csv_file_name, index_col="TOKEN_ID", chunk_size=chunk_size
+    ) as attribute_writer, streaming.ChunkedCsvWriter(
+        metadata_scoring_csv_file_name, chunk_size=chunk_size
+    ) as scoring_writer:
+
+        all_traits = None
+        nft_metadata_len = None
+        token_ids = []
+        rarity_scores = array("d")
+
+        for key, value in streaming.iter_json_object(
+            response.raw, stream_keys=("items",)
+        ):
+            if key == "basePropDefs":
+                all_traits = value
+                continue
+            elif key != "items":
+                continue
+
+            if all_traits is None:
+                raise ValueError(
+                    "rarity.tools returned the items before the trait definitions. Use the non-streaming mode instead."
+                )
+
+            if nft_metadata_len is None:
+                # cut off the last element, if it is an empty array (cause problems with the script)
+                last_element_of_metadata = value[len(value) - 1]
+                if (
+                    isinstance(last_element_of_metadata, list)
+                    and len(last_element_of_metadata) == 0
+                ):
+                    nft_metadata_len = len(value) - 1
+                else:
+                    nft_metadata_len = len(value)
+
+            # The number of tokens is only known at the end of the stream, so we score with a
+            # collection size of 1 and rescale afterwards. Normalized scores don't depend on it.
+            (
+                this_token_trait,
+                each_trait_score,
+                token_rarity_score,
+                token_warning_flag,
+            ) = score_token(
+                token_metadata=value,
+                all_traits=all_traits,
+                starting_count_y=starting_count_y,
+                nft_metadata_len=nft_metadata_len,
+                total_tokens_len=1,
+                normalize_trait=normalize_trait,
+            )
+            warning_flag = warning_flag or token_warning_flag
+
+            token_id = str(value[0])
+            token_ids.append(token_id)
+            rarity_scores.append(token_rarity_score)
+
+            token_raw = {
+                "TOKEN_ID": token_id,
+                "TOKEN_NAME": f"{project_name} #{token_id}",
+            }
+            for trait in this_token_trait:
+                if trait["node"]["traitType"] != "Trait Count":
+                    token_raw[trait["node"]["traitType"]] = trait["node"]["value"]
+            attribute_writer.write(token_raw)
+
+            scoring_row: Dict = {
+                "TOKEN_ID": token_id,
+                "TOKEN_NAME": project_name + " #" + token_id,
+            }
+            scoring_row.update(each_trait_score)
+            scoring_row["RARITY_SCORE"] = token_rarity_score
+            scoring_writer.write(scoring_row)
+
+        total_tokens_len = len(token_ids)
+        print("Number of Token : " + str(total_tokens_len))
+
+        # Sort all the rarity data base on the rarity scores (Descending Order)
+        scores = np.frombuffer(rarity_scores, dtype=np.float64)
+        order = np.argsort(-scores, kind="stable")
+        ranks = np.empty(total_tokens_len, dtype=np.int64)
+        ranks[order] = np.arange(1, total_tokens_len + 1)
+        rank_map = pd.Series(ranks, index=token_ids)
+        scale = 1 if normalize_trait else total_tokens_len
+
+        def add_rank(chunk: pd.DataFrame) -> pd.DataFrame:
+            if scale != 1:
+                score_columns = chunk.columns[2:]
+                chunk[score_columns] = (
+                    chunk[score_columns].replace("", np.nan).astype(float) * scale
+                )
+            chunk["Rank"] = chunk["TOKEN_ID"].map(rank_map).values
+            return chunk
+
+        attribute_writer.close()
+        scoring_writer.close(transform=add_rank)
+
+    if warning_flag:
+        print(
+            "============\nWARNING\n==============\nThe rarity data you are trying to extract might contain Thematic Match / Matching Sets that this script ignored. \nSo while you compare with Rarity Tools data, make sure Thematic Sets is turned off.\n\n"
+        )
+
+    if output_format != "csv":
+        for file_name in (
+            metadata_attributes_csv_file_name,
+            metadata_scoring_csv_file_name,
+        ):
+            datasets.convert_data_file(file_name, output_format, remove_source=True)
+
     print("--- %s seconds Taken to Download ---" % (time.time() - start_time))
 
 
@@ -351,6 +560,31 @@ def _cli_parser() -> argparse.ArgumentParser:
         choices=[True, False],
     )
 
+    parser.add_argument(
+        "--stream",
+        help="Parse the rarity.tools data incrementally and write it to disk in chunks. Use for very large collections. (Default: False)",
+        type=misc.strtobool,
+        const=True,
+        nargs="?",
+        default=False,
+        choices=[True, False],
+    )
+
+    parser.add_argument(
+        "--chunk_size",
+        help="Number of rows to keep in memory when streaming. (Default: 1000)",
+        type=int,
+        default=1000,
+    )
+
+    parser.add_argument(
+        "--output-format",
+        help="File format of the attribute and rarity data. Parquet and arrow require pyarrow. (Default: csv)",
+        type=str,
+        choices=datasets.OUTPUT_FORMATS,
+        default="csv",
+    )
+
     return parser
 
 
@@ -361,4 +595,7 @@ if __name__ == "__main__":
         project_name=args.collection,
         starting_count_y=args.starting_count_y,
         normalize_trait=args.normalize_trait,
+        stream=args.stream,
+        chunk_size=args.chunk_size,
+        output_format=args.output_format,
     )
@@ -3,7 +3,7 @@ import concurrent.futures
 import json
 import os
 import re
-from typing import Dict, List, Optional, Tuple, Union
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 from urllib.error import HTTPError
 
 import pandas as pd
@@ -11,20 +11,17 @@ import requests
 
 from honestnft_utils import config, misc
 
+TOKEN_ID_PATTERN = re.compile(r"#(?P<token_id>\d+)")
 
-def save_metadata(
-    raw_metadata: dict, token_id: Union[int, str], collection: str
-) -> None:
-    """Transform and save metadata as json to disk.
 
-    We transform the metadata so it conforms to the ERC-721 standard.
+def transform_metadata(raw_metadata: dict, token_id: Union[int, str, None]) -> dict:
+    """Transform raw metadata so it conforms to the ERC-721 standard.
     This makes the files compatible with our analysis tools.
 
     :param raw_metadata: The raw metadata as a dict
     :param token_id: The token_id of the NFT
-    :param collection: The collection name
+    :return: The transformed metadata
     """
-
     metadata_dict = {
         "name": raw_metadata["name"],
         "description": raw_metadata["description"],
@@ -41,19 +38,36 @@ def save_metadata(
                 {"trait_type": attr["trait_type"], "value": attr["value"]}
             )
     metadata_dict["attributes"] = attributes
+    return metadata_dict
+
+
+def save_metadata(
+    raw_metadata: dict, token_id: Union[int, str], collection: str
+) -> None:
+    """Transform and save metadata as json to disk.
+
+    :param raw_metadata: The raw metadata as a dict
+    :param token_id: The token_id of the NFT
+    :param collection: The collection name
+    """
+    metadata_dict = transform_metadata(raw_metadata, token_id)
 
     filename = f"{config.ATTRIBUTES_FOLDER}/{collection}/{token_id}.json"
     with open(filename, "w") as destination_file:
         json.dump(metadata_dict, destination_file)
 
 
-def fetch_metadata_uris(contract: str) -> List[Dict[str, str]]:
-    """Fetch the metadata uris for a given contract from theindex.io.
+def _metadata_uri(nft: dict) -> Dict[str, Optional[str]]:
+    """Get the token_id and metadata uri of an NFT returned by theindex.io."""
+    matches = TOKEN_ID_PATTERN.search(nft["metadata"]["name"])
+    token_id = matches.group("token_id") if matches else None
+    return {"token_id": token_id, "uri": nft["metadata"]["uri"]}
+
+
+def _post_get_nfts(contract: str, stream: bool = False) -> requests.Response:
+    """Request all NFTs of a collection from theindex.io.
 
-    :param contract: The NFT contract address
-    :raises Exception: If the index.io API returns an error
     :raises HTTPError: If the index.io API returns a non-200 response
-    :return: A list of dicts containing the token_id and metadata uri
     """
     api_url = f"https://rpc.theindex.io/mainnet-beta/{config.THE_INDEX_API_KEY}"
     payload = {
@@ -62,28 +76,8 @@ def fetch_metadata_uris(contract: str) -> List[Dict[str, str]]:
         "params": [contract],
         "id": 1,
     }
-    resp = requests.post(url=api_url, json=payload)
-    if resp.status_code == 200:
-        decoded_response = resp.json()
-        if decoded_response.get("result"):
-            metadata_uris = []
-            for nft in decoded_response["result"]:
-
-                matches = re.search(r"#(?P<token_id>\d+)", nft["metadata"]["name"])
-                if matches.groups():  # type: ignore
-                    token_id = matches.group("token_id")  # type: ignore
-                else:
-                    token_id = None
-                metadata_uris.append(
-                    {"token_id": token_id, "uri": nft["metadata"]["uri"]}
-                )
-            return metadata_uris
-
-        elif decoded_response.get("error"):
-            raise Exception(decoded_response["error"])
-        else:
-            raise Exception(f"Unknown error\n{resp.text}")
-    else:
+    resp = requests.post(url=api_url, json=payload, stream=stream)
+    if resp.status_code != 200:
         raise HTTPError(
             url=resp.url,
             code=resp.status_code,
@@ -91,6 +85,53 @@ def fetch_metadata_uris(contract: str) -> List[Dict[str, str]]:
             hdrs=resp.headers,
             fp=None,
         )
+    return resp
+
+
+def fetch_metadata_uris(contract: str) -> List[Dict[str, Optional[str]]]:
+    """Fetch the metadata uris for a given contract from theindex.io.
+
+    :param contract: The NFT contract address
+    :raises Exception: If the index.io API returns an error
+    :raises HTTPError: If the index.io API returns a non-200 response
+    :return: A list of dicts containing the token_id and metadata uri
+    """
+    resp = _post_get_nfts(contract)
+    decoded_response = resp.json()
+    if decoded_response.get("result"):
+        return [_metadata_uri(nft) for nft in decoded_response["result"]]
+    elif decoded_response.get("error"):
+        raise Exception(decoded_response["error"])
+    else:
+        raise Exception(f"Unknown error\n{resp.text}")
+
+
+def iter_metadata_uris(contract: str) -> Iterator[Dict[str, Optional[str]]]:
+    """Streaming version of fetch_metadata_uris() for large collections.
+
+    The theindex.io response is parsed incrementally, so every metadata uri is yielded
+    as soon as it arrives instead of after the whole response is downloaded and decoded.
+    Requires the optional ijson package.
+
+    :param contract: The NFT contract address
+    :raises Exception: If the index.io API returns an error
+    :raises HTTPError: If the index.io API returns a non-200 response
+    :return: An iterator of dicts containing the token_id and metadata uri
+    """
+    from honestnft_utils import streaming
+
+    resp = _post_get_nfts(contract, stream=True)
+    resp.raw.decode_content = True
+
+    found = False
+    for key, value in streaming.iter_json_object(resp.raw, stream_keys=("result",)):
+        if key == "result" and value is not None:
+            found = True
+            yield _metadata_uri(value)
+        elif key == "error" and value:
+            raise Exception(value)
+    if not found:
+        raise Exception("Unknown error, theindex.io returned no result")
 
 
 def fetch(token_id: str, metadata_uri: str) -> Tuple[str, dict]:
@@ -113,6 +154,58 @@ def fetch(token_id: str, metadata_uri: str) -> Tuple[str, dict]:
         )
 
 
+def parse_token_metadata(metadata_dict: dict) -> Optional[Dict]:
+    """Transform the metadata of a single token in a similar format as pulling.py.
+
+    :param metadata_dict: The metadata, as returned by transform_metadata
+    :raises ValueError: If no attribute key can be found in the metadata
+    :return: A dict with the token name, token id and traits,
+        or None if the attributes can't be parsed
+    """
+    # TODO: What are other variations of name?
+    # Add token name and token URI traits to the trait dictionary
+    traits = dict()
+    if "name" in metadata_dict:
+        traits["TOKEN_NAME"] = metadata_dict["name"]
+    else:
+        traits["TOKEN_NAME"] = f"UNKNOWN"
+    traits["TOKEN_ID"] = metadata_dict["tokenId"]
+
+    # Find the attribute key from the server response
+    if "attributes" in metadata_dict:
+        attribute_key = "attributes"
+    elif "traits" in metadata_dict:
+        attribute_key = "traits"
+    elif "properties" in metadata_dict:
+        attribute_key = "properties"
+    else:
+        raise ValueError(
+            f"Failed to find the attribute key in the token {metadata_dict['tokenId']} "
+            f'metadata result. Tried "attributes" and "traits".\nAvailable '
+            f"keys: {metadata_dict.keys()}"
+        )
+
+    # Add traits from the server response JSON to the traits dictionary
+    try:
+        for attribute in metadata_dict[attribute_key]:
+            if "value" in attribute and "trait_type" in attribute:
+                traits[attribute["trait_type"]] = attribute["value"]
+            elif "value" not in attribute and isinstance(attribute, dict):
+                if len(attribute.keys()) == 1:
+                    traits[attribute["trait_type"]] = "None"
+            elif isinstance(attribute, str):
+                traits[attribute] = metadata_dict[attribute_key][attribute]
+        return traits
+
+    # Handle exceptions result from URI does not contain attributes
+    except Exception as err:
+        print(err)
+        print(
+            f"Failed to get metadata for id {metadata_dict['tokenId']}. Url response was {metadata_dict}."
+        )
+        return None
+
+
 def parse_metadata(token_id_list: List, collection: str) -> List[Dict]:
     """Given a list of token_ids and a collection name, this function reads the raw metadata from disk,
     transforms it in a similar format as pulling.py and ultimately returns a list of dicts.
@@ -123,123 +216,120 @@ def parse_metadata(token_id_list: List, collection: str) -> List[Dict]:
     :raises ValueError: If no attribute key can be found in the metadata
     :return: List of dicts containing metadata in the same format as pulling.py
     """
-    metadata_list = []
-
     parsed_metadata_list = []
 
     for token_id in token_id_list:
-        # Initiate json result
-        result_json = None
-
-        # Check if metadata file already exists
         filename = f"{config.ATTRIBUTES_FOLDER}/{collection}/{token_id}.json"
-
-        if os.path.exists(filename):
-            # Load existing file from disk
-            with open(filename, "r") as f:
-                result_json = json.load(f)
-                metadata_list.append(result_json)
-        else:
-            # TODO: Download individual metadata file, save metadata to disk, read it and add it to the list
-            raise FileNotFoundError(filename)
-
-    for metadata_dict in metadata_list:
-        if metadata_dict is not None:
-
-            # TODO: What are other variations of name?
-            # Add token name and token URI traits to the trait dictionary
-            traits = dict()
-            if "name" in metadata_dict:
-                traits["TOKEN_NAME"] = metadata_dict["name"]
-            else:
-                traits["TOKEN_NAME"] = f"UNKNOWN"
-            traits["TOKEN_ID"] = metadata_dict["tokenId"]
-
-            # Find the attribute key from the server response
-            if "attributes" in metadata_dict:
-                attribute_key = "attributes"
-            elif "traits" in metadata_dict:
-                attribute_key = "traits"
-            elif "properties" in metadata_dict:
-                attribute_key = "properties"
-            else:
-                raise ValueError(
-                    f"Failed to find the attribute key in the token {metadata_dict['tokenId']} "
-                    f'metadata result. Tried "attributes" and "traits".\nAvailable '
-                    f"keys: {metadata_dict.keys()}"
-                )
-
-            # Add traits from the server response JSON to the traits dictionary
-            try:
-                for attribute in metadata_dict[attribute_key]:
-                    if "value" in attribute and "trait_type" in attribute:
-                        traits[attribute["trait_type"]] = attribute["value"]
-                    elif "value" not in attribute and isinstance(attribute, dict):
-                        if len(attribute.keys()) == 1:
-                            traits[attribute["trait_type"]] = "None"
-                    elif isinstance(attribute, str):
-                        traits[attribute] = metadata_dict[attribute_key][attribute]
-                parsed_metadata_list.append(traits)
-
-            # Handle exceptions result from URI does not contain attributes
-            except Exception as err:
-                print(err)
-                print(
-                    f"Failed to get metadata for id {metadata_dict['tokenId']}. Url response was {metadata_dict}."
-                )
+        with open(filename, "r") as f:
+            traits = parse_token_metadata(json.load(f))
+        if traits is not None:
+            parsed_metadata_list.append(traits)
 
     return parsed_metadata_list
 
 
-def pull_metadata(collection: str, contract: str, threads: Optional[int]) -> None:
+def pull_metadata(
+    collection: str,
+    contract: str,
+    threads: Optional[int],
+    cache: bool = True,
+    stream: bool = False,
+) -> None:
     """The main function for pulling and parsing Solana NFT metadata.
     This function takes care of downloading, parsing, and saving the metadata.
 
+    Trait rows are built from the downloaded metadata as soon as each download completes.
+    Tokens that fail to download are retried individually once all other tokens are done,
+    and skipped if they fail again.
+
     :param collection: The collection name
     :param contract: The NFT contract address
     :param threads: The number of threads to use for concurrently downloading the metadata
+    :param cache: Save the metadata of every token with an id in its name to disk
+        and reuse the saved metadata
+    :param stream: Parse the theindex.io response incrementally and start downloading
+        while the metadata uris are still arriving. Requires the optional ijson package.
     """
     folder = f"{config.ATTRIBUTES_FOLDER}/{collection}/"
-    if not os.path.exists(folder):
+    if cache and not os.path.exists(folder):
         os.mkdir(folder)
 
     # Get all metadata uris for collection
-    metadata_uris = fetch_metadata_uris(contract=contract)
-
-    token_ids = []
-    for entry in metadata_uris:
-        token_ids.append(entry["token_id"])
+    if stream:
+        uris: Iterable[Dict[str, Optional[str]]] = iter_metadata_uris(contract)
+    else:
+        uris = fetch_metadata_uris(contract=contract)
+
+    metadata_uris: List[Dict[str, Optional[str]]] = []
+    # Trait rows by position in metadata_uris, to keep the order of the collection
+    parsed_metadata: Dict[int, Optional[Dict]] = {}
+    failed = []
+
+    def cache_file(entry: Dict[str, Optional[str]]) -> Optional[str]:
+        # Tokens without an id in their name can't be found in the cache before
+        # they are downloaded, so they aren't cached
+        if not cache or entry["token_id"] is None:
+            return None
+        return f"{folder}/{entry['token_id']}.json"
+
+    def add_metadata(position: int, raw_metadata: dict) -> None:
+        token_id = metadata_uris[position]["token_id"]
+        metadata_dict = transform_metadata(raw_metadata, token_id)
+        filename = cache_file(metadata_uris[position])
+        if filename is not None:
+            with open(filename, "w") as destination_file:
+                json.dump(metadata_dict, destination_file)
+        parsed_metadata[position] = parse_token_metadata(metadata_dict)
+
+    def collect(futures: Iterable[concurrent.futures.Future]) -> None:
+        for future in futures:
+            position = pending.pop(future)
+            try:
+                add_metadata(position, future.result()[1])
+            except Exception as err:
+                print(err)
+                failed.append(position)
 
+    # At most BATCH_SIZE downloads are queued, so the uris are consumed as the
+    # downloads progress
     BATCH_SIZE = 50
+    pending: Dict[concurrent.futures.Future, int] = {}
     with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
-        for i in range(0, len(metadata_uris), BATCH_SIZE):
-            token_ids_batch = metadata_uris[i : i + BATCH_SIZE]
-            # Skip on-chain fetch if we already have the metadata
-            token_ids_batch = list(
-                filter(
-                    lambda entry: not os.path.exists(
-                        f"{folder}/{entry['token_id']}.json"
-                    ),
-                    token_ids_batch,
-                )
-            )
-            futures = [
-                executor.submit(fetch, metadata_uri["token_id"], metadata_uri["uri"])
-                for metadata_uri in token_ids_batch
-            ]
-            for future in concurrent.futures.as_completed(futures):
-                token_id = future.result()[0]
-                metadata = future.result()[1]
-                save_metadata(
-                    raw_metadata=metadata,
-                    token_id=token_id,
-                    collection=collection,
+        for entry in uris:
+            position = len(metadata_uris)
+            metadata_uris.append(entry)
+            filename = cache_file(entry)
+            # Skip the download if we already have the metadata
+            if filename is not None and os.path.exists(filename):
+                with open(filename, "r") as f:
+                    parsed_metadata[position] = parse_token_metadata(json.load(f))
+                continue
+
+            future = executor.submit(fetch, entry["token_id"], entry["uri"])  # type: ignore
+            pending[future] = position
+            if len(pending) >= BATCH_SIZE:
+                done, _ = concurrent.futures.wait(
+                    pending, return_when=concurrent.futures.FIRST_COMPLETED
                 )
-
-    parsed_metadata = parse_metadata(token_id_list=token_ids, collection=collection)
+                collect(done)
+        collect(concurrent.futures.as_completed(list(pending)))
+
+    # Retry the failed downloads one at a time
+    for position in sorted(failed):
+        entry = metadata_uris[position]
+        try:
+            add_metadata(position, fetch(entry["token_id"], entry["uri"])[1])  # type: ignore
+        except Exception as err:
+            print(f"Skipping token {entry['token_id']}: {err}")
+
+    records = [
+        parsed_metadata[position]
+        for position in sorted(parsed_metadata)
+        if parsed_metadata[position] is not None
+    ]
 
     # Generate traits DataFrame and save to disk as csv
-    trait_db = pd.DataFrame.from_records(parsed_metadata)
+    trait_db = pd.DataFrame.from_records(records)
     trait_db = trait_db.set_index("TOKEN_ID")
     print(trait_db.head())
     trait_db.to_csv(f"{config.ATTRIBUTES_FOLDER}/{collection}.csv")
@@ -270,6 +360,20 @@ def _cli_parser() -> argparse.ArgumentParser:
         default=None,
         help=f"Number of threads to use for downloading metadata. (default: {min(32, os.cpu_count() + 4)})",  # type: ignore
     )
+    parser.add_argument(
+        "--no_cache",
+        action="store_true",
+        help="Don't save the metadata of every token to disk.",
+    )
+    parser.add_argument(
+        "--stream",
+        help="Parse the theindex.io response incrementally and start downloading right away. Use for very large collections. (Default: False)",
+        type=misc.strtobool,
+        const=True,
+        nargs="?",
+        default=False,
+        choices=[True, False],
+    )
     return parser
 
 
@@ -277,5 +381,9 @@ if __name__ == "__main__":
     args = _cli_parser().parse_args()
 
     pull_metadata(
-        collection=args.collection, contract=args.contract, threads=args.threads
+        collection=args.collection,
+        contract=args.contract,
+        threads=args.threads,
+        cache=not args.no_cache,
+        stream=args.stream,
     )
@@ -7,11 +7,12 @@ from pathlib import Path
 from typing import Union
 from urllib.parse import urlparse
 
+import numpy as np
 import pandas as pd
 from web3.contract import Contract
 from web3.exceptions import ContractLogicError
 
-from honestnft_utils import chain, config, ipfs, misc
+from honestnft_utils import alchemy, chain, config, datasets, ipfs, misc
 
 """
 Metadata helper methods
@@ -341,7 +342,15 @@ def pull_metadata(args: argparse.Namespace) -> None:
     print(f"Max supply: {max_supply}")
 
     # Fetch all attribute records from the remote server
-    token_ids = range(lower_id, upper_id + 1)
+    token_ids: Union[list, range] = range(lower_id, upper_id + 1)
+    if args.skip_missing:
+        if args.contract is None or args.blockchain != "ethereum":
+            raise ValueError("--skip_missing requires an Ethereum contract.")
+        exists = alchemy.existence_bitmap(
+            alchemy.iter_token_ids(args.contract), lower_id, upper_id
+        )
+        token_ids = (np.flatnonzero(exists) + lower_id).tolist()
+        print(f"Skipping {len(exists) - len(token_ids)} burned or unminted token ids")
 
     records = fetch_all_metadata(
         token_ids=token_ids,
@@ -356,11 +365,13 @@ def pull_metadata(args: argparse.Namespace) -> None:
         skip_ipfs_folder=args.skip_ipfs_folder,
     )
 
-    # Generate traits DataFrame and save to disk as csv
+    # Generate traits DataFrame and save to disk
     trait_db = pd.DataFrame.from_records(records)
     trait_db = trait_db.set_index("TOKEN_ID")
     print(trait_db.head())
-    trait_db.to_csv(f"{config.ATTRIBUTES_FOLDER}/{collection}.csv")
+    datasets.write_dataframe(
+        trait_db, f"{config.ATTRIBUTES_FOLDER}/{collection}.csv", args.output_format
+    )
 
 
 def _cli_parser() -> argparse.ArgumentParser:
@@ -470,6 +481,18 @@ def _cli_parser() -> argparse.ArgumentParser:
         action="store_true",
         help="Skip IPFS folder download.",
     )
+    parser.add_argument(
+        "--skip_missing",
+        action="store_true",
+        help="Skip burned or never minted token ids, using the Alchemy NFT API. (Ethereum only)",
+    )
+    parser.add_argument(
+        "--output-format",
+        type=str,
+        choices=datasets.OUTPUT_FORMATS,
+        default="csv",
+        help="File format of the attribute data. Parquet and arrow require pyarrow. (default: csv)",
+    )
 
     return parser
 
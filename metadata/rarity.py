@@ -1,9 +1,18 @@
 import argparse
+import concurrent.futures
+import contextlib
+import hashlib
+import io
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
 
 import numpy as np
 import pandas as pd
 
-from honestnft_utils import config
+from honestnft_utils import config, datasets
 
 
 def max_variety_count(trait_db: pd.DataFrame, trait_types: list) -> int:
@@ -135,9 +144,19 @@ def build_rarity_db(
     trait_count: bool,
     sum_traits: list,
     sum_trait_multiplier: int,
+    output_folder: Optional[str] = None,
+    output_format: str = "csv",
 ) -> None:
+    if output_folder is None:
+        output_folder = config.RARITY_FOLDER
+
     # Load raw attribute file from disk
-    trait_db = pd.read_csv(attribute_file, delimiter=",")
+    trait_db = datasets.read_dataframe(attribute_file)
+
+    # Columnar attribute files store traits as categoricals
+    trait_db = trait_db.astype(
+        {column: object for column in trait_db.select_dtypes("category").columns}
+    )
 
     # Format data frame such that null values display as 'None'
     trait_db = trait_db.fillna("None")
@@ -151,12 +170,178 @@ def build_rarity_db(
     )
 
     # Write rarity data to disk
-    rarity_db.to_csv(f"{config.RARITY_FOLDER}/{collection}_{method}.csv")
+    datasets.write_dataframe(
+        rarity_db, f"{output_folder}/{collection}_{method}.csv", output_format
+    )
 
     # Print top 5 items
     print(rarity_db.head(5).T)
 
 
+def _input_fingerprint(
+    attribute_file: str,
+    method: str,
+    trait_count: bool,
+    sum_traits: Optional[list],
+    sum_trait_multiplier: float,
+) -> str:
+    """Hash the attribute file together with the rarity settings.
+
+    :return: A hex digest that changes whenever the output of build_rarity_db would change
+    """
+    digest = hashlib.sha256()
+    with open(attribute_file, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    settings = [method, trait_count, sum_traits, sum_trait_multiplier]
+    digest.update(json.dumps(settings).encode())
+    return digest.hexdigest()
+
+
+def _build_collection(job: Dict) -> Dict:
+    """Build the rarity database of a single collection. Used as process pool worker.
+
+    :param job: Keyword arguments for build_rarity_db
+    :return: A dict with the collection name, status, duration and error (if any)
+    """
+    start_time = time.perf_counter()
+    result = {"collection": job["collection"], "status": "built", "error": None}
+    try:
+        # Keep the console readable, workers would otherwise interleave their output
+        with contextlib.redirect_stdout(io.StringIO()):
+            build_rarity_db(**job)
+    except Exception as err:
+        result["status"] = "failed"
+        result["error"] = str(err)
+    result["seconds"] = round(time.perf_counter() - start_time, 3)
+    return result
+
+
+def build_all_rarity_dbs(
+    method: str,
+    trait_count: bool,
+    sum_traits: Optional[list],
+    sum_trait_multiplier: float,
+    processes: Optional[int] = None,
+    force: bool = False,
+    attributes_folder: Optional[str] = None,
+    output_folder: Optional[str] = None,
+    output_format: str = "csv",
+) -> pd.DataFrame:
+    """Build the rarity database of every collection in the raw attributes folder.
+
+    Collections are processed in parallel on a process pool. A collection is skipped
+    when its attribute file and the rarity settings are unchanged since the last build.
+    The fingerprints and a timing summary are stored in the .build folder of output_folder.
+
+    :param method: Method to use to compute rarity
+    :param trait_count: Toggle using trait count in computation
+    :param sum_traits: Traits to sum instead of computing rarity
+    :param sum_trait_multiplier: Trait score multiplier to use for summed traits
+    :param processes: Number of worker processes. (default: number of CPUs)
+    :param force: Rebuild all collections, even if their input didn't change
+    :param attributes_folder: Folder with the raw attribute files. (default: config.ATTRIBUTES_FOLDER)
+    :param output_folder: Folder to write the rarity data to. (default: config.RARITY_FOLDER)
+    :param output_format: File format of the rarity data, one of datasets.OUTPUT_FORMATS
+    :return: A DataFrame with the status and duration of each collection
+    """
+    if attributes_folder is None:
+        attributes_folder = config.ATTRIBUTES_FOLDER
+    if output_folder is None:
+        output_folder = config.RARITY_FOLDER
+
+    build_folder = Path(output_folder).joinpath(".build")
+    build_folder.mkdir(parents=True, exist_ok=True)
+    manifest_file = build_folder.joinpath("manifest.json")
+    if manifest_file.exists():
+        with open(manifest_file, "r") as f:
+            manifest = json.load(f)
+    else:
+        manifest = {}
+
+    jobs = []
+    fingerprints = {}
+    summary: List[Dict] = []
+    collections = sorted(
+        {
+            path.stem
+            for extension in datasets.FILE_EXTENSIONS.values()
+            for path in Path(attributes_folder).glob(f"*{extension}")
+        }
+    )
+    for collection in collections:
+        attribute_file = datasets.find_data_file(
+            f"{attributes_folder}/{collection}.csv"
+        )
+        fingerprint = _input_fingerprint(
+            attribute_file, method, trait_count, sum_traits, sum_trait_multiplier
+        )
+        output_file = Path(
+            datasets.output_path(
+                f"{output_folder}/{collection}_{method}.csv", output_format
+            )
+        )
+        if (
+            not force
+            and manifest.get(collection) == fingerprint
+            and output_file.exists()
+        ):
+            summary.append(
+                {
+                    "collection": collection,
+                    "status": "skipped",
+                    "error": None,
+                    "seconds": 0.0,
+                }
+            )
+            continue
+
+        fingerprints[collection] = fingerprint
+        jobs.append(
+            {
+                "collection": collection,
+                "attribute_file": attribute_file,
+                "method": method,
+                "trait_count": trait_count,
+                "sum_traits": sum_traits,
+                "sum_trait_multiplier": sum_trait_multiplier,
+                "output_folder": output_folder,
+                "output_format": output_format,
+            }
+        )
+
+    print(f"Building {len(jobs)} collections, {len(summary)} unchanged")
+
+    if len(jobs) > 0:
+        if processes is None:
+            processes = os.cpu_count()
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=min(processes, len(jobs))  # type: ignore
+        ) as executor:
+            futures = [executor.submit(_build_collection, job) for job in jobs]
+            for future in concurrent.futures.as_completed(futures):
+                result = future.result()
+                print(
+                    f"{result['collection']}: {result['status']} in {result['seconds']}s"
+                )
+                if result["status"] == "built":
+                    manifest[result["collection"]] = fingerprints[result["collection"]]
+                else:
+                    print(result["error"])
+                summary.append(result)
+
+    with open(manifest_file, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    summary_db = pd.DataFrame.from_records(
+        summary, columns=["collection", "status", "seconds", "error"]
+    )
+    summary_db = summary_db.sort_values(by="seconds", ascending=False)
+    summary_db.to_csv(build_folder.joinpath("summary.csv"), index=False)
+
+    return summary_db
+
+
 def _cli_parser() -> argparse.ArgumentParser:
     """
     Create the command line argument parser
@@ -194,6 +379,29 @@ def _cli_parser() -> argparse.ArgumentParser:
         default=35,
         help="Trait score multiplier to use for summed traits. (default: 35)",
     )
+    parser.add_argument(
+        "--all",
+        action="store_true",
+        help="Build the rarity data of every collection in the raw attributes folder.",
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=None,
+        help=f"Number of processes to use with --all. (default: {os.cpu_count()})",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Rebuild all collections with --all, even if their attribute file didn't change.",
+    )
+    parser.add_argument(
+        "--output-format",
+        type=str,
+        choices=datasets.OUTPUT_FORMATS,
+        default="csv",
+        help="File format of the rarity data. Parquet and arrow require pyarrow. (default: csv)",
+    )
     return parser
 
 
@@ -201,15 +409,31 @@ if __name__ == "__main__":
 
     args = _cli_parser().parse_args()
 
-    # Build attribute file
-    attribute_file = f"{config.ATTRIBUTES_FOLDER}/{args.collection}.csv"
-
-    # Build rarity database and save to disk
-    build_rarity_db(
-        args.collection,
-        attribute_file,
-        args.method,
-        args.trait_count,
-        args.sum_traits,
-        args.sum_trait_multiplier,
-    )
+    if args.all:
+        # Build rarity databases of all collections and print the timings
+        summary = build_all_rarity_dbs(
+            method=args.method,
+            trait_count=args.trait_count,
+            sum_traits=args.sum_traits,
+            sum_trait_multiplier=args.sum_trait_multiplier,
+            processes=args.processes,
+            force=args.force,
+            output_format=args.output_format,
+        )
+        print(summary.to_string(index=False))
+    else:
+        # Build attribute file
+        attribute_file = datasets.find_data_file(
+            f"{config.ATTRIBUTES_FOLDER}/{args.collection}.csv"
+        )
+
+        # Build rarity database and save to disk
+        build_rarity_db(
+            args.collection,
+            attribute_file,
+            args.method,
+            args.trait_count,
+            args.sum_traits,
+            args.sum_trait_multiplier,
+            output_format=args.output_format,
+        )
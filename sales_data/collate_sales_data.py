@@ -1,27 +1,77 @@
+import concurrent.futures
+import functools
 import json
-import time
-import glob
+import os
 import requests
 
+from pathlib import Path
+from typing import Callable, Dict, List, Set
+
+import pandas as pd
+
+from honestnft_utils.misc import RateLimiter
 from sales_data.dappradar import DappRadar
 
+TOKEN_IDS = ["1", "69", "420"]
+
 
 class SalesData:
-    def __init__(self):
+    def __init__(
+        self,
+        max_workers: int = 4,
+        dappradar_requests_per_second: float = 2,
+        opensea_requests_per_second: float = 2,
+    ):
+        """
+        :param max_workers: Number of slugs, contracts or tokens processed in parallel
+        :param dappradar_requests_per_second: Request budget per DappRadar API host,
+            shared by all contracts and tokens
+        :param opensea_requests_per_second: Request budget of the OpenSea API
+        """
         self.opensea_url = "https://api.opensea.io/api/v1/collection/%s"
         self.collections_file_path = "collections/eth_contracts.json"
+        self.contracts_cache_path = "collections/slug_contracts.json"
         self.collections = self._import_collections()
-        self.dapp = DappRadar()
+        # Each contract fetches its pages in parallel as well, so share the
+        # connection pool between all of them
+        self.dapp = DappRadar(
+            requests_per_second=dappradar_requests_per_second,
+            pool_size=max_workers * 4,
+        )
+        self.max_workers = max_workers
+        self._session = requests.Session()
+        self._opensea_rate_limiter = RateLimiter(opensea_requests_per_second)
 
     def _import_collections(self):
         with open(self.collections_file_path, "r") as json_file:
             collections = json.load(json_file)
         return collections
 
-    def _get_existing_contracts(self):
-        files = glob.glob("csv/*.csv")
-        contracts = [file.split("\\")[-1].split(".")[0] for file in files]
-        return contracts
+    def _load_contracts_cache(self) -> Dict[str, Dict[str, str]]:
+        """Load the slug -> contract cache.
+
+        :return: A dict with the resolved "contracts" and the "failures" of every
+            slug that couldn't be resolved, both keyed by slug
+        """
+        if not os.path.exists(self.contracts_cache_path):
+            return {"contracts": {}, "failures": {}}
+        with open(self.contracts_cache_path, "r") as json_file:
+            cache: Dict[str, Dict[str, str]] = json.load(json_file)
+        return cache
+
+    def _save_contracts_cache(self, cache: Dict[str, Dict[str, str]]) -> None:
+        """Save the slug -> contract cache, replacing the file atomically."""
+        temp_path = self.contracts_cache_path + ".tmp"
+        with open(temp_path, "w") as json_file:
+            json.dump(cache, json_file, indent=2, sort_keys=True)
+        os.replace(temp_path, self.contracts_cache_path)
+
+    def _get_existing_contracts(self) -> Set[str]:
+        """Get the cached contracts whose sales data was already written to csv/."""
+        contracts = self._load_contracts_cache()["contracts"].values()
+        return {
+            contract for contract in contracts if Path(f"csv/{contract}.csv").exists()
+        }
 
     def _get_collection_slugs(self):
         slugs = list()
@@ -29,20 +79,61 @@ class SalesData:
             slugs.append(collection["node"]["slug"])
         return slugs
 
-    def _get_contract_addresses(self):
+    def _resolve_slug(self, slug: str) -> str:
+        """Get the primary contract address of an OpenSea collection.
+
+        :param slug: The OpenSea collection slug
+        :raises Exception: if the request fails or the collection has no contract
+        :return: The contract address
+        """
+        url = self.opensea_url % slug
+        self._opensea_rate_limiter.wait()
+        print(url)
+        response = self._session.get(url)
+        response.raise_for_status()
+        contracts = response.json()["collection"]["primary_asset_contracts"]
+        if not contracts:
+            raise Exception(f"Collection {slug} has no primary asset contract")
+        address: str = contracts[0]["address"]
+        return address
+
+    def _get_contract_addresses(self, retry_failures: bool = False) -> List[str]:
+        """Resolve the contract address of every collection slug.
+
+        Resolved slugs are cached in contracts_cache_path, so only new slugs are
+        requested from OpenSea, in parallel. Slugs that fail are recorded with their
+        error and skipped on later runs, unless retry_failures is set.
+
+        :param retry_failures: Request the slugs that failed before again
+        :return: The contract addresses, in the order of the collection slugs
+        """
         slugs = self._get_collection_slugs()
-        contract_addresses = list()
-        for slug in slugs:
-            try:
-                url = self.opensea_url % slug
-                print(url)
-                response = requests.get(url).json()
-                contract_addresses.append(
-                    response["collection"]["primary_asset_contracts"][0]["address"]
-                )
-            except:
-                continue
-        return contract_addresses
+        cache = self._load_contracts_cache()
+        contracts, failures = cache["contracts"], cache["failures"]
+        missing = [
+            slug
+            for slug in slugs
+            if slug not in contracts and (retry_failures or slug not in failures)
+        ]
+
+        if missing:
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.max_workers
+            ) as executor:
+                future_to_slug = {
+                    executor.submit(self._resolve_slug, slug): slug for slug in missing
+                }
+                for future in concurrent.futures.as_completed(future_to_slug):
+                    slug = future_to_slug[future]
+                    try:
+                        contracts[slug] = future.result()
+                        failures.pop(slug, None)
+                    except Exception as error:
+                        print(f"Failed to resolve {slug}: {error}")
+                        failures[slug] = str(error)
+            self._save_contracts_cache(cache)
+
+        return [contracts[slug] for slug in slugs if slug in contracts]
 
     def _get_sales_data(self, contract_address):
         sales_data = self.dapp.collate_historical_data(
@@ -63,31 +154,89 @@ class SalesData:
         return token_sales_data
 
     @staticmethod
-    def _write_to_csv(sales_data, contract_address):
-        sales_data.to_csv(f"csv/{contract_address}.csv", index=False)
+    def _write_csv(data: pd.DataFrame, path: str) -> None:
+        """Write a CSV atomically, so an interrupted run never leaves partial output."""
+        temp_path = path + ".tmp"
+        data.to_csv(temp_path, index=False)
+        os.replace(temp_path, path)
 
-    @staticmethod
-    def _write_token_to_csv(token_sales_data, contract_address, token_id):
-        token_sales_data.to_csv(f"csv/{contract_address}_{token_id}.csv", index=False)
+    def _write_to_csv(self, sales_data, contract_address):
+        self._write_csv(sales_data, f"csv/{contract_address}.csv")
+
+    def _write_token_to_csv(self, token_sales_data, contract_address, token_id):
+        self._write_csv(token_sales_data, f"csv/{contract_address}_{token_id}.csv")
+
+    def _run_jobs(self, jobs: Dict[str, Callable[[], None]]) -> List[str]:
+        """Run jobs concurrently. Requests are paced by the rate limiters of the
+        API hosts, so the throughput is set by the request budgets.
+
+        :param jobs: Job name -> function that fetches and writes one CSV
+        :return: The names of the failed jobs
+        """
+        failed = []
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_workers
+        ) as executor:
+            future_to_name = {executor.submit(job): name for name, job in jobs.items()}
+            for future in concurrent.futures.as_completed(future_to_name):
+                name = future_to_name[future]
+                try:
+                    future.result()
+                    print(f"Finished {name}")
+                except Exception as error:
+                    print(f"Failed {name}: {error}")
+                    failed.append(name)
+        return failed
 
-    def collate_sales_data(self):
-        contract_addresses = self._get_contract_addresses()
+    def collate_sales_data(self, retry_failures: bool = False) -> List[str]:
+        """Collate the sales data of every collection into csv/<contract>.csv.
+
+        Contracts are collated concurrently and each CSV is written as soon as its
+        contract completes. Contracts with a CSV are skipped, so an interrupted run resumes.
+
+        :param retry_failures: Request the slugs that failed to resolve before again
+        :return: The contracts that failed
+        """
+        contract_addresses = self._get_contract_addresses(retry_failures)
         existing_contracts = self._get_existing_contracts()
-        for contract in contract_addresses:
-            if contract not in existing_contracts:
-                print(contract)
-                sales_data = self._get_sales_data(contract)
-                self._write_to_csv(sales_data, contract)
-                time.sleep(1)
-
-    def collate_token_sales_data(self):
-        contract_addresses = self._get_contract_addresses()
-        for contract in contract_addresses:
-            for token_id in ["1", "69", "420"]:
-                token_sales_data = self._get_token_sales_data(contract, token_id)
-                if token_sales_data is not None:
-                    self._write_token_to_csv(token_sales_data, contract, token_id)
-                time.sleep(1)
+
+        def collate(contract: str) -> None:
+            self._write_to_csv(self._get_sales_data(contract), contract)
+
+        jobs: Dict[str, Callable[[], None]] = {
+            contract: functools.partial(collate, contract)
+            for contract in contract_addresses
+            if contract not in existing_contracts
+        }
+        return self._run_jobs(jobs)
+
+    def collate_token_sales_data(
+        self, retry_failures: bool = False, token_ids: List[str] = TOKEN_IDS
+    ) -> List[str]:
+        """Collate the sales data of some tokens of every collection into
+        csv/<contract>_<token_id>.csv.
+
+        Tokens are collated concurrently and each CSV is written as soon as its token
+        completes. Tokens with a CSV are skipped, so an interrupted run resumes.
+
+        :param retry_failures: Request the slugs that failed to resolve before again
+        :param token_ids: The token ids to collate for every contract
+        :return: The contract_token ids that failed
+        """
+        contract_addresses = self._get_contract_addresses(retry_failures)
+
+        def collate(contract: str, token_id: str) -> None:
+            token_sales_data = self._get_token_sales_data(contract, token_id)
+            if token_sales_data is not None:
+                self._write_token_to_csv(token_sales_data, contract, token_id)
+
+        jobs: Dict[str, Callable[[], None]] = {
+            f"{contract}_{token_id}": functools.partial(collate, contract, token_id)
+            for contract in contract_addresses
+            for token_id in token_ids
+            if not Path(f"csv/{contract}_{token_id}.csv").exists()
+        }
+        return self._run_jobs(jobs)
 
 
 if __name__ == "__main__":
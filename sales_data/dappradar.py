@@ -1,7 +1,13 @@
+import concurrent.futures
+
 import pandas as pd
 
 from requests import Request, Session, Response
-from typing import Optional, Dict, Any
+from requests.adapters import HTTPAdapter
+from typing import Optional, Dict, Any, Callable, Iterator
+from urllib.parse import urlparse
+
+from honestnft_utils.misc import RateLimiter
 
 
 class DappRadar:
@@ -22,10 +28,30 @@ class DappRadar:
         "https://nft-balance-api.dappradar.com/transactions/ethereum/"
     )
 
-    def __init__(self):
+    def __init__(
+        self,
+        max_workers: int = 4,
+        requests_per_second: float = 2,
+        pool_size: Optional[int] = None,
+    ):
+        """
+        :param max_workers: Number of pages of a collection fetched in parallel
+        :param requests_per_second: Maximum number of requests per second per API host,
+            shared by all threads using this instance
+        :param pool_size: Number of pooled connections per host. (default: max_workers)
+        """
+        self._max_workers = max_workers
+        self._rate_limiters = {
+            urlparse(endpoint).netloc: RateLimiter(requests_per_second)
+            for endpoint in [self._SALES_ENDPOINT, self._TOKEN_SALES_ENDPOINT]
+        }
         self._session = Session()
+        adapter = HTTPAdapter(pool_maxsize=pool_size or max_workers)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
 
     def _request(self, endpoint: str, method: str, path: str, **kwargs) -> Any:
+        self._rate_limiters[urlparse(endpoint).netloc].wait()
         print(f"Processing: {endpoint + path}")
         request = Request(method, endpoint + path, **kwargs)
         response = self._session.send(request.prepare())
@@ -45,6 +71,22 @@ class DappRadar:
             response.raise_for_status()
             raise
 
+    def _fetch_pages(
+        self, get_page: Callable[[int], Any], first_page: int, page_count: int
+    ) -> Iterator[Any]:
+        """Fetch pages first_page..page_count in parallel over the shared session.
+
+        :param get_page: Function that requests a single page by number
+        :param first_page: The first page to fetch
+        :param page_count: The last page to fetch
+        :return: An iterator of responses in page order, yielded as soon as
+            all earlier pages have arrived
+        """
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self._max_workers
+        ) as executor:
+            yield from executor.map(get_page, range(first_page, page_count + 1))
+
     def _get_historical_sales_data(
         self,
         resolution: str,
@@ -102,18 +144,19 @@ class DappRadar:
         response = self._get_historical_sales_data(
             resolution, limit, page, currency, sort, order, collections
         )
+        sales_data.extend(response["results"])
 
-        page = response["page"]
-        page_count = response["pageCount"]
-
-        while page < page_count:
-            response = self._get_historical_sales_data(
+        # The page count is known after the first page, fetch the rest in parallel
+        responses = self._fetch_pages(
+            lambda page: self._get_historical_sales_data(
                 resolution, limit, page, currency, sort, order, collections
-            )
+            ),
+            response["page"] + 1,
+            response["pageCount"],
+        )
+        for response in responses:
             sales_data.extend(response["results"])
 
-            page += 1
-
         sales_data = pd.DataFrame(sales_data)
 
         return sales_data
@@ -132,21 +175,18 @@ class DappRadar:
             contract_address, token_id, page, results_per_page, fiat
         )
 
-        page = response["page"]
-        page_count = response["pageCount"]
-
         token_sales_data.extend(response["data"])
 
-        page += 1
-
-        while page < page_count:
-            response = self._get_historical_token_sales_data(
+        responses = self._fetch_pages(
+            lambda page: self._get_historical_token_sales_data(
                 contract_address, token_id, page, results_per_page, fiat
-            )
+            ),
+            response["page"] + 1,
+            response["pageCount"],
+        )
+        for response in responses:
             token_sales_data.extend(response["data"])
 
-            page += 1
-
         token_sales_data = pd.DataFrame(token_sales_data)
 
         return token_sales_data
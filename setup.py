@@ -20,6 +20,15 @@ extras_require = {
         "sphinxcontrib-youtube==1.2.0",
         "sphinxcontrib-autoprogram @ git+https://github.com/Barabazs/autoprogram#egg=sphinxcontrib-autoprogram",
     ],
+    "streaming": [
+        "ijson>=3.1",
+    ],
+    "parquet": [
+        "pyarrow",
+    ],
+    "scraping": [
+        "selectolax",
+    ],
 }
 
 
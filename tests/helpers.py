@@ -39,3 +39,166 @@ class BlockStatementPrinting:
 
 
 TESTS_ROOT_DIR = Path(config.ROOT_DIR).joinpath("tests")
+
+
+class StandIn:
+    """
+    Local HTTP server for tests. Subclasses answer the GET requests in respond().
+    usage:
+    with StandInSubclass(...) as server:
+        requests.get(server.url)
+    """
+
+    # Path of the API endpoint, appended to the server address in url
+    path = ""
+
+    def __init__(self):
+        self.requests: list = []
+
+    def respond(self, path: str, params: dict) -> tuple:
+        """
+        :param path: The path of the request, without the query
+        :param params: The query parameters
+        :return: The status code, a dict of headers and the body in bytes
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def json_response(data) -> tuple:
+        import json
+
+        return 200, {"Content-Type": "application/json"}, json.dumps(data).encode()
+
+    def __enter__(self):
+        import http.server
+        import threading
+        import urllib.parse
+
+        stand_in = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urllib.parse.urlparse(self.path)
+                params = dict(urllib.parse.parse_qsl(url.query))
+                status, headers, body = stand_in.respond(url.path, params)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}{self.path}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class OpenSeaStandIn(StandIn):
+    """
+    Local HTTP server that mimics the paging of the OpenSea events API.
+    Events are dicts with an "id" and an "event_timestamp" in UTC,
+    served newest first and filtered by occurred_after and occurred_before.
+    usage:
+    with OpenSeaStandIn(events) as server:
+        requests.get(server.url, params={"limit": 10})
+    """
+
+    path = "/api/v1/events"
+
+    def __init__(self, events: list, failures: int = 0, exclusive_after: bool = False):
+        """
+        :param events: The events to serve
+        :param failures: Number of requests to answer with a 429 error before serving pages
+        :param exclusive_after: Leave out the events at exactly occurred_after
+        """
+        super().__init__()
+        self.events = sorted(events, key=lambda event: -self._time(event))
+        self.failures = failures
+        self.exclusive_after = exclusive_after
+
+    @staticmethod
+    def _time(event: dict) -> float:
+        import datetime
+
+        timestamp = datetime.datetime.fromisoformat(event["event_timestamp"])
+        return timestamp.replace(tzinfo=datetime.timezone.utc).timestamp()
+
+    def respond(self, path: str, params: dict) -> tuple:
+        self.requests.append(params)
+        if self.failures > 0:
+            self.failures -= 1
+            return 429, {"Retry-After": "0"}, b""
+
+        after = float(params.get("occurred_after", "-inf"))
+        before = float(params.get("occurred_before", "inf"))
+        if self.exclusive_after:
+            events = [e for e in self.events if after < self._time(e) < before]
+        else:
+            events = [e for e in self.events if after <= self._time(e) < before]
+        offset = int(params.get("cursor", 0))
+        limit = int(params.get("limit", 300))
+        page = events[offset : offset + limit]
+        next_cursor = str(offset + limit) if offset + limit < len(events) else None
+        return self.json_response(
+            {"asset_events": page, "next": next_cursor, "previous": None}
+        )
+
+
+class AlchemyStandIn(StandIn):
+    """
+    Local HTTP server that mimics the paging of the Alchemy getNFTsForCollection API.
+    usage:
+    with AlchemyStandIn(token_ids) as server:
+        requests.get(server.url, params={"limit": 10, "startToken": "0x10"})
+    """
+
+    path = "/{api_key}/getNFTsForCollection"
+
+    def __init__(self, token_ids: list):
+        """
+        :param token_ids: The token ids to serve
+        """
+        super().__init__()
+        self.token_ids = sorted(token_ids)
+
+    def respond(self, path: str, params: dict) -> tuple:
+        self.requests.append(params)
+        start = int(params.get("startToken", "0x0"), 0)
+        remaining = [token_id for token_id in self.token_ids if token_id >= start]
+        limit = int(params.get("limit", 100))
+        page = remaining[:limit]
+        response: dict = {"nfts": [{"id": {"tokenId": hex(i)}} for i in page]}
+        if len(remaining) > limit:
+            response["nextToken"] = hex(remaining[limit])
+        return self.json_response(response)
+
+
+class PageStandIn(StandIn):
+    """
+    Local HTTP server that serves HTML pages by path and answers 404 otherwise.
+    usage:
+    with PageStandIn({"/assets/1": "<html>...</html>"}) as server:
+        requests.get(server.url + "/assets/1")
+    """
+
+    def __init__(self, pages: dict):
+        """
+        :param pages: Path -> HTML of the pages to serve
+        """
+        super().__init__()
+        self.pages = pages
+
+    def respond(self, path: str, params: dict) -> tuple:
+        self.requests.append(path)
+        if path not in self.pages:
+            return 404, {}, b""
+        return 200, {"Content-Type": "text/html"}, self.pages[path].encode()
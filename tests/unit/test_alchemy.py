@@ -1,8 +1,16 @@
+import json
+import shutil
 import unittest
+from pathlib import Path
 from unittest import mock
 
+import numpy as np
+
 from honestnft_utils import alchemy
-from tests import constants
+from tests import constants, helpers
+
+# Token 3 and 17 were burned
+TOKEN_IDS = [i for i in range(1, 26) if i not in (3, 17)]
 
 
 class TestCase(unittest.TestCase):
@@ -19,3 +27,48 @@ class TestCase(unittest.TestCase):
             alchemy.get_all_token_ids,
             contract_address=constants.DOODLES_ADDRESS,
         )
+
+    @mock.patch.object(alchemy, "PAGE_SIZE", 10)
+    def test_iter_token_ids(self):
+        with helpers.AlchemyStandIn(TOKEN_IDS) as server, mock.patch.object(
+            alchemy, "ALCHEMY_NFT_URL", server.url
+        ):
+            with self.subTest("All pages are enumerated"):
+                self.assertEqual(list(alchemy.iter_token_ids("0xcontract")), TOKEN_IDS)
+                self.assertEqual(len(server.requests), 3)
+
+            with self.subTest("Token ids are collected in a uint64 array"):
+                token_ids = alchemy.get_token_id_array("0xcontract")
+                self.assertEqual(token_ids.dtype, np.uint64)
+                self.assertEqual(token_ids.tolist(), TOKEN_IDS)
+
+    @mock.patch.object(alchemy, "PAGE_SIZE", 10)
+    def test_iter_token_ids_resume(self):
+        temp_path = Path(f"{helpers.TESTS_ROOT_DIR}/temp_alchemy")
+        temp_path.mkdir(parents=True, exist_ok=True)
+        cursor_file = str(temp_path.joinpath("cursor.json"))
+        self.addCleanup(shutil.rmtree, temp_path)
+
+        with helpers.AlchemyStandIn(TOKEN_IDS) as server, mock.patch.object(
+            alchemy, "ALCHEMY_NFT_URL", server.url
+        ):
+            token_ids = alchemy.iter_token_ids("0xcontract", cursor_file=cursor_file)
+            for _ in range(11):
+                next(token_ids)
+            token_ids.close()
+
+            with self.subTest("nextToken of the last processed page is saved"):
+                with open(cursor_file) as f:
+                    self.assertEqual(json.load(f)["cursor"], hex(TOKEN_IDS[10]))
+
+            with self.subTest("Enumeration resumes from the saved nextToken"):
+                token_ids = alchemy.iter_token_ids(
+                    "0xcontract", cursor_file=cursor_file
+                )
+                self.assertEqual(list(token_ids), TOKEN_IDS[10:])
+                self.assertFalse(Path(cursor_file).exists())
+
+    def test_existence_bitmap(self):
+        bitmap = alchemy.existence_bitmap(TOKEN_IDS + [100], lower_id=0, upper_id=25)
+        self.assertEqual(len(bitmap), 26)
+        self.assertEqual(np.flatnonzero(bitmap).tolist(), TOKEN_IDS)
@@ -0,0 +1,108 @@
+import json
+import os
+import shutil
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+
+from sales_data.collate_sales_data import SalesData
+from tests import helpers
+
+SLUGS = ["apes", "punks", "broken", "doodles"]
+CONTRACTS = {"apes": "0xape", "punks": "0xpunk", "doodles": "0xdoodle"}
+
+
+def fake_resolve(slug):
+    if slug not in CONTRACTS:
+        raise Exception("404 Client Error")
+    return CONTRACTS[slug]
+
+
+class TestCase(unittest.TestCase):
+    def setUp(self):
+        temp_path = Path(f"{helpers.TESTS_ROOT_DIR}/temp_sales_data")
+        temp_path.joinpath("collections").mkdir(parents=True, exist_ok=True)
+        temp_path.joinpath("csv").mkdir(exist_ok=True)
+        self.addCleanup(shutil.rmtree, temp_path)
+        collections = {
+            "data": {
+                "rankings": {"edges": [{"node": {"slug": slug}} for slug in SLUGS]}
+            }
+        }
+        with open(temp_path.joinpath("collections/eth_contracts.json"), "w") as f:
+            json.dump(collections, f)
+
+        cwd = os.getcwd()
+        os.chdir(temp_path)
+        self.addCleanup(os.chdir, cwd)
+        self.sales_data = SalesData()
+
+    def test_get_contract_addresses(self):
+        with mock.patch.object(
+            self.sales_data, "_resolve_slug", side_effect=fake_resolve
+        ) as resolve:
+            with self.subTest("Slugs are resolved in order and failures recorded"):
+                contracts = self.sales_data._get_contract_addresses()
+                self.assertEqual(contracts, ["0xape", "0xpunk", "0xdoodle"])
+                self.assertEqual(resolve.call_count, 4)
+                cache = self.sales_data._load_contracts_cache()
+                self.assertEqual(list(cache["failures"]), ["broken"])
+
+            with self.subTest("Cached slugs and failures are not requested again"):
+                self.sales_data._get_contract_addresses()
+                self.assertEqual(resolve.call_count, 4)
+
+            with self.subTest("Failures are retried on request"):
+                self.sales_data._get_contract_addresses(retry_failures=True)
+                self.assertEqual(resolve.call_count, 5)
+                resolve.assert_called_with("broken")
+
+    def test_get_existing_contracts(self):
+        with mock.patch.object(
+            self.sales_data, "_resolve_slug", side_effect=fake_resolve
+        ):
+            self.sales_data._get_contract_addresses()
+        Path("csv/0xpunk.csv").touch()
+        self.assertEqual(self.sales_data._get_existing_contracts(), {"0xpunk"})
+
+    def test_collate_sales_data(self):
+        Path("csv/0xape.csv").touch()
+
+        def fake_sales_data(contract):
+            if contract == "0xdoodle":
+                raise Exception("429 Too Many Requests")
+            return pd.DataFrame({"contract": [contract]})
+
+        with mock.patch.object(
+            self.sales_data, "_resolve_slug", side_effect=fake_resolve
+        ), mock.patch.object(
+            self.sales_data, "_get_sales_data", side_effect=fake_sales_data
+        ) as get_sales_data:
+            failed = self.sales_data.collate_sales_data()
+
+        # The existing CSV of 0xape is resumed from, 0xpunk is written
+        get_sales_data.assert_has_calls(
+            [mock.call("0xpunk"), mock.call("0xdoodle")], any_order=True
+        )
+        self.assertEqual(get_sales_data.call_count, 2)
+        self.assertEqual(failed, ["0xdoodle"])
+        self.assertEqual(pd.read_csv("csv/0xpunk.csv")["contract"].tolist(), ["0xpunk"])
+        self.assertFalse(Path("csv/0xdoodle.csv").exists())
+
+    def test_collate_token_sales_data(self):
+        Path("csv/0xape_1.csv").touch()
+
+        with mock.patch.object(
+            self.sales_data, "_resolve_slug", side_effect=fake_resolve
+        ), mock.patch.object(
+            self.sales_data,
+            "_get_token_sales_data",
+            side_effect=lambda contract, token_id: pd.DataFrame({"id": [token_id]}),
+        ) as get_token_sales_data:
+            failed = self.sales_data.collate_token_sales_data(token_ids=["1", "2"])
+
+        self.assertEqual(failed, [])
+        self.assertEqual(get_token_sales_data.call_count, 5)
+        self.assertEqual(len(list(Path("csv").glob("*.csv"))), 6)
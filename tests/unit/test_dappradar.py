@@ -0,0 +1,41 @@
+import random
+import time
+import unittest
+from unittest import mock
+
+from sales_data.dappradar import DappRadar
+
+PAGE_COUNT = 6
+
+
+def fake_get(endpoint, path, params=None):
+    """Answer like DappRadar, with pages taking a random time to arrive"""
+    page = params["page"]
+    time.sleep(random.uniform(0, 0.02))
+    rows = [{"page": page, "row": i} for i in range(3)]
+    key = "results" if endpoint == DappRadar._SALES_ENDPOINT else "data"
+    return {"page": page, "pageCount": PAGE_COUNT, key: rows}
+
+
+class TestCase(unittest.TestCase):
+    def setUp(self):
+        self.dapp = DappRadar(max_workers=4, requests_per_second=1000)
+        patcher = mock.patch.object(self.dapp, "_get", side_effect=fake_get)
+        self.get = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_collate_historical_data(self):
+        sales_data = self.dapp.collate_historical_data(
+            "day", 3, 1, "USD", "date", "asc", "0xcontract"
+        )
+        self.assertEqual(sales_data["page"].tolist(), sorted(list(range(1, 7)) * 3))
+        self.assertEqual(self.get.call_count, PAGE_COUNT)
+
+    def test_collate_historical_token_sales_data(self):
+        token_sales_data = self.dapp.collate_historical_token_sales_data(
+            "0xcontract", "69", 1, 3, "USD"
+        )
+        self.assertEqual(
+            token_sales_data["page"].tolist(), sorted(list(range(1, 7)) * 3)
+        )
+        self.assertEqual(self.get.call_count, PAGE_COUNT)
@@ -0,0 +1,161 @@
+import os
+import shutil
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from honestnft_utils import datasets
+from tests import helpers
+
+
+class TestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_path = Path(f"{helpers.TESTS_ROOT_DIR}/temp_datasets")
+        self.temp_path.mkdir(parents=True, exist_ok=True)
+
+        self.minting_path = self.temp_path.joinpath("collection_minting.csv")
+        pd.DataFrame(
+            {
+                "txid": ["0xaa", "0xaa", "0xbb"],
+                "to_account": ["0x01", "0x01", "0x02"],
+                "TOKEN_ID": [1, 2, 3],
+                "current_owner": ["0x01", "0x03", "0x02"],
+                "rank": [3, 1, 2],
+                "time": ["2022-01-01 00:00:00"] * 3,
+            }
+        ).to_csv(self.minting_path)
+
+        self.rarity_path = self.temp_path.joinpath("collection_raritytools.csv")
+        pd.DataFrame(
+            {
+                "TOKEN_ID": [1, 2, 3],
+                "TOKEN_NAME": ["#1", "#2", "#3"],
+                "Hat": [1.5, 3.0, 1.5],
+                "RARITY_SCORE": [2.5, 4.0, 3.5],
+                "Rank": [3, 1, 2],
+            }
+        ).to_csv(self.rarity_path, index=False)
+
+    def test_read_minting_csv(self):
+        df = datasets.read_minting_csv(str(self.minting_path))
+
+        self.assertEqual(df["TOKEN_ID"].dtype, np.int32)
+        self.assertEqual(df["rank"].dtype, np.int32)
+        for column in datasets.MINTING_CATEGORICAL_COLUMNS:
+            self.assertIsInstance(df[column].dtype, pd.CategoricalDtype)
+        self.assertEqual(
+            df.groupby("to_account", observed=True)["rank"].min().to_dict(),
+            {"0x01": 1, "0x02": 2},
+        )
+
+    def test_read_rarity_csv(self):
+        df = datasets.read_rarity_csv(str(self.rarity_path))
+
+        self.assertEqual(df["TOKEN_ID"].dtype, np.int32)
+        self.assertEqual(df["Rank"].dtype, np.int32)
+        self.assertEqual(df["Hat"].dtype, np.float32)
+        self.assertEqual(df["RARITY_SCORE"].dtype, np.float32)
+        self.assertEqual(list(df["TOKEN_NAME"]), ["#1", "#2", "#3"])
+
+    def test_read_csv_cached(self):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            self.skipTest("pyarrow is not installed")
+
+        sidecar = self.temp_path.joinpath(".cache", "collection_raritytools.feather")
+        first = datasets.read_csv_cached(
+            str(self.rarity_path), datasets.read_rarity_csv
+        )
+
+        with self.subTest("Sidecar is written"):
+            self.assertTrue(sidecar.exists())
+
+        with self.subTest("Sidecar is used while the CSV file is unchanged"):
+            cached = datasets.read_csv_cached(
+                str(self.rarity_path), lambda path: self.fail("CSV was parsed")
+            )
+            pd.testing.assert_frame_equal(first, cached)
+
+        with self.subTest("Sidecar is invalidated when the CSV file changes"):
+            df = pd.read_csv(self.rarity_path)
+            df.loc[0, "Rank"] = 4
+            df.to_csv(self.rarity_path, index=False)
+            mtime = sidecar.stat().st_mtime_ns + 1_000_000_000
+            os.utime(self.rarity_path, ns=(mtime, mtime))
+
+            updated = datasets.read_csv_cached(
+                str(self.rarity_path), datasets.read_rarity_csv
+            )
+            self.assertEqual(updated.loc[0, "Rank"], 4)
+
+    def test_write_dataframe_columnar(self):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            self.skipTest("pyarrow is not installed")
+
+        attributes_path = self.temp_path.joinpath("collection.csv")
+        attribute_db = pd.DataFrame(
+            {
+                "TOKEN_ID": [1, 2, 3],
+                "TOKEN_NAME": ["#1", "#2", "#3"],
+                "Hat": ["Cap", None, 5],
+            }
+        ).set_index("TOKEN_ID")
+
+        for output_format in ["parquet", "arrow"]:
+            with self.subTest(output_format=output_format):
+                path = datasets.write_dataframe(
+                    attribute_db, str(attributes_path), output_format
+                )
+                self.assertEqual(
+                    path, datasets.output_path(str(attributes_path), output_format)
+                )
+                self.assertEqual(datasets.find_data_file(str(attributes_path)), path)
+
+                df = datasets.read_dataframe(path)
+                self.assertEqual(df["TOKEN_ID"].dtype, np.int32)
+                self.assertIsInstance(df["Hat"].dtype, pd.CategoricalDtype)
+                self.assertEqual(
+                    list(df["Hat"].astype(object).fillna("None")), ["Cap", "None", "5"]
+                )
+                self.assertEqual(
+                    list(datasets.read_dataframe(path, columns=["TOKEN_NAME"]).columns),
+                    ["TOKEN_NAME"],
+                )
+                Path(path).unlink()
+
+    def test_convert_data_file(self):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            self.skipTest("pyarrow is not installed")
+
+        path = datasets.convert_data_file(
+            str(self.rarity_path), "parquet", remove_source=True
+        )
+
+        self.assertFalse(self.rarity_path.exists())
+        pd.testing.assert_frame_equal(
+            datasets.read_dataframe(path),
+            pd.DataFrame(
+                {
+                    "TOKEN_ID": [1, 2, 3],
+                    "TOKEN_NAME": ["#1", "#2", "#3"],
+                    "Hat": [1.5, 3.0, 1.5],
+                    "RARITY_SCORE": [2.5, 4.0, 3.5],
+                    "Rank": [3, 1, 2],
+                }
+            ),
+            check_dtype=False,
+        )
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.temp_path)
+
+
+if __name__ == "__main__":
+    unittest.main()
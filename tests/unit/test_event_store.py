@@ -0,0 +1,146 @@
+import datetime
+import shutil
+import sqlite3
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from honestnft_utils import config, event_store, opensea
+from tests import helpers
+
+START = datetime.datetime(2021, 10, 1)
+
+
+def make_events(ids):
+    return [
+        {
+            "id": i,
+            "event_timestamp": (START + datetime.timedelta(minutes=i)).isoformat(),
+            "asset": {"token_id": str(i % 5)},
+        }
+        for i in ids
+    ]
+
+
+class TestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_path = Path(f"{helpers.TESTS_ROOT_DIR}/temp_event_store")
+        self.temp_path.mkdir(parents=True, exist_ok=True)
+        self.patch = mock.patch.object(config, "EVENTS_FOLDER", str(self.temp_path))
+        self.patch.start()
+        self.conn = event_store.connect("0xContract")
+
+    def test_sync(self):
+        with helpers.OpenSeaStandIn(make_events(range(650))) as server:
+            with mock.patch.object(opensea, "OPENSEA_EVENTS_URL", server.url):
+                with self.subTest("First sync downloads the full history"):
+                    self.assertEqual(
+                        event_store.sync("0xContract", "successful", self.conn), 650
+                    )
+                    self.assertEqual(len(server.requests), 3)
+                    self.assertEqual(
+                        event_store.get_high_water_mark(self.conn, "successful"),
+                        START.replace(tzinfo=datetime.timezone.utc).timestamp()
+                        + 649 * 60,
+                    )
+
+                with self.subTest("Next sync only downloads the new events"):
+                    server.events = make_events(range(650, 660))[::-1] + server.events
+                    self.assertEqual(
+                        event_store.sync("0xContract", "successful", self.conn), 10
+                    )
+                    self.assertEqual(len(server.requests), 4)
+                    self.assertIn("occurred_after", server.requests[-1])
+
+    def test_sync_exclusive_bound(self):
+        # The API leaves out the events at exactly occurred_after
+        with helpers.OpenSeaStandIn(
+            make_events(range(10)), exclusive_after=True
+        ) as server, mock.patch.object(opensea, "OPENSEA_EVENTS_URL", server.url):
+            event_store.sync("0xContract", "successful", self.conn)
+            # A new event in the same second as the newest stored event
+            late = make_events([9])[0]
+            server.events.insert(0, {**late, "id": 100})
+            self.assertEqual(event_store.sync("0xContract", "successful", self.conn), 1)
+
+    def test_connections_are_closed(self):
+        connections = []
+
+        def connect(contract_address):
+            connections.append(sqlite3.connect(":memory:"))
+            connections[-1].executescript(event_store.SCHEMA)
+            return connections[-1]
+
+        with helpers.OpenSeaStandIn(make_events(range(3))) as server, mock.patch.object(
+            opensea, "OPENSEA_EVENTS_URL", server.url
+        ), mock.patch.object(event_store, "connect", side_effect=connect):
+            event_store.sync("0xContract", "successful")
+            event_store.get_events("0xContract", "successful")
+
+        self.assertEqual(len(connections), 2)
+        for conn in connections:
+            with self.assertRaises(sqlite3.ProgrammingError):
+                conn.execute("SELECT 1")
+
+    def test_sync_resume(self):
+        insert_events = event_store._insert_events
+
+        def interrupt_after_first_page(conn, event_type, events):
+            if insert.call_count > 1:
+                raise KeyboardInterrupt
+            return insert_events(conn, event_type, events)
+
+        with helpers.OpenSeaStandIn(make_events(range(650))) as server:
+            with mock.patch.object(opensea, "OPENSEA_EVENTS_URL", server.url):
+                with mock.patch.object(
+                    event_store,
+                    "_insert_events",
+                    side_effect=interrupt_after_first_page,
+                ) as insert:
+                    with self.assertRaises(KeyboardInterrupt):
+                        event_store.sync("0xContract", "successful", self.conn)
+                self.assertIsNone(
+                    event_store.get_high_water_mark(self.conn, "successful")
+                )
+
+                # The resumed sync only fetches the older pages
+                self.assertEqual(
+                    event_store.sync("0xContract", "successful", self.conn), 350
+                )
+                self.assertEqual(
+                    event_store.get_high_water_mark(self.conn, "successful"),
+                    START.replace(tzinfo=datetime.timezone.utc).timestamp() + 649 * 60,
+                )
+
+    def test_get_events(self):
+        event_store._insert_events(self.conn, "successful", make_events(range(20)))
+        event_store._insert_events(self.conn, "transfer", make_events(range(3)))
+
+        events = event_store.get_events("0xContract", "successful", conn=self.conn)
+        self.assertEqual([event["id"] for event in events], list(range(19, -1, -1)))
+
+        with self.subTest("Filter by token and time"):
+            events = event_store.get_events(
+                "0xContract",
+                "successful",
+                token_id=2,
+                occurred_after=(START + datetime.timedelta(minutes=5)).isoformat(),
+                occurred_before=(START + datetime.timedelta(minutes=17)).isoformat(),
+                conn=self.conn,
+            )
+            self.assertEqual([event["id"] for event in events], [12, 7])
+
+        with self.subTest("Newest events"):
+            events = event_store.get_events(
+                "0xContract", "transfer", limit=2, conn=self.conn
+            )
+            self.assertEqual([event["id"] for event in events], [2, 1])
+
+    def tearDown(self) -> None:
+        self.conn.close()
+        self.patch.stop()
+        shutil.rmtree(self.temp_path)
+
+
+if __name__ == "__main__":
+    unittest.main()
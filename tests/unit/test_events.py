@@ -0,0 +1,60 @@
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from honestnft_utils import events
+
+
+class TestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.events = [
+            {
+                "asset": {"token_id": "2"},
+                "from_account": {"address": "0x01"},
+                "bid_amount": "1500000000000000000",
+                "created_date": "2021-10-13T14:55:49.567544",
+            },
+            # Bundle events don't have an asset
+            {
+                "asset": None,
+                "from_account": {"address": "0x02"},
+                "bid_amount": "1000000000000000000",
+                "created_date": "2021-10-13T14:56:00",
+            },
+            {
+                "asset": {"token_id": "7"},
+                "from_account": None,
+                "bid_amount": "2000000000000000000",
+                "created_date": "2021-10-13T14:57:00",
+            },
+        ]
+        self.ranks = pd.Series([3, 1, 2], index=[1, 2, 3])
+
+    def test_normalize_events(self):
+        df = events.normalize_events(self.events, events.BID_FIELDS)
+
+        self.assertEqual(list(df.columns), ["TOKEN_ID", "USER", "OFFER", "DATE"])
+        self.assertEqual(df["TOKEN_ID"].tolist()[0], 2)
+        self.assertTrue(pd.isna(df.loc[1, "TOKEN_ID"]))
+        self.assertTrue(pd.isna(df.loc[2, "USER"]))
+        self.assertEqual(df["OFFER"].tolist(), [1.5, 1.0, 2.0])
+
+    def test_attach_ranks(self):
+        df = events.normalize_events(self.events, events.BID_FIELDS)
+
+        for lookup_limit in [events.DENSE_LOOKUP_LIMIT, 0]:
+            with self.subTest(lookup_limit=lookup_limit), mock.patch.object(
+                events, "DENSE_LOOKUP_LIMIT", lookup_limit
+            ):
+                with self.assertLogs(level="WARNING") as logs:
+                    known, unknown = events.attach_ranks(df, self.ranks)
+
+                self.assertEqual(known["TOKEN_ID"].tolist(), [2])
+                self.assertEqual(known["RANK"].tolist(), [1])
+                self.assertEqual(len(unknown), 2)
+                self.assertIn("1 unknown tokens [7]", logs.output[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
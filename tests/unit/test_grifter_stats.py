@@ -0,0 +1,54 @@
+import unittest
+
+import pandas as pd
+from scipy import stats
+
+from fair_drop import grifter_stats
+
+
+class TestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.rarity_db = pd.DataFrame(
+            {"TOKEN_ID": list(range(1, 11)), "Rank": list(range(1, 11))}
+        )
+        self.mints = pd.DataFrame(
+            {
+                "to_account": ["0x01"] * 3 + ["0x02"] * 5 + ["0x03"] * 2,
+                "rank": [1, 2, 7, 3, 4, 5, 6, 8, 9, 10],
+            }
+        )
+
+    def test_grifter_stats(self):
+        result = grifter_stats.grifter_stats(self.mints, self.rarity_db, top_n=[2, 5])
+
+        self.assertEqual(list(result.index), ["0x01", "0x02", "0x03"])
+        self.assertEqual(
+            list(result.columns[:6]),
+            [
+                "minted",
+                "mint_share",
+                "rare_2",
+                "rare_share_2",
+                "multiple_2",
+                "pvalue_2",
+            ],
+        )
+        lucky = result.loc["0x01"]
+        self.assertEqual(lucky["minted"], 3)
+        self.assertEqual(lucky["rare_2"], 2)
+        self.assertAlmostEqual(lucky["mint_share"], 0.3)
+        self.assertAlmostEqual(lucky["rare_share_2"], 1.0)
+        self.assertAlmostEqual(lucky["multiple_2"], 1 / 0.3)
+        self.assertAlmostEqual(lucky["pvalue_2"], stats.binom.sf(1, 3, 0.2))
+        self.assertEqual(result.loc["0x02", "rare_5"], 3)
+        self.assertEqual(result.loc["0x03", "pvalue_5"], 1)
+
+        with self.subTest("Addresses with too few mints are skipped"):
+            result = grifter_stats.grifter_stats(
+                self.mints, self.rarity_db, top_n=[2], min_minted=3
+            )
+            self.assertEqual(list(result.index), ["0x01", "0x02"])
+
+
+if __name__ == "__main__":
+    unittest.main()
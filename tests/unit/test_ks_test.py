@@ -0,0 +1,60 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from fair_drop import ks_test
+
+
+class TestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        rng = np.random.default_rng(42)
+        self.num_tokens = 1000
+        ranks = rng.permutation(np.arange(1, self.num_tokens + 1))
+        accounts = rng.choice([f"0x{i:02d}" for i in range(20)], self.num_tokens)
+        accounts = accounts.astype(object)
+        # The lucky wallet mints the 30 rarest tokens in 3 transactions
+        accounts[np.isin(ranks, np.arange(1, 31))] = "0xlucky"
+        self.data = pd.DataFrame(
+            {
+                "txid": [f"0xtx{i // 10}" for i in range(self.num_tokens)],
+                "to_account": accounts,
+                "TOKEN_ID": np.arange(self.num_tokens),
+                "rank": ranks,
+            }
+        )
+        lucky = self.data["to_account"] == "0xlucky"
+        self.data.loc[lucky, "txid"] = [f"0xlucky{i // 10}" for i in range(30)]
+
+    def test_ks_test_wallets(self):
+        results = ks_test.ks_test_wallets(self.data)
+
+        for address, group in self.data.groupby("to_account"):
+            expected = stats.kstest(
+                group["rank"],
+                lambda x: x / self.num_tokens,
+                alternative="greater",
+            )
+            with self.subTest(address=address):
+                self.assertAlmostEqual(
+                    results.loc[address, "statistic"], max(expected.statistic, 0)
+                )
+                self.assertAlmostEqual(results.loc[address, "pvalue"], expected.pvalue)
+
+    def test_find_anomalies(self):
+        grifters = ks_test.find_anomalies(self.data, p_value=0.001)
+
+        self.assertEqual(list(grifters.columns), ks_test.GRIFTERS_COLUMNS)
+        self.assertEqual(grifters["address"].tolist(), ["0xlucky"])
+        self.assertEqual(grifters.loc[0, "num_minted"], 30)
+        self.assertEqual(grifters.loc[0, "num_transactions"], 3)
+        lucky = self.data[self.data["to_account"] == "0xlucky"]
+        self.assertEqual(
+            [rank for rank, _ in grifters.loc[0, "token_list"]],
+            lucky.groupby("txid", sort=False)["rank"].min().tolist(),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,5 @@
 import os
+import time
 import unittest
 from pathlib import Path
 
@@ -74,7 +75,31 @@ class TestCase(unittest.TestCase):
             for value in ["", "test", True, 1, False, 0]:
                 self.assertRaises(ValueError, misc.strtobool, value)
 
+    def test_cursor(self):
+        cursor_file = self.temp_path.joinpath("cursor.json")
+        query = {"contract": "0xcontract", "limit": 10}
+
+        with self.subTest("Without a cursor file there is no cursor"):
+            self.assertIsNone(misc.load_cursor(cursor_file, query))
+
+        with self.subTest("A saved cursor is loaded for the same query"):
+            misc.save_cursor(cursor_file, query, "next")
+            self.assertEqual(misc.load_cursor(cursor_file, query), "next")
+
+        with self.subTest("A cursor of a different query is rejected"):
+            with self.assertRaises(ValueError):
+                misc.load_cursor(cursor_file, {**query, "limit": 20})
+
+    def test_rate_limiter(self):
+        rate_limiter = misc.RateLimiter(requests_per_second=50)
+        start = time.monotonic()
+        for _ in range(6):
+            rate_limiter.wait()
+        # The first request goes right away, the next 5 are spaced 20 ms apart
+        self.assertGreaterEqual(time.monotonic() - start, 0.1)
+
     def tearDown(self) -> None:
+        Path(self.temp_path, "cursor.json").unlink(missing_ok=True)
         Path(self.temp_path, "testfile1.txt").unlink(missing_ok=True)
         Path(self.temp_path, "testfile2.txt").unlink(missing_ok=True)
         self.temp_path.rmdir()
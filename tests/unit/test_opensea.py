@@ -1,6 +1,12 @@
+import datetime
+import json
+import shutil
 import unittest
+from pathlib import Path
+from unittest import mock
 
 from honestnft_utils import opensea
+from tests import helpers
 
 DELISTED_COLLECTIONS = [
     "0x2ee6af0dff3a1ce3f7e3414c52c48fd50d73691e",
@@ -9,6 +15,11 @@ LISTED_COLLECTIONS = [
     "0x8a90cab2b38dba80c64b7734e58ee1db38b8992e",
     "0xbd1d2ea3127587f4ecfd271e1dadfc95320b8dea",
 ]
+START = datetime.datetime(2021, 10, 1)
+EVENTS = [
+    {"id": i, "event_timestamp": (START + datetime.timedelta(seconds=i)).isoformat()}
+    for i in range(35)
+]
 
 
 class TestCase(unittest.TestCase):
@@ -20,3 +31,119 @@ class TestCase(unittest.TestCase):
         with self.subTest("Testing listed collections"):
             for entry in LISTED_COLLECTIONS:
                 self.assertFalse(opensea.is_collection_delisted(entry), entry)
+
+    def test_iter_opensea_events(self):
+        with helpers.OpenSeaStandIn(EVENTS, failures=2) as server, mock.patch.object(
+            opensea, "OPENSEA_EVENTS_URL", server.url
+        ):
+            pages = list(opensea.iter_opensea_events("0xcontract", limit=10))
+
+            self.assertEqual([len(page) for page in pages], [10, 10, 10, 5])
+            self.assertEqual(
+                [event["id"] for page in pages for event in page],
+                list(range(34, -1, -1)),
+            )
+            # 2 failed requests were retried
+            self.assertEqual(len(server.requests), 6)
+
+    def test_iter_opensea_events_resume(self):
+        temp_path = Path(f"{helpers.TESTS_ROOT_DIR}/temp_opensea")
+        temp_path.mkdir(parents=True, exist_ok=True)
+        cursor_file = str(temp_path.joinpath("cursor.json"))
+        self.addCleanup(shutil.rmtree, temp_path)
+
+        with helpers.OpenSeaStandIn(EVENTS) as server, mock.patch.object(
+            opensea, "OPENSEA_EVENTS_URL", server.url
+        ):
+            pages = opensea.iter_opensea_events(
+                "0xcontract", limit=10, cursor_file=cursor_file
+            )
+            next(pages)
+            next(pages)
+            pages.close()
+
+            with self.subTest("Cursor of the last processed page is saved"):
+                with open(cursor_file) as f:
+                    self.assertEqual(json.load(f)["cursor"], "10")
+
+            with self.subTest("Pagination resumes from the saved cursor"):
+                pages = opensea.iter_opensea_events(
+                    "0xcontract", limit=10, cursor_file=cursor_file
+                )
+                self.assertEqual(
+                    [event["id"] for page in pages for event in page],
+                    list(range(24, -1, -1)),
+                )
+                self.assertFalse(Path(cursor_file).exists())
+
+            with self.subTest("Cursor of a different query is rejected"):
+                with open(cursor_file, "w") as f:
+                    json.dump({"query": {}, "cursor": "10"}, f)
+                with self.assertRaises(ValueError):
+                    next(
+                        opensea.iter_opensea_events(
+                            "0xcontract", cursor_file=cursor_file
+                        )
+                    )
+
+    def test_get_opensea_events(self):
+        have = [{"id": -1, "event_timestamp": START.isoformat()}]
+
+        with helpers.OpenSeaStandIn(EVENTS) as server, mock.patch.object(
+            opensea, "OPENSEA_EVENTS_URL", server.url
+        ):
+            with self.subTest("All pages are fetched"):
+                events = opensea.get_opensea_events("0xcontract", have=have, limit=10)
+                self.assertEqual(len(events), 36)
+                self.assertEqual(len(have), 1)
+
+            with self.subTest("Only the first page is fetched"):
+                events = opensea.get_opensea_events(
+                    "0xcontract", continuous=False, limit=10
+                )
+                self.assertEqual(len(events), 10)
+
+    def test_get_opensea_events_parallel(self):
+        # A quiet month with a burst of 1000 events in 10 minutes, many in the same second
+        quiet = [START + datetime.timedelta(hours=i) for i in range(0, 720, 3)]
+        burst = [
+            START + datetime.timedelta(days=10, seconds=i // 3) for i in range(1000)
+        ]
+        events = [
+            {"id": i, "event_timestamp": timestamp.isoformat()}
+            for i, timestamp in enumerate(quiet + burst)
+        ]
+        start = int(START.replace(tzinfo=datetime.timezone.utc).timestamp())
+
+        # The API may treat occurred_after as inclusive or exclusive, the range starts
+        # one second before the first event so it is included either way
+        for exclusive_after in (False, True):
+            with self.subTest(exclusive_after=exclusive_after), helpers.OpenSeaStandIn(
+                events, failures=1, exclusive_after=exclusive_after
+            ) as server, mock.patch.object(opensea, "OPENSEA_EVENTS_URL", server.url):
+                result = opensea.get_opensea_events_parallel(
+                    "0xcontract",
+                    occurred_after=start - 1,
+                    occurred_before=start + 31 * 24 * 3600,
+                    limit=50,
+                    max_workers=4,
+                    requests_per_second=1000,
+                    min_window=60,
+                )
+
+                self.assertEqual(len(result), len(events))
+                self.assertEqual(
+                    sorted(event["id"] for event in result), list(range(len(events)))
+                )
+                self.assertEqual(
+                    [event["event_timestamp"] for event in result],
+                    sorted(
+                        (event["event_timestamp"] for event in events), reverse=True
+                    ),
+                )
+                # Dense windows are split, sparse windows take a single request
+                self.assertLess(len(server.requests), 2 * len(events) / 50 + 16)
+
+
+if __name__ == "__main__":
+    unittest.main()
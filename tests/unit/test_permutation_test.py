@@ -0,0 +1,60 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from fair_drop import permutation_test
+
+
+class TestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        rng = np.random.default_rng(7)
+        ranks = rng.permutation(np.arange(1, 501))
+        accounts = rng.choice([f"0x{i:02d}" for i in range(25)], len(ranks))
+        accounts = accounts.astype(object)
+        accounts[np.isin(ranks, np.arange(1, 11))] = "0xlucky"
+        self.data = pd.DataFrame({"to_account": accounts, "rank": ranks})
+
+    def test_wallet_rank_matrices(self):
+        matrices = permutation_test.wallet_rank_matrices(self.data)
+
+        self.assertEqual(
+            sum(len(addresses) for addresses, _ in matrices.values()),
+            self.data["to_account"].nunique(),
+        )
+        addresses, matrix = matrices[10]
+        row = list(addresses).index("0xlucky")
+        self.assertEqual(sorted(matrix[row]), list(range(1, 11)))
+
+    def test_permutation_test(self):
+        for statistic in permutation_test.STATISTICS:
+            with self.subTest(statistic=statistic):
+                result = permutation_test.permutation_test(
+                    self.data, statistic=statistic, replicates=500, seed=1
+                )
+
+                self.assertEqual(result.index[0], "0xlucky")
+                self.assertEqual(result.loc["0xlucky", "pvalue"], 1 / 501)
+                self.assertTrue((result["pvalue"] > 0.01).iloc[1:].all())
+                self.assertTrue(
+                    (result["pvalue_lower"] <= result["pvalue_upper"]).all()
+                )
+
+    def test_permutation_test_is_reproducible(self):
+        kwargs = {"replicates": 300, "seed": 42, "chunk_size": 100}
+        single = permutation_test.permutation_test(self.data, **kwargs)
+
+        with self.subTest("Same seed gives the same result"):
+            pd.testing.assert_frame_equal(
+                single, permutation_test.permutation_test(self.data, **kwargs)
+            )
+
+        with self.subTest("Result doesn't depend on the number of processes"):
+            pd.testing.assert_frame_equal(
+                single,
+                permutation_test.permutation_test(self.data, processes=2, **kwargs),
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
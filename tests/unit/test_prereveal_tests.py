@@ -0,0 +1,57 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from fair_drop import prereveal_tests
+
+
+class TestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.bids = pd.DataFrame(
+            {
+                "TOKEN_ID": [1] * 6 + [2] * 6 + [3] * 3,
+                "OFFER": [1.0, 1.0, 1.0, 3.0, 3.0, 3.0] + [2.0] * 6 + [1.0, 1.0, 1.0],
+            }
+        )
+        self.sales = pd.DataFrame(
+            {
+                "TOKEN_ID": [1, 1, 2, 3],
+                "PRICE": [4.5, 1.0, 2.5, 9.0],
+                "RANK": [10, 10, 20, 30],
+                "USER": ["0x01", "0x02", "0x03", "0x04"],
+            }
+        )
+
+    def test_sales_vs_offers(self):
+        result = prereveal_tests.sales_vs_offers(self.bids, self.sales)
+
+        self.assertEqual(list(result.index), [1, 2])
+        self.assertEqual(result.loc[1, "NUM_OFFERS"], 6)
+        self.assertEqual(result.loc[1, "MEAN_OFFER"], 2.0)
+        self.assertEqual(result.loc[1, "STD_OFFER"], np.std([1, 1, 1, 3, 3, 3]))
+        self.assertEqual(result.loc[1, "USER"], "0x01")
+        self.assertEqual(result.loc[1, "Z_SCORE"], 2.5)
+
+    def test_find_overpaid_tokens(self):
+        with self.subTest("Only the first sale of a token is tested"):
+            result = prereveal_tests.find_overpaid_tokens(
+                self.bids, self.sales, st_devs=2
+            )
+            self.assertEqual(list(result.index), [1, 2])
+
+        with self.subTest("Sweep matches the single threshold"):
+            sweep = prereveal_tests.sweep_st_devs(self.bids, self.sales, [2, 3])
+            for k in [2, 3]:
+                self.assertEqual(
+                    list(sweep.index[sweep[f"OVERPAID_{k}"]]),
+                    list(
+                        prereveal_tests.find_overpaid_tokens(
+                            self.bids, self.sales, st_devs=k
+                        ).index
+                    ),
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
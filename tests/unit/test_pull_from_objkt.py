@@ -0,0 +1,64 @@
+import re
+import unittest
+from unittest import mock
+
+from metadata import pull_from_objkt
+
+TOKEN_IDS = [str(i) for i in range(1234)]
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        return {"data": self.data}
+
+
+def fake_post(self, url, json):
+    """Answer the tokens query like objkt.com, comparing token ids as strings"""
+    variables = json["variables"]
+    # Every declared variable has a value and every value is declared
+    declared = set(re.findall(r"\$(\w+):", json["query"]))
+    assert declared == set(variables), (declared, set(variables))
+    tokens = sorted(
+        token_id
+        for token_id in TOKEN_IDS
+        if token_id >= variables["from"]
+        and token_id > variables["after"]
+        and ("before" not in variables or token_id < variables["before"])
+    )
+    page = tokens[: variables["limit"]]
+    return FakeResponse(
+        {
+            "token": [
+                {
+                    "token_id": token_id,
+                    "name": f"Token {token_id}",
+                    "attributes": [
+                        {"attribute": {"name": "Parity", "value": int(token_id) % 2}}
+                    ],
+                }
+                for token_id in page
+            ]
+        }
+    )
+
+
+@mock.patch("requests.Session.post", fake_post)
+class TestCase(unittest.TestCase):
+    def test_iter_token_pages(self):
+        pages = list(pull_from_objkt.iter_token_pages("KT1contract"))
+        self.assertEqual([len(page) for page in pages], [500, 500, 234])
+        self.assertEqual(
+            pages[0][1], {"TOKEN_ID": "1", "TOKEN_NAME": "Token 1", "Parity": 1}
+        )
+
+    def test_pull_from_objkt(self):
+        expected = sorted(TOKEN_IDS)
+        for threads in [1, 4]:
+            with self.subTest(threads=threads):
+                metadata = pull_from_objkt.pull_from_objkt("KT1contract", threads)
+                self.assertEqual([row["TOKEN_ID"] for row in metadata], expected)
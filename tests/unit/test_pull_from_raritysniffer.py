@@ -0,0 +1,98 @@
+import io
+import json
+import shutil
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from metadata import pull_from_raritysniffer
+from tests import helpers
+
+RESPONSE = {
+    "name": "Test Collection",
+    "data": [
+        {
+            "id": token_id,
+            "name": f"#{token_id}",
+            "score": 10 - token_id,
+            "positionId": token_id + 1,
+            "traits": [{"c": "Hat", "n": "Cap", "r": 0.5}],
+        }
+        for token_id in range(5)
+    ],
+}
+
+
+def fake_request(method, url, headers=None, params=None, stream=False):
+    body = json.dumps(RESPONSE).encode()
+    return mock.Mock(
+        status_code=200, json=lambda: json.loads(body), raw=io.BytesIO(body)
+    )
+
+
+@mock.patch("requests.request", fake_request)
+class TestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_path = Path(f"{helpers.TESTS_ROOT_DIR}/temp_raritysniffer")
+        self.temp_path.mkdir(parents=True, exist_ok=True)
+        self.addCleanup(shutil.rmtree, self.temp_path)
+        for folder in ["ATTRIBUTES_FOLDER", "RARITY_FOLDER"]:
+            patcher = mock.patch(
+                f"honestnft_utils.config.{folder}", str(self.temp_path)
+            )
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_download_compressed_raw_data(self):
+        for stream in [False, True]:
+            with self.subTest(stream=stream):
+                pull_from_raritysniffer.download(
+                    "0xcontract",
+                    save_raw_data=True,
+                    compress_raw_data=True,
+                    stream=stream,
+                )
+                self.assertTrue(self.temp_path.joinpath("TestCollection.zip").exists())
+                self.assertFalse(self.temp_path.joinpath("TestCollection").exists())
+                self.assertEqual(
+                    pull_from_raritysniffer.read_raw_token("TestCollection", 3),
+                    RESPONSE["data"][3],
+                )
+
+    def test_download_failure(self):
+        parse_token = pull_from_raritysniffer.parse_token
+
+        def fail_on_last_token(token):
+            if token["id"] == 4:
+                raise KeyError("traits")
+            return parse_token(token)
+
+        # The streaming CSV writers spill their chunks to the temp dir
+        spill_path = self.temp_path.joinpath("spill")
+        spill_path.mkdir()
+        for stream in [False, True]:
+            with self.subTest(stream=stream), mock.patch.object(
+                pull_from_raritysniffer, "parse_token", fail_on_last_token
+            ), mock.patch("tempfile.tempdir", str(spill_path)):
+                with self.assertRaises(KeyError):
+                    pull_from_raritysniffer.download(
+                        "0xcontract",
+                        save_raw_data=True,
+                        compress_raw_data=True,
+                        stream=stream,
+                    )
+                self.assertFalse(self.temp_path.joinpath("TestCollection.zip").exists())
+                self.assertFalse(
+                    self.temp_path.joinpath("TestCollection.zip.tmp").exists()
+                )
+                self.assertEqual(list(spill_path.iterdir()), [])
+
+    def test_download_raw_data(self):
+        pull_from_raritysniffer.download("0xcontract", save_raw_data=True)
+        self.assertEqual(
+            len(list(self.temp_path.joinpath("TestCollection").iterdir())), 5
+        )
+        self.assertEqual(
+            pull_from_raritysniffer.read_raw_token("TestCollection", 3),
+            RESPONSE["data"][3],
+        )
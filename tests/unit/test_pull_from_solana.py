@@ -0,0 +1,174 @@
+import io
+import json
+import shutil
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+
+from metadata import pull_from_solana
+from tests import helpers
+
+METADATA_URIS = [
+    {"token_id": str(i), "uri": f"https://example.com/{i}"} for i in range(8)
+]
+
+
+def raw_metadata(token_id):
+    return {
+        "name": f"Token #{token_id}",
+        "description": "",
+        "image": "",
+        "external_url": "",
+        "attributes": [{"trait_type": "Parity", "value": int(token_id) % 2}],
+    }
+
+
+class TestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_path = Path(f"{helpers.TESTS_ROOT_DIR}/temp_solana")
+        self.temp_path.mkdir(parents=True, exist_ok=True)
+        self.addCleanup(shutil.rmtree, self.temp_path)
+        patcher = mock.patch(
+            "honestnft_utils.config.ATTRIBUTES_FOLDER", str(self.temp_path)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        # Token 3 fails once, token 5 always fails
+        failed_once = set()
+
+        def fake_fetch(token_id, metadata_uri):
+            if token_id == "5" or (token_id == "3" and token_id not in failed_once):
+                failed_once.add(token_id)
+                raise Exception(f"Failed to get metadata from {metadata_uri}.")
+            return token_id, raw_metadata(token_id)
+
+        for target, kwargs in [
+            ("fetch", {"side_effect": fake_fetch}),
+            ("fetch_metadata_uris", {"return_value": METADATA_URIS}),
+        ]:
+            patcher = mock.patch.object(pull_from_solana, target, **kwargs)
+            setattr(self, target, patcher.start())
+            self.addCleanup(patcher.stop)
+
+    def test_pull_metadata(self):
+        pull_from_solana.pull_metadata("solana", "contract", threads=4)
+
+        trait_db = pd.read_csv(self.temp_path.joinpath("solana.csv"))
+        with self.subTest("Failed tokens are retried and skipped"):
+            self.assertEqual(trait_db["TOKEN_ID"].tolist(), [0, 1, 2, 3, 4, 6, 7])
+            self.assertEqual(trait_db["Parity"].tolist(), [0, 1, 0, 1, 0, 0, 1])
+
+        with self.subTest("Metadata is cached"):
+            self.assertEqual(
+                len(list(self.temp_path.joinpath("solana").glob("*.json"))), 7
+            )
+            calls = self.fetch.call_count
+            pull_from_solana.pull_metadata("solana", "contract", threads=4)
+            # Only token 5 is requested again, and retried once
+            self.assertEqual(self.fetch.call_count, calls + 2)
+
+    def test_pull_metadata_without_token_ids(self):
+        # Names without "#<id>", the token id comes from the sequence trait
+        uris = [{"token_id": None, "uri": f"https://example.com/{i}"} for i in (8, 9)]
+
+        def fake_fetch(token_id, metadata_uri):
+            sequence = int(metadata_uri.split("/")[-1])
+            metadata = raw_metadata(sequence)
+            metadata["name"] = "Unnamed"
+            metadata["attributes"].append({"trait_type": "sequence", "value": sequence})
+            return token_id, metadata
+
+        self.fetch.side_effect = fake_fetch
+        self.fetch_metadata_uris.return_value = uris
+        for run in range(2):
+            with self.subTest(run=run):
+                pull_from_solana.pull_metadata("solana", "contract", threads=4)
+                trait_db = pd.read_csv(self.temp_path.joinpath("solana.csv"))
+                self.assertEqual(trait_db["TOKEN_ID"].tolist(), [8, 9])
+                self.assertEqual(trait_db["Parity"].tolist(), [0, 1])
+        self.assertFalse(self.temp_path.joinpath("solana", "None.json").exists())
+        self.assertEqual(self.fetch.call_count, 4)
+
+    def test_pull_metadata_without_cache(self):
+        pull_from_solana.pull_metadata("solana", "contract", threads=4, cache=False)
+        self.assertFalse(self.temp_path.joinpath("solana").exists())
+        trait_db = pd.read_csv(self.temp_path.joinpath("solana.csv"))
+        self.assertEqual(len(trait_db), 7)
+
+    def test_pull_metadata_streaming(self):
+        with mock.patch.object(
+            pull_from_solana, "iter_metadata_uris", return_value=iter(METADATA_URIS)
+        ):
+            pull_from_solana.pull_metadata("solana", "contract", threads=4, stream=True)
+        self.fetch_metadata_uris.assert_not_called()
+        trait_db = pd.read_csv(self.temp_path.joinpath("solana.csv"))
+        self.assertEqual(trait_db["TOKEN_ID"].tolist(), [0, 1, 2, 3, 4, 6, 7])
+
+    def test_pull_metadata_streaming_without_token_ids(self):
+        body = {
+            "jsonrpc": "2.0",
+            "result": [
+                {"metadata": {"name": "Token #1", "uri": "https://example.com/1"}},
+                {"metadata": {"name": "Unnamed", "uri": "https://example.com/8"}},
+                {"metadata": {"name": "Unnamed", "uri": "https://example.com/9"}},
+            ],
+            "id": 1,
+        }
+
+        def fake_fetch(token_id, metadata_uri):
+            sequence = int(metadata_uri.split("/")[-1])
+            metadata = raw_metadata(sequence)
+            if token_id is None:
+                metadata["attributes"].append(
+                    {"trait_type": "sequence", "value": sequence}
+                )
+            return token_id, metadata
+
+        self.fetch.side_effect = fake_fetch
+        response = mock.Mock(raw=io.BytesIO(json.dumps(body).encode()))
+        with mock.patch.object(
+            pull_from_solana, "_post_get_nfts", return_value=response
+        ):
+            pull_from_solana.pull_metadata("solana", "contract", threads=4, stream=True)
+
+        self.assertCountEqual(
+            [call.args[0] for call in self.fetch.call_args_list], ["1", None, None]
+        )
+        trait_db = pd.read_csv(self.temp_path.joinpath("solana.csv"))
+        self.assertEqual(trait_db["TOKEN_ID"].tolist(), [1, 8, 9])
+        self.assertNotIn("sequence", trait_db.columns)
+
+
+class TestStreaming(unittest.TestCase):
+    def test_iter_metadata_uris(self):
+        body = {
+            "jsonrpc": "2.0",
+            "result": [
+                {"metadata": {"name": "Token #12", "uri": "https://example.com/12"}},
+                {"metadata": {"name": "Unnamed", "uri": "https://example.com/x"}},
+            ],
+            "id": 1,
+        }
+        response = mock.Mock(raw=io.BytesIO(json.dumps(body).encode()))
+        with mock.patch.object(
+            pull_from_solana, "_post_get_nfts", return_value=response
+        ):
+            self.assertEqual(
+                list(pull_from_solana.iter_metadata_uris("contract")),
+                [
+                    {"token_id": "12", "uri": "https://example.com/12"},
+                    {"token_id": None, "uri": "https://example.com/x"},
+                ],
+            )
+
+    def test_iter_metadata_uris_error(self):
+        body = {"jsonrpc": "2.0", "error": {"code": -32602, "message": "Invalid"}}
+        response = mock.Mock(raw=io.BytesIO(json.dumps(body).encode()))
+        with mock.patch.object(
+            pull_from_solana, "_post_get_nfts", return_value=response
+        ):
+            with self.assertRaises(Exception):
+                list(pull_from_solana.iter_metadata_uris("contract"))
@@ -0,0 +1,71 @@
+import shutil
+import unittest
+from pathlib import Path
+
+from metadata import rarity
+from tests import helpers
+
+FIXTURES_FOLDER = f"{helpers.TESTS_ROOT_DIR}/fixtures/rarity_comparison/raw_attributes"
+
+
+class TestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_path = Path(f"{helpers.TESTS_ROOT_DIR}/temp_rarity")
+        self.attributes_path = self.temp_path.joinpath("raw_attributes")
+        self.attributes_path.mkdir(parents=True, exist_ok=True)
+        self.collections = ["pudgypenguins", "strangehands-official"]
+        for collection in self.collections:
+            shutil.copy(
+                f"{FIXTURES_FOLDER}/{collection}.csv",
+                self.attributes_path.joinpath(f"{collection}.csv"),
+            )
+
+    def build_all(self, force: bool = False):
+        with helpers.BlockStatementPrinting():
+            return rarity.build_all_rarity_dbs(
+                method="raritytools",
+                trait_count=True,
+                sum_traits=None,
+                sum_trait_multiplier=35,
+                processes=2,
+                force=force,
+                attributes_folder=str(self.attributes_path),
+                output_folder=str(self.temp_path),
+            )
+
+    def test_build_all_rarity_dbs(self):
+        summary = self.build_all()
+
+        with self.subTest("All collections are built"):
+            self.assertEqual(sorted(summary["collection"]), self.collections)
+            self.assertTrue((summary["status"] == "built").all())
+            for collection in self.collections:
+                self.assertTrue(
+                    self.temp_path.joinpath(f"{collection}_raritytools.csv").exists()
+                )
+            self.assertTrue(self.temp_path.joinpath(".build/summary.csv").exists())
+
+        with self.subTest("Unchanged collections are skipped"):
+            summary = self.build_all()
+            self.assertTrue((summary["status"] == "skipped").all())
+
+        with self.subTest("Changed collections are rebuilt"):
+            attribute_file = self.attributes_path.joinpath("pudgypenguins.csv")
+            with open(attribute_file, "r") as f:
+                lines = f.readlines()
+            with open(attribute_file, "w") as f:
+                f.writelines(lines[:-1])
+            summary = self.build_all().set_index("collection")
+            self.assertEqual(summary.loc["pudgypenguins", "status"], "built")
+            self.assertEqual(summary.loc["strangehands-official", "status"], "skipped")
+
+        with self.subTest("Force rebuilds unchanged collections"):
+            summary = self.build_all(force=True)
+            self.assertTrue((summary["status"] == "built").all())
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.temp_path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import io
+import json
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+from honestnft_utils import streaming
+from tests import helpers
+
+
+class TestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_path = Path(f"{helpers.TESTS_ROOT_DIR}/temp")
+        self.temp_path.mkdir(parents=True, exist_ok=True)
+        self.csv_path = self.temp_path.joinpath("chunked.csv")
+        self.zip_path = self.temp_path.joinpath("raw.zip")
+
+    def test_iter_json_object(self):
+        payload = {
+            "name": "Test Collection",
+            "data": [{"id": 1, "score": 1.5}, {"id": 2, "traits": [1, [2, 3]]}],
+            "meta": {"count": 2},
+        }
+        stream = io.BytesIO(json.dumps(payload).encode())
+
+        self.assertEqual(
+            list(streaming.iter_json_object(stream, stream_keys=("data",))),
+            [
+                ("name", "Test Collection"),
+                ("data", {"id": 1, "score": 1.5}),
+                ("data", {"id": 2, "traits": [1, [2, 3]]}),
+                ("meta", {"count": 2}),
+            ],
+        )
+
+    def test_iter_json_object_without_stream_keys(self):
+        payload = {"data": [1, 2, 3], "next": None}
+        stream = io.BytesIO(json.dumps(payload).encode())
+
+        self.assertEqual(
+            list(streaming.iter_json_object(stream)),
+            [("data", [1, 2, 3]), ("next", None)],
+        )
+
+    def test_chunked_csv_writer(self):
+        rows = [
+            {"TOKEN_ID": 1, "TOKEN_NAME": "#1", "Hat": "Cap"},
+            {"TOKEN_ID": 2, "TOKEN_NAME": "#2", "Hat": "Beanie"},
+            {"TOKEN_ID": 3, "TOKEN_NAME": "#3", "Eyes": "Laser"},
+        ]
+        with streaming.ChunkedCsvWriter(
+            str(self.csv_path), index_col="TOKEN_ID", chunk_size=2
+        ) as writer:
+            for row in rows:
+                writer.write(row)
+
+        self.assertEqual(writer.rows_written, 3)
+        pd.testing.assert_frame_equal(
+            pd.read_csv(self.csv_path),
+            pd.DataFrame.from_records(rows),
+        )
+
+    def test_chunked_csv_writer_transform(self):
+        writer = streaming.ChunkedCsvWriter(str(self.csv_path), chunk_size=1)
+        for token_id in range(3):
+            writer.write({"TOKEN_ID": token_id})
+
+        def add_rank(chunk: pd.DataFrame) -> pd.DataFrame:
+            chunk["Rank"] = 3 - chunk["TOKEN_ID"].astype(int)
+            return chunk
+
+        self.assertEqual(writer.close(transform=add_rank), 3)
+        self.assertEqual(list(pd.read_csv(self.csv_path)["Rank"]), [3, 2, 1])
+
+    def test_zip_record_writer(self):
+        tokens = [{"id": i, "traits": [{"c": "Hat", "n": "Cap"}]} for i in range(3)]
+        with streaming.ZipRecordWriter(str(self.zip_path)) as writer:
+            for token in tokens:
+                writer.write(f"{token['id']}.json", token)
+            self.assertFalse(self.zip_path.exists())
+
+        self.assertEqual(writer.records_written, 3)
+        self.assertEqual(
+            streaming.read_zip_record(str(self.zip_path), "1.json"), tokens[1]
+        )
+        with self.assertRaises(KeyError):
+            streaming.read_zip_record(str(self.zip_path), "3.json")
+
+    def test_zip_record_writer_error(self):
+        with self.assertRaises(ValueError):
+            with streaming.ZipRecordWriter(str(self.zip_path)) as writer:
+                writer.write("0.json", {"id": 0})
+                raise ValueError("interrupted")
+        self.assertEqual(list(self.temp_path.iterdir()), [])
+
+    def tearDown(self) -> None:
+        self.csv_path.unlink(missing_ok=True)
+        self.zip_path.unlink(missing_ok=True)
+        self.temp_path.rmdir()
+
+
+if __name__ == "__main__":
+    unittest.main()
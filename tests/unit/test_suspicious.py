@@ -0,0 +1,177 @@
+import json
+import shutil
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+
+from fair_drop import benchmark_suspicious, suspicious
+from honestnft_utils import misc
+from tests import helpers
+
+SELECTOR = "i.suspicious-flag"
+SUSPICIOUS_IDS = {3, 7}
+
+
+def nft_page(token_id: int) -> str:
+    flag = '<i class="suspicious-flag">report</i>' if token_id in SUSPICIOUS_IDS else ""
+    return (
+        f"<html><head><script>var id = {token_id};</script></head>"
+        f"<body><h1>Token {token_id}</h1>{flag}</body></html>"
+    )
+
+
+def chunked(html: str, size: int):
+    return [html[i : i + size] for i in range(0, len(html), size)]
+
+
+STYLE = "<style>.suspicious-flag{color:red}</style>"
+PAGES = {
+    "flagged": f"<html><head>{STYLE}</head><body><i class='x suspicious-flag'>!</i></body></html>",
+    "style_only": f"<html><head>{STYLE}</head><body><i class='x'>ok</i></body></html>",
+    "other_tag": '<html><body><span class="suspicious-flag">!</span></body></html>',
+    "unclosed": '<html><body><p>text</p><i class="suspicious-flag"',
+    "gt_in_attribute": '<html><body><i aria-label="a > b" class="suspicious-flag x">!</i></body></html>',
+    "lt_in_attribute": '<html><body><i title="a<b" class="suspicious-flag x">!</i></body></html>',
+    "in_comment": "<html><body><!-- <i class='suspicious-flag'> --></body></html>",
+    "in_script": "<html><head><script>'<i class=\"suspicious-flag\">'</script></head></html>",
+    "in_attribute": '<html><body><i title="<i class=suspicious-flag>">ok</i></body></html>',
+}
+
+
+class TestCase(unittest.TestCase):
+    def test_selector_tokens(self):
+        self.assertEqual(
+            suspicious.selector_tokens("div > i.sc-e8292ad1-0.gZavKY#flag"),
+            ["sc-e8292ad1-0", "gZavKY", "flag"],
+        )
+        for selector in ["i[title=flag]", "div.x, span.z", "span:not(.z)", "div *"]:
+            with self.subTest(selector=selector):
+                self.assertEqual(suspicious.selector_tokens(selector), [])
+
+    def test_scan_for_flag(self):
+        for size in [1, 7, 4096]:
+            for name, html in PAGES.items():
+                with self.subTest(page=name, chunk_size=size):
+                    self.assertEqual(
+                        suspicious.scan_for_flag(chunked(html, size), SELECTOR),
+                        suspicious.has_flag_bs4(html, SELECTOR),
+                    )
+
+    def test_scan_for_flag_without_tokens(self):
+        html = (
+            '<html><body><div class="x">!</div><span class="y">!</span></body></html>'
+        )
+        for selector in ["div.x, span.z", "span:not(.z)", "div[class=x]"]:
+            with self.subTest(selector=selector):
+                self.assertTrue(suspicious.has_flag_bs4(html, selector))
+                self.assertTrue(suspicious.scan_for_flag(chunked(html, 7), selector))
+
+    def test_scan_for_flag_skips_parsing(self):
+        detector = mock.Mock(side_effect=suspicious.has_flag_bs4)
+        with self.subTest("Pages without a candidate tag are not parsed"):
+            for name in ["style_only", "in_comment", "in_script", "in_attribute"]:
+                self.assertFalse(
+                    suspicious.scan_for_flag([PAGES[name]], SELECTOR, detector)
+                )
+            detector.assert_not_called()
+
+        with self.subTest("Reading stops at the flag"):
+            page = PAGES["flagged"] + "<p>never read</p>"
+            chunks = iter(chunked(page, 10))
+            self.assertTrue(suspicious.scan_for_flag(chunks, SELECTOR, detector))
+            self.assertGreater(len(list(chunks)), 0)
+
+        with self.subTest("The whole page is parsed if the context doesn't match"):
+            self.assertFalse(
+                suspicious.scan_for_flag(
+                    chunked(PAGES["flagged"], 10), "div " + SELECTOR, detector
+                )
+            )
+
+    def test_benchmark_detectors(self):
+        result = benchmark_suspicious.benchmark_detectors(PAGES, SELECTOR, repeat=1)
+        self.assertEqual(result["mismatches"].sum(), 0)
+        self.assertEqual(
+            result["flagged"].iloc[0],
+            sum(suspicious.has_flag_bs4(html, SELECTOR) for html in PAGES.values()),
+        )
+
+    def test_iter_scrape_results(self):
+        pages = {f"/assets/{i}": nft_page(i) for i in range(20)}
+        with helpers.PageStandIn(pages) as server:
+            urls = [f"{server.url}/assets/{i}" for i in range(25)]
+            session = misc.mount_session(total_retries=0, pool_maxsize=4)
+            results = list(
+                suspicious.iter_scrape_results(urls, session, SELECTOR, threads=4)
+            )
+
+        self.assertEqual(len(server.requests), 25)
+        found = [result for result in results if result is not None]
+        self.assertEqual(
+            sorted(int(result["token_id"]) for result in found), list(range(20))
+        )
+        self.assertEqual(
+            {int(r["token_id"]) for r in found if r["is_suspicious"]}, SUSPICIOUS_IDS
+        )
+
+    def test_iter_pending_nfts_urls(self):
+        cache = pd.DataFrame(
+            {"token_id": [1, 3, 99], "url": ["a", "b", "c"], "is_suspicious": False}
+        )
+        cached_ids = suspicious.get_cached_token_ids(cache)
+        self.assertEqual(cached_ids, {1, 3, 99})
+        self.assertEqual(
+            list(suspicious.iter_pending_nfts_urls("0xcontract", 0, 4, cached_ids)),
+            [suspicious.get_nft_url("0xcontract", i) for i in (0, 2, 4)],
+        )
+
+    def test_main(self):
+        temp_path = Path(f"{helpers.TESTS_ROOT_DIR}/temp_suspicious")
+        temp_path.joinpath(".cache").mkdir(parents=True, exist_ok=True)
+        self.addCleanup(shutil.rmtree, temp_path)
+
+        def fake_is_nft_suspicious(nft_url, session, selector, **kwargs):
+            token_id = int(nft_url.split("/")[-1])
+            return {
+                "token_id": token_id,
+                "url": nft_url,
+                "is_suspicious": token_id in SUSPICIOUS_IDS,
+            }
+
+        # Tokens 0 to 2 were scraped before
+        contract = "0xcontract"
+        cached = pd.DataFrame(
+            [
+                fake_is_nft_suspicious(url, None, SELECTOR)
+                for url in suspicious.list_collection_nfts_urls(contract, 0, 2)
+            ]
+        )
+        cached.to_csv(temp_path.joinpath(f".cache/{contract}.csv"), index=False)
+
+        with mock.patch(
+            "honestnft_utils.config.SUSPICIOUS_NFTS_FOLDER", str(temp_path)
+        ), mock.patch.object(
+            suspicious, "is_nft_suspicious", side_effect=fake_is_nft_suspicious
+        ) as is_nft_suspicious, mock.patch.object(
+            suspicious, "get_collection_name", return_value="Test"
+        ):
+            suspicious.main(
+                contract_address=contract,
+                selector=SELECTOR,
+                total_retries=0,
+                backoff_factor=0,
+                batch_size=4,
+                lower_id=0,
+                upper_id=9,
+                total_supply=10,
+                keep_cache=False,
+                threads=3,
+            )
+
+        self.assertEqual(is_nft_suspicious.call_count, 7)
+        with open(temp_path.joinpath("Test.json")) as f:
+            data = json.load(f)["data"]
+        self.assertEqual(sorted(nft["token_id"] for nft in data), list(range(10)))
+        self.assertFalse(temp_path.joinpath(f".cache/{contract}.csv").exists())
@@ -0,0 +1,68 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from fair_drop import transaction_luck
+
+
+class TestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.data = pd.DataFrame(
+            {
+                "txid": ["0xa", "0xb", "0xa", "0xc", "0xc", "0xc"]
+                + ["0xd", "0xd", "0xd", "0xd"],
+                "to_account": ["0x01", "0x01", "0x01", "0x02", "0x02", "0x02"]
+                + ["0x03", "0x03", "0x03", "0x03"],
+                "TOKEN_ID": [11, 12, 15, 13, 14, 16, 17, 18, 19, 20],
+                "rank": [5, 2, 1, 3, 4, 6, 7, 8, 9, 10],
+            }
+        )
+
+    def test_transaction_outcomes(self):
+        transactions = transaction_luck.transaction_outcomes(self.data, top_n=2)
+
+        self.assertEqual(sorted(transactions.index), ["0xa", "0xb", "0xc", "0xd"])
+        self.assertEqual(transactions.loc["0xa", "num_minted"], 2)
+        self.assertEqual(transactions.loc["0xa", "best_rank"], 1)
+        self.assertEqual(transactions.loc["0xa", "best_token"], 15)
+        self.assertEqual(transactions.loc["0xa", "rare_hits"], 1)
+        # 1 - C(9, 2) / C(10, 2)
+        self.assertAlmostEqual(transactions.loc["0xa", "pvalue_best"], 9 / 45)
+        self.assertAlmostEqual(transactions.loc["0xa", "pvalue_rare"], 17 / 45)
+        self.assertAlmostEqual(transactions.loc["0xb", "pvalue_best"], 0.2)
+        self.assertEqual(transactions.loc["0xd", "rare_hits"], 0)
+        self.assertEqual(transactions.loc["0xd", "pvalue_rare"], 1)
+
+        with self.subTest("Matches scipy's hypergeometric distribution"):
+            at_most_best = transactions["best_rank"].to_numpy()
+            np.testing.assert_allclose(
+                transactions["pvalue_best"],
+                stats.hypergeom.sf(0, 10, at_most_best, transactions["num_minted"]),
+            )
+
+    def test_transaction_luck(self):
+        _, wallets = transaction_luck.transaction_luck(self.data, top_n=2)
+
+        self.assertEqual(wallets.index[0], "0x01")
+        lucky = wallets.loc["0x01"]
+        self.assertEqual(lucky["num_transactions"], 2)
+        self.assertEqual(lucky["num_minted"], 3)
+        self.assertEqual(lucky["rare_hits"], 2)
+        self.assertAlmostEqual(lucky["log_probability"], 2 * np.log(0.2))
+        self.assertAlmostEqual(
+            lucky["pvalue"], stats.chi2.sf(-4 * np.log(0.2), 4), places=12
+        )
+        # C(2, 2) * C(8, 1) / C(10, 3)
+        self.assertAlmostEqual(lucky["pvalue_rare"], 8 / 120)
+
+        with self.subTest("Wallets with too few transactions are skipped"):
+            _, wallets = transaction_luck.transaction_luck(
+                self.data, top_n=2, min_transactions=2
+            )
+            self.assertEqual(list(wallets.index), ["0x01"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import json
+import shutil
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+
+from honestnft_utils import config, warehouse
+from tests import helpers
+
+
+class TestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_path = Path(f"{helpers.TESTS_ROOT_DIR}/temp_warehouse")
+        self.temp_path.mkdir(parents=True, exist_ok=True)
+        self.patches = [
+            mock.patch.object(config, "RARITY_FOLDER", str(self.temp_path)),
+            mock.patch.object(config, "MINTING_FOLDER", str(self.temp_path)),
+            mock.patch.object(config, "SALES_DATA_FOLDER", str(self.temp_path)),
+            mock.patch.object(config, "SUSPICIOUS_NFTS_FOLDER", str(self.temp_path)),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+        pd.DataFrame(
+            {
+                "TOKEN_ID": [1, 2, 3],
+                "TOKEN_NAME": ["#1", "#2", "#3"],
+                "Hat": [1.5, 3.0, 1.5],
+                "RARITY_SCORE": [2.5, 4.0, 3.5],
+                "Rank": [3, 1, 2],
+            }
+        ).to_csv(self.temp_path.joinpath("collection_raritytools.csv"), index=False)
+        pd.DataFrame(
+            {
+                "txid": ["0xaa", "0xaa", "0xbb"],
+                "to_account": ["0x01", "0x01", "0x02"],
+                "TOKEN_ID": [1, 2, 3],
+                "current_owner": ["0x01", "0x03", "0x02"],
+                "rank": [3, 1, 2],
+                "time": ["2022-01-01 00:00:00"] * 3,
+            }
+        ).to_csv(self.temp_path.joinpath("collection_minting.csv"))
+        with open(self.temp_path.joinpath("collection.json"), "w") as f:
+            json.dump(
+                {
+                    "contract": "0xcontract",
+                    "name": "Collection",
+                    "scraped_on": 1659948199,
+                    "data": [
+                        {"token_id": 1, "url": "https://", "is_suspicious": False},
+                        {"token_id": 2, "url": "https://", "is_suspicious": True},
+                    ],
+                },
+                f,
+            )
+
+        self.conn = warehouse.connect(str(self.temp_path.joinpath("warehouse.sqlite")))
+
+    def test_ingest_all(self):
+        with self.subTest("New files are ingested"):
+            summary = warehouse.ingest_all(
+                self.conn, tables=["rarity", "minting", "suspicious"]
+            )
+            self.assertEqual(list(summary["collection"]), ["collection"] * 3)
+            self.assertTrue((summary["status"] == "ingested").all())
+            self.assertEqual(
+                len(warehouse.get_collection(self.conn, "minting", "collection")), 3
+            )
+            self.assertEqual(
+                warehouse.query(
+                    self.conn, "SELECT token_id FROM suspicious WHERE is_suspicious"
+                )["token_id"].tolist(),
+                [2],
+            )
+
+        with self.subTest("Unchanged files are skipped"):
+            summary = warehouse.ingest_all(self.conn, tables=["rarity", "minting"])
+            self.assertTrue((summary["status"] == "skipped").all())
+
+        with self.subTest("Forced ingestion doesn't duplicate rows"):
+            warehouse.ingest_all(self.conn, tables=["minting"], force=True)
+            self.assertEqual(
+                len(warehouse.get_collection(self.conn, "minting", "collection")), 3
+            )
+
+    def test_get_ranks(self):
+        warehouse.ingest_file(self.conn, "rarity", "collection")
+
+        ranks = warehouse.get_ranks(self.conn, "collection")
+
+        self.assertEqual(ranks.loc[3], 2)
+        self.assertEqual(ranks.loc[1], 3)
+        self.assertNotIn(4, ranks.index)
+
+    def test_get_wallet_activity(self):
+        warehouse.ingest_file(self.conn, "minting", "collection")
+
+        activity = warehouse.get_wallet_activity(self.conn, "0x01")
+
+        self.assertEqual(activity["mints"]["token_id"].tolist(), [1, 2])
+        self.assertEqual(len(activity["sales"]), 0)
+
+    def tearDown(self) -> None:
+        self.conn.close()
+        for patch in self.patches:
+            patch.stop()
+        shutil.rmtree(self.temp_path)
+
+
+if __name__ == "__main__":
+    unittest.main()